@@ -0,0 +1,599 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import preprocessor
+from clusterer import Clusterer, CocktailMatrix
+from optimizer import IngredientModel, Optimizer, RecipeIndex
+from similarity import SimilarityIndex
+
+INGREDIENT_TYPES = ['Liqueur', 'Liquer', 'Bitter', 'Bitters', 'Brandy', 'Beverage', 'Rum', 'Whiskey', 'Whisky',
+                    'Spirit', 'Wine', 'Fortified Wine', 'Gin', 'Vodka', 'Water', 'Soft Drink', 'Juice', 'Syrup',
+                    'Soda', 'Tea', 'Cream', 'Sauce', 'Mineral', 'Fruit', 'Flower', None]
+
+ALCOHOLIC_TYPES = ['Liqueur', 'Liquer', 'Bitter', 'Bitters', 'Brandy', 'Beverage', 'Rum', 'Whiskey', 'Whisky',
+                   'Spirit', 'Wine', 'Fortified Wine', 'Gin', 'Vodka']
+
+MEASURES = ['2-3 oz ', '1/2 oz ', '1 oz ', '2 oz ', '1/3 oz ', '1 2/3 oz ', '1 1/2 oz ', '2 1/2 oz Blended ',
+            '3/4 oz ', '8 oz ', '1/2 oz white ', '6 oz hot ', '1 1/4 oz ', '1/3 oz cream ', '2 tsp ', '1/2 tsp ',
+            '1 tsp ', '1 tblsp ', '1 1/2 tsp ', '1 1/4 tsp ', '1/8 tsp grated ', '2 tsp', '1/4 tsp', 'Juice of 1 ',
+            'Juice of 1/2 ', 'Juice of 1/2', 'Juice of 1/4 ', '2-4', 'Garnish with', None]
+
+INSTRUCTIONS = ['Stir all ingredients with ice, strain into a cocktail glass.',
+                'Shake ingredients with ice, strain into a chilled glass.',
+                'Blend with crushed ice until smooth.',
+                'Pour into a highball glass over ice and top with soda.',
+                'Muddle mint with sugar, add the rest and serve.']
+
+GLASSES = ['Highball glass', 'Old-fashioned glass', 'Cocktail glass', 'Collins glass', 'Champagne flute']
+
+TAGS = [None, None, None, ['IBA', 'Classic'], ['IBA', 'ContemporaryClassic'], ['Strong', 'Brunch']]
+
+
+def make_synthetic_cocktails(n_cocktails, n_ingredients=600, random_state=42):
+    """
+    Generates raw cocktails dataframe with the same layout as the one read from cocktail_dataset.json, used to measure
+    how preprocessing and analysis scale with the number of recipes
+    :param n_cocktails: Number of cocktails to generate
+    :param n_ingredients: Size of the ingredients catalog, must be large enough to contain ids hardcoded in
+    preprocessing
+    :param random_state: Random state for reproducibility
+    :return: Raw cocktails dataframe
+    """
+    rng = np.random.default_rng(random_state)
+    timestamp = '2024-08-18 19:01:49'
+
+    catalog = []
+    for ingredient_id in range(1, n_ingredients + 1):
+        ingr_type = INGREDIENT_TYPES[rng.integers(len(INGREDIENT_TYPES))]
+        alcoholic = ingr_type in ALCOHOLIC_TYPES
+        percentage = int(rng.integers(15, 50)) if alcoholic and rng.random() < 0.6 else None
+        name = ['Lemon', 'Lime', 'Lemon Juice', 'Lime Juice'][ingredient_id % 4] if ingredient_id % 25 == 0 \
+            else f'Ingredient {ingredient_id}'
+
+        catalog.append({'id': ingredient_id,
+                        'name': name,
+                        'description': f'Description of ingredient {ingredient_id}' if rng.random() < 0.7 else None,
+                        'alcohol': int(alcoholic),
+                        'type': ingr_type,
+                        'percentage': percentage,
+                        'imageUrl': f'https://cocktails.solvro.pl/images/ingredients/{ingredient_id}.png',
+                        'createdAt': timestamp,
+                        'updatedAt': timestamp})
+
+    records = []
+    for cocktail_id in range(n_cocktails):
+        ingredients = []
+        for position in rng.choice(n_ingredients, size=rng.integers(2, 7), replace=False):
+            ingredient = dict(catalog[position])
+            measure = MEASURES[rng.integers(len(MEASURES))]
+            if measure is not None or rng.random() < 0.5:
+                ingredient['measure'] = measure
+            ingredients.append(ingredient)
+
+        records.append({'id': 11000 + cocktail_id,
+                        'name': f'Cocktail {cocktail_id}',
+                        'category': 'Ordinary Drink' if cocktail_id % 3 else 'Cocktail',
+                        'glass': GLASSES[rng.integers(len(GLASSES))],
+                        'tags': TAGS[rng.integers(len(TAGS))],
+                        'instructions': INSTRUCTIONS[rng.integers(len(INSTRUCTIONS))],
+                        'imageUrl': f'https://cocktails.solvro.pl/images/cocktails/{cocktail_id}.png',
+                        'alcoholic': 1,
+                        'createdAt': timestamp,
+                        'updatedAt': timestamp,
+                        'ingredients': ingredients})
+
+    return pd.DataFrame(records)
+
+
+def _time(function, *args):
+    """
+    Runs function once and measures its wall time
+    :param function:
+    :param args:
+    :return: Elapsed time in seconds
+    """
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_table_creation(sizes=(1_000, 5_000, 20_000, 50_000)):
+    """
+    Measures how creation of ingredients and cocktails and ingredients tables scales with the number of recipes
+    :param sizes: Numbers of cocktails to benchmark
+    :return: Dataframe with time taken by each builder for every size
+    """
+    rows = []
+    for n_cocktails in sizes:
+        cocktails = make_synthetic_cocktails(n_cocktails)
+
+        ingredients_time = _time(preprocessor._create_ingredients_table, cocktails)
+        cocktails_and_ingredients_time = _time(preprocessor._create_cocktails_and_ingredients_table, cocktails)
+
+        rows.append({'n_cocktails': n_cocktails,
+                     'ingredients_s': ingredients_time,
+                     'cocktails_and_ingredients_s': cocktails_and_ingredients_time,
+                     'us_per_cocktail': (ingredients_time + cocktails_and_ingredients_time) / n_cocktails * 1e6})
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_measure_parsing(n_rows=1_000_000, random_state=42):
+    """
+    Compares vectorized measure parsing with applying row by row parser, and checks that both give the same volumes
+    :param n_rows: Number of measures to parse
+    :param random_state: Random state for reproducibility
+    :return: Dictionary with time taken by both parsers, speedup and number of mismatching volumes
+    """
+    rng = np.random.default_rng(random_state)
+    cocktails_and_ingredients = pd.DataFrame({
+        'measure': pd.Series(MEASURES).astype(str).to_numpy()[rng.integers(len(MEASURES), size=n_rows)],
+        'ingredient_name': np.array(['Lemon', 'Lime', 'Gin', 'Lemon Juice', 'Sugar'])[rng.integers(5, size=n_rows)]
+    })
+
+    start = time.perf_counter()
+    row_by_row = cocktails_and_ingredients.apply(preprocessor._parse_measure, axis=1).astype(float)
+    row_by_row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = preprocessor._parse_measures(cocktails_and_ingredients['measure'],
+                                              cocktails_and_ingredients['ingredient_name'])
+    vectorized_time = time.perf_counter() - start
+
+    mismatches = ~((row_by_row == vectorized) | (row_by_row.isna() & vectorized.isna()))
+
+    return {'row_by_row_s': row_by_row_time,
+            'vectorized_s': vectorized_time,
+            'speedup': row_by_row_time / vectorized_time,
+            'mismatches': int(mismatches.sum())}
+
+
+def benchmark_parallel_preprocessing(n_cocktails=50_000, n_jobs=(1, 2, 4, 8)):
+    """
+    Measures speedup of preprocessing in a pool of processes over single process preprocessing, and checks that all
+    worker counts give the same tables
+    :param n_cocktails: Number of cocktails to preprocess
+    :param n_jobs: Numbers of worker processes to benchmark
+    :return: Dataframe with time taken and speedup for every number of workers
+    """
+    raw_cocktails = make_synthetic_cocktails(n_cocktails)
+
+    start = time.perf_counter()
+    reference = preprocessor._preprocess_raw_cocktails(raw_cocktails.copy())
+    serial_time = time.perf_counter() - start
+
+    rows = []
+    for jobs in n_jobs:
+        start = time.perf_counter()
+        if jobs > 1:
+            tables = preprocessor._preprocess_in_parallel(raw_cocktails.copy(), jobs)
+        else:
+            tables = preprocessor._preprocess_raw_cocktails(raw_cocktails.copy())
+        elapsed = time.perf_counter() - start
+
+        rows.append({'n_jobs': jobs,
+                     'time_s': elapsed,
+                     'speedup': serial_time / elapsed,
+                     'equal': all(table.equals(reference_table) for table, reference_table in zip(tables, reference))})
+
+    return pd.DataFrame(rows)
+
+
+def _make_transformed_matrix(n_cocktails, random_state=42):
+    """
+    Preprocesses synthetic cocktails and builds transformed sparse matrix of their volumes
+    :param n_cocktails: Number of cocktails to generate
+    :param random_state: Random state for reproducibility
+    :return: Clusterer and CocktailMatrix
+    """
+    tables = preprocessor._preprocess_raw_cocktails(make_synthetic_cocktails(n_cocktails, random_state=random_state))
+    clusterer = Clusterer(*tables)
+    matrix = clusterer.generate_cocktails_and_ingredients_matrix_with_volumes(sparse_output=True)
+    return clusterer, clusterer.transform_matrix(matrix)
+
+
+def benchmark_kmeans_clustering(sizes=(5_000, 20_000, 50_000), n_clusters=5):
+    """
+    Compares full K-Means with Mini-Batch K-Means reading sparse matrix in blocks, by time and by inertia of clusters
+    :param sizes: Numbers of cocktails to benchmark
+    :param n_clusters: Number of clusters to form
+    :return: Dataframe with time taken and inertia of both methods for every size
+    """
+    rows = []
+    for n_cocktails in sizes:
+        clusterer, matrix = _make_transformed_matrix(n_cocktails)
+
+        full_time = _time(clusterer.kmeans_clustering, matrix, n_clusters)
+        full_inertia = clusterer.kmeans.inertia_
+
+        minibatch_time = _time(clusterer.minibatch_kmeans_clustering, matrix, n_clusters)
+        minibatch_inertia = -clusterer.kmeans.score(matrix.matrix)
+
+        rows.append({'n_cocktails': n_cocktails,
+                     'full_s': full_time,
+                     'minibatch_s': minibatch_time,
+                     'speedup': full_time / minibatch_time,
+                     'inertia_ratio': minibatch_inertia / full_inertia})
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_similarity_index(n_cocktails=500_000, n_ingredients=600, n_queries=1_000, k=10, random_state=42):
+    """
+    Measures latency of single and batched top-k lookups in similarity index of random sparse volume vectors, and
+    recall of MinHash backend against exact one
+    :param n_cocktails: Number of indexed cocktails
+    :param n_ingredients: Number of ingredients
+    :param n_queries: Number of queries
+    :param k: Number of similar cocktails to find
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with build time, latencies and recall of every backend
+    """
+    rng = np.random.default_rng(random_state)
+    sizes = rng.integers(2, 7, size=n_cocktails)
+    rows = np.repeat(np.arange(n_cocktails), sizes)
+    matrix = CocktailMatrix((rng.random(len(rows)), (rows, rng.integers(n_ingredients, size=len(rows)))),
+                            np.arange(n_cocktails).astype(str), np.arange(n_ingredients).astype(str))
+    names = list(matrix.index[rng.integers(n_cocktails, size=n_queries)])
+
+    results, rows = {}, []
+    for backend in ('exact', 'minhash'):
+        start = time.perf_counter()
+        index = SimilarityIndex(matrix, metric='jaccard', backend=backend)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for name in names:
+            index.most_similar(name, k)
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results[backend] = index.most_similar_batch(names, k)
+        batch_time = time.perf_counter() - start
+
+        rows.append({'backend': backend,
+                     'build_s': build_time,
+                     'single_ms': single_time / n_queries * 1e3,
+                     'batch_ms_per_query': batch_time / n_queries * 1e3})
+
+    # Found cocktail counts as recalled if it is at least as similar as the k-th exact one, as there are many ties
+    kth_similarity = results['exact'].groupby('cocktail_name')['similarity'].min()
+    recalled = results['minhash']['similarity'] >= results['minhash']['cocktail_name'].map(kth_similarity) - 1e-12
+    rows[1]['recall'] = recalled.sum() / len(results['exact'])
+    rows[0]['recall'] = 1.0
+
+    return pd.DataFrame(rows)
+
+
+def _main_ingr_type_by_name_merges(cocktails, ingredients, cocktails_and_ingredients):
+    """
+    Previous implementation of Clusterer.generate_table_with_cocktails_and_their_main_ingr_type, which merges tables on
+    names and sorts them, kept as a baseline
+    :param cocktails:
+    :param ingredients:
+    :param cocktails_and_ingredients:
+    :return: DataFrame with columns for cocktail name and primary alcohol type
+    """
+    result_df = cocktails_and_ingredients.set_index('cocktail_name').join(
+        cocktails.set_index('name')[['abv']],
+        how='left'
+    ).reset_index()
+
+    result_df = ingredients[['name', 'type', 'generalized_type']].merge(result_df, left_on='name',
+                                                                        right_on='ingredient_name',
+                                                                        how='inner')
+
+    result_df.dropna(subset=['type'], inplace=True)
+    result_df.drop(columns=['name'], inplace=True)
+
+    result_df.sort_values(by='cocktail_name', ascending=True, inplace=True)
+
+    max_volume_type_df = (
+        result_df.loc[result_df['generalized_type'] == "Alcoholic"]
+        .sort_values(by=['cocktail_name', 'volume_oz'], ascending=[True, False])
+        .drop_duplicates(subset=['cocktail_name'], keep='first')
+        [['cocktail_name', 'type']]
+    )
+
+    max_volume_type_df.rename(columns={'type': 'primary_alcohol_type'}, inplace=True)
+
+    result_df = result_df.merge(max_volume_type_df, on='cocktail_name', how='left')
+
+    result_df = result_df[['primary_alcohol_type', 'cocktail_name']]
+    result_df.drop_duplicates(inplace=True)
+    result_df.reset_index(inplace=True)
+    return result_df
+
+
+def _measure(function, *args):
+    """
+    Runs function once and measures its wall time and peak of memory allocated by it
+    :param function:
+    :param args:
+    :return: Result of function, elapsed time in seconds and peak memory in megabytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def benchmark_main_ingr_type(sizes=(5_000, 20_000, 50_000), random_state=42):
+    """
+    Compares computation of primary alcohol type of cocktails by integer ids with merges on names, by time, peak memory
+    and results. Names of ingredients are made unique, as they are in the dataset, because merges on names cross-join
+    ingredients of the same name
+    :param sizes: Numbers of cocktails to benchmark
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with time and peak memory of both implementations, and number of cocktails with different primary
+    type, all of which have several alcoholic ingredients of the largest volume
+    """
+    rows = []
+    for n_cocktails in sizes:
+        cocktails, ingredients, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+            make_synthetic_cocktails(n_cocktails, random_state=random_state))
+        ingredients['name'] = ingredients['name'] + ' ' + ingredients.index.astype(str)
+        cocktails_and_ingredients['ingredient_name'] = ingredients['name'].reindex(
+            cocktails_and_ingredients['ingredient_id']).to_numpy()
+        clusterer = Clusterer(cocktails, ingredients, cocktails_and_ingredients)
+
+        merged, merges_time, merges_memory = _measure(_main_ingr_type_by_name_merges, cocktails, ingredients,
+                                                      cocktails_and_ingredients)
+        vectorized, ids_time, ids_memory = _measure(clusterer.generate_table_with_cocktails_and_their_main_ingr_type)
+
+        # Cocktails whose largest alcoholic ingredients are of several types, the choice among them is arbitrary
+        alcoholic = cocktails_and_ingredients.join(ingredients[['type', 'generalized_type']], on='ingredient_id')
+        alcoholic = alcoholic.loc[alcoholic['generalized_type'] == 'Alcoholic']
+        volumes = alcoholic['volume_oz'].fillna(-np.inf)
+        largest = alcoholic.loc[volumes == volumes.groupby(alcoholic['cocktail_name']).transform('max')]
+        tied = largest.groupby('cocktail_name')['type'].nunique() > 1
+
+        different = merged['primary_alcohol_type'].fillna('') != vectorized['primary_alcohol_type'].fillna('')
+        rows.append({'n_cocktails': n_cocktails,
+                     'merges_s': merges_time,
+                     'ids_s': ids_time,
+                     'speedup': merges_time / ids_time,
+                     'merges_peak_mb': merges_memory,
+                     'ids_peak_mb': ids_memory,
+                     'same_layout': merged[['index', 'cocktail_name']].equals(vectorized[['index', 'cocktail_name']]),
+                     'different_types': int(different.sum()),
+                     'different_untied': int((different & ~merged['cocktail_name'].map(tied).fillna(False)).sum())})
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_recipe_index(n_cocktails=20_000, n_inventories=2_000, max_missing=(0, 1, 2), random_state=42):
+    """
+    Times batched queries of inventories against the recipe index
+    :param n_cocktails: Number of cocktails
+    :param n_inventories: Number of inventories queried in one batch
+    :param max_missing: Numbers of ingredients which may be missing to benchmark
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with time of a batch, time per inventory and number of found cocktails
+    """
+    rng = np.random.default_rng(random_state)
+    _, _, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+        make_synthetic_cocktails(n_cocktails, random_state=random_state))
+    index, build_time, _ = _measure(RecipeIndex, cocktails_and_ingredients)
+    inventories = [list(rng.choice(index.ingredient_ids, size=rng.integers(50, 300), replace=False))
+                   for _ in range(n_inventories)]
+
+    rows = []
+    for missing in max_missing:
+        counts, elapsed, _ = _measure(index.missing_counts, inventories, missing)
+        rows.append({'n_cocktails': len(index),
+                     'n_inventories': n_inventories,
+                     'max_missing': missing,
+                     'build_s': build_time,
+                     'batch_s': elapsed,
+                     'per_inventory_ms': 1_000 * elapsed / n_inventories,
+                     'found': int((counts <= missing).sum())})
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_ingredient_curve(n_cocktails=500, n_ingredients=range(1, 13), random_state=42):
+    """
+    Compares the coverage curve solved with one warm-started model with a cold solve of a new model for each number of
+    ingredients
+    :param n_cocktails: Number of cocktails
+    :param n_ingredients: Numbers of ingredients of the curve
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with number of cocktails and time of both ways for each number of ingredients
+    """
+    _, ingredients, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+        make_synthetic_cocktails(n_cocktails, random_state=random_state))
+    optimizer = Optimizer(ingredients, cocktails_and_ingredients)
+
+    curve = optimizer.find_ingredient_curve(n_ingredients)
+    rows = []
+    for row in curve.itertuples():
+        result, elapsed, _ = _measure(optimizer.find_n_ingredients_to_make_largest_amount_of_cocktails,
+                                      row.n_ingredients)
+        rows.append({'n_ingredients': row.n_ingredients,
+                     'curve_cocktails': row.num_cocktails,
+                     'cold_cocktails': result['num_cocktails'],
+                     'curve_s': row.time_s,
+                     'cold_s': elapsed})
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_heuristic_solver(n_cocktails=(500, 20_000), n_ingredients=(5, 10, 20, 40), time_limit=0.5,
+                               max_exact_cocktails=500, random_state=42):
+    """
+    Compares the heuristic solver of the ingredients problem with CBC, which is only run on small catalogs as it takes
+    minutes on large ones, and reports the gap of the heuristic to the bound of the LP relaxation
+    :param n_cocktails: Numbers of cocktails
+    :param n_ingredients: Numbers of ingredients to select
+    :param time_limit: Time budget of the heuristic in seconds
+    :param max_exact_cocktails: Largest number of cocktails solved with CBC
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with number of cocktails and time of both solvers, LP bound and gap of the heuristic
+    """
+    rows = []
+    for size in n_cocktails:
+        _, ingredients, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+            make_synthetic_cocktails(size, random_state=random_state))
+        optimizer = Optimizer(ingredients, cocktails_and_ingredients)
+
+        for num_ingredients in n_ingredients:
+            heuristic, heuristic_time, _ = _measure(
+                optimizer.find_n_ingredients_to_make_largest_amount_of_cocktails, num_ingredients, False, 'heuristic',
+                time_limit)
+            exact, exact_time = {'num_cocktails': None}, None
+            if size <= max_exact_cocktails:
+                exact, exact_time, _ = _measure(optimizer.find_n_ingredients_to_make_largest_amount_of_cocktails,
+                                                num_ingredients)
+            rows.append({'n_cocktails': size,
+                         'n_ingredients': num_ingredients,
+                         'heuristic_cocktails': heuristic['num_cocktails'],
+                         'cbc_cocktails': exact['num_cocktails'],
+                         'lp_bound': heuristic['lp_bound'],
+                         'gap': heuristic['gap'],
+                         'heuristic_s': heuristic_time,
+                         'cbc_s': exact_time})
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_model_reduction(n_cocktails=500, n_ingredients=range(2, 11), duplicated=0.3, random_state=42):
+    """
+    Compares the reduced MILP of ingredients problem with the full one by size, time and optimum, which has to be the
+    same. A part of the recipes is duplicated under other names, as catalogs list variants of the same recipe
+    :param n_cocktails: Number of cocktails
+    :param n_ingredients: Numbers of ingredients to solve for
+    :param duplicated: Fraction of cocktails duplicated under another name
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with number of variables and constraints, time of building and solving and optimum of both
+    models for each number of ingredients
+    """
+    _, _, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+        make_synthetic_cocktails(n_cocktails, random_state=random_state))
+    names = cocktails_and_ingredients['cocktail_name'].unique()
+    copies = cocktails_and_ingredients.loc[
+        cocktails_and_ingredients['cocktail_name'].isin(names[:int(duplicated * len(names))])]
+    copies = copies.assign(cocktail_name=copies['cocktail_name'] + ' (variant)')
+    recipes = RecipeIndex(pd.concat([cocktails_and_ingredients, copies], ignore_index=True))
+
+    rows = []
+    for num_ingredients in n_ingredients:
+        row = {'n_ingredients': num_ingredients}
+        for name, kwargs in (('full', {'reduce': False}), ('reduced', {'max_ingredients': num_ingredients})):
+            model, build_time, _ = _measure(lambda: IngredientModel(recipes, **kwargs))
+            selected, solve_time, _ = _measure(model.solve, num_ingredients)
+            row.update({f'{name}_variables': model.n_variables,
+                        f'{name}_constraints': model.n_constraints,
+                        f'{name}_build_s': build_time,
+                        f'{name}_solve_s': solve_time,
+                        f'{name}_cocktails': int(recipes.makeable([recipes.ingredient_ids[selected]])[0].sum())})
+        row['same_optimum'] = row['full_cocktails'] == row['reduced_cocktails']
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_solver_backends(n_cocktails=500, n_ingredients=(5, 10, 20), time_limits=(None, 1.), n_jobs=(1, 4),
+                              random_state=42):
+    """
+    Compares backends solving the ingredients problem, with and without a time limit, and solving the full and
+    only_alcoholic variants of each number of ingredients with the last time limit serially or in a pool
+    :param n_cocktails: Number of cocktails
+    :param n_ingredients: Numbers of ingredients
+    :param time_limits: Time limits in seconds, None for no limit
+    :param n_jobs: Numbers of worker processes of the pool
+    :param random_state: Random state for reproducibility
+    :return: Dataframes with number of cocktails and time of each backend, and with time of solving scenarios
+    """
+    _, ingredients, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+        make_synthetic_cocktails(n_cocktails, random_state=random_state))
+    optimizer = Optimizer(ingredients, cocktails_and_ingredients)
+
+    rows = []
+    for num_ingredients in n_ingredients:
+        for time_limit in time_limits:
+            for backend in ('cbc', 'highs', 'heuristic'):
+                result, elapsed, _ = _measure(optimizer.find_n_ingredients_to_make_largest_amount_of_cocktails,
+                                              num_ingredients, False, backend, time_limit)
+                rows.append({'n_ingredients': num_ingredients,
+                             'time_limit': time_limit,
+                             'backend': backend,
+                             'num_cocktails': result['num_cocktails'],
+                             'time_s': elapsed})
+
+    scenarios = [{'n_ingredients': num_ingredients, 'only_alcoholic': only_alcoholic, 'time_limit': time_limits[-1]}
+                 for num_ingredients in n_ingredients for only_alcoholic in (False, True)]
+    pool_rows = []
+    for jobs in n_jobs:
+        _, elapsed, _ = _measure(optimizer.solve_scenarios, scenarios, jobs)
+        pool_rows.append({'n_scenarios': len(scenarios), 'n_jobs': jobs, 'time_s': elapsed})
+
+    return pd.DataFrame(rows), pd.DataFrame(pool_rows)
+
+
+def benchmark_constrained_scenarios(n_cocktails=300, n_scenarios=60, random_state=42):
+    """
+    Measures throughput of weighted and constrained scenarios, each with random number of ingredients, required and
+    forbidden ingredients, budget and number of preparation methods, and checks their selections satisfy constraints
+    :param n_cocktails: Number of cocktails
+    :param n_scenarios: Number of scenarios
+    :param random_state: Random state for reproducibility
+    :return: Dataframe with number of scenarios, scenarios per minute and number of violated constraints of each backend
+    """
+    cocktails, ingredients, cocktails_and_ingredients = preprocessor._preprocess_raw_cocktails(
+        make_synthetic_cocktails(n_cocktails, random_state=random_state))
+    optimizer = Optimizer(ingredients, cocktails_and_ingredients, cocktails)
+
+    rng = np.random.default_rng(random_state)
+    names = cocktails_and_ingredients['ingredient_name'].unique()
+    costs = pd.Series(rng.uniform(5, 50, len(names)).round(), index=names)
+    scenarios = []
+    for _ in range(n_scenarios):
+        chosen = list(rng.choice(names, 4, replace=False))
+        scenarios.append({'n_ingredients': int(rng.integers(4, 12)),
+                          'cocktail_weights': optimizer.tag_weights('IBA', 3.),
+                          'ingredient_costs': costs,
+                          'budget': float(rng.integers(100, 250)),
+                          'must_include': chosen[:1],
+                          'must_exclude': chosen[1:],
+                          'min_prep_methods': int(rng.integers(0, 3))})
+
+    rows = []
+    for backend in ('cbc', 'highs'):
+        results, elapsed, _ = _measure(optimizer.solve_scenarios,
+                                       [{**scenario, 'solver': backend} for scenario in scenarios])
+        violations = sum(len(result['selected_ingredients']) > scenario['n_ingredients']
+                         or result['total_cost'] > scenario['budget']
+                         or not set(scenario['must_include']) <= set(result['selected_ingredients'])
+                         or bool(set(scenario['must_exclude']) & set(result['selected_ingredients']))
+                         or result.get('num_prep_methods', 0) < scenario['min_prep_methods']
+                         for scenario, result in zip(scenarios, results))
+        rows.append({'backend': backend,
+                     'n_scenarios': len(scenarios),
+                     'scenarios_per_minute': 60 * len(scenarios) / elapsed,
+                     'violations': violations})
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    print(benchmark_table_creation().to_string(index=False))
+    print(benchmark_measure_parsing())
+    print(benchmark_parallel_preprocessing().to_string(index=False))
+    print(benchmark_kmeans_clustering().to_string(index=False))
+    print(benchmark_similarity_index().to_string(index=False))
+    print(benchmark_main_ingr_type().to_string(index=False))
+    print(benchmark_recipe_index().to_string(index=False))
+    print(benchmark_ingredient_curve().to_string(index=False))
+    print(benchmark_heuristic_solver().to_string(index=False))
+    print(benchmark_model_reduction().to_string(index=False))
+    backends, pool = benchmark_solver_backends()
+    print(backends.to_string(index=False))
+    print(pool.to_string(index=False))
+    print(benchmark_constrained_scenarios().to_string(index=False))
@@ -1,13 +1,499 @@
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy as np
 from matplotlib import pyplot as plt
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.preprocessing import QuantileTransformer
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 from sklearn.manifold import TSNE
-from sklearn.cluster import KMeans, SpectralClustering
+from sklearn.cluster import KMeans, MiniBatchKMeans, SpectralClustering
+from sklearn.neighbors import NearestNeighbors, kneighbors_graph
+from sklearn.metrics import silhouette_score
+from sklearn.utils.extmath import svd_flip
 
 import plotly.express as px
 import pandas as pd
+from scipy import sparse
+
+QUANTILES_SUBSAMPLE = 10_000
+# Matrices with more columns are decomposed with randomized SVD into this many components by default
+FULL_DECOMPOSITION_MAX_COLUMNS = 1_000
+DEFAULT_N_COMPONENTS = 50
+# Scatter plots with more points are rendered with WebGL, with names shown on hover only, and downsampled
+LARGE_PLOT_POINTS = 5_000
+MAX_PLOT_POINTS = 50_000
+
+
+class CocktailMatrix:
+    """
+    A sparse matrix of cocktails and ingredients with labels of its rows and columns, a lightweight counterpart of pivot
+    table for datasets where most of ingredients don't appear in most of cocktails.
+    """
+    def __init__(self, matrix, index, columns):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.index = pd.Index(index)
+        self.columns = pd.Index(columns)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def row(self, cocktail_name):
+        """
+        Looks up the row of a cocktail.
+
+        :param cocktail_name: Name of the cocktail.
+
+        :returns: Position of the cocktail's row.
+        """
+        return self.index.get_loc(cocktail_name)
+
+    def column(self, ingredient_name):
+        """
+        Looks up the column of an ingredient.
+
+        :param ingredient_name: Name of the ingredient.
+
+        :returns: Position of the ingredient's column.
+        """
+        return self.columns.get_loc(ingredient_name)
+
+    def to_frame(self):
+        """
+        Densifies the matrix, only for small matrices.
+
+        :returns: DataFrame with cocktails as rows and ingredients as columns.
+        """
+        return pd.DataFrame(self.matrix.toarray(), index=self.index, columns=self.columns)
+
+
+class Decomposition:
+    """
+    Principal components of a transformed matrix: coordinates of cocktails and explained variance of components,
+    shared by PCA and scree plots.
+    """
+    def __init__(self, coordinates, explained_variance_ratio, method, n_components):
+        self.coordinates = coordinates
+        self.explained_variance_ratio = explained_variance_ratio
+        self.method = method
+        self.n_components = n_components
+
+
+class Embedding:
+    """
+    2D embedding of cocktails with time taken by each of its stages.
+    """
+    def __init__(self, coordinates, timings):
+        self.coordinates = coordinates
+        self.timings = timings
+
+
+def _values(matrix):
+    """
+    Returns data of a matrix in a form accepted by scikit-learn estimators, without densifying sparse matrices.
+
+    :param matrix: DataFrame or CocktailMatrix.
+
+    :returns: DataFrame or CSR matrix.
+    """
+    return matrix.matrix if isinstance(matrix, CocktailMatrix) else matrix
+
+
+def _iter_row_chunks(matrix, chunk_size):
+    """
+    Yields consecutive blocks of rows of a matrix, reading only one block of a memory-mapped array at a time.
+
+    :param matrix: DataFrame, CocktailMatrix, sparse matrix, array or memory-mapped array.
+    :param chunk_size: Number of rows in a block.
+
+    :returns: Generator of arrays or CSR matrices.
+    """
+    matrix = _values(matrix)
+    if isinstance(matrix, pd.DataFrame):
+        matrix = matrix.to_numpy()
+
+    for start in range(0, matrix.shape[0], chunk_size):
+        yield matrix[start:start + chunk_size]
+
+
+def _fingerprint(matrix):
+    """
+    Computes a digest of matrix contents, used as a key of caches of results computed from the matrix.
+
+    :param matrix: DataFrame or CocktailMatrix.
+
+    :returns: Hex digest of matrix shape and values.
+    """
+    digest = hashlib.sha256(str(matrix.shape).encode())
+    if isinstance(matrix, CocktailMatrix):
+        parts = (matrix.matrix.data, matrix.matrix.indices, matrix.matrix.indptr)
+    else:
+        parts = (matrix.to_numpy(),)
+
+    for part in parts:
+        digest.update(np.ascontiguousarray(part).tobytes())
+
+    return digest.hexdigest()
+
+
+def _default_eigen_solver():
+    """
+    Picks the eigensolver for spectral clustering on large sparse graphs, AMG if optional pyamg is installed, LOBPCG
+    otherwise.
+
+    :returns: Name of the eigensolver.
+    """
+    try:
+        import pyamg  # noqa: F401
+    except ImportError:
+        return 'lobpcg'
+    return 'amg'
+
+
+# Inputs of cluster count sweep in current process, set in workers by _init_sweep_worker
+_SWEEP_DATA = {}
+
+
+def _share_array(array, blocks):
+    """
+    Copies an array into a new block of shared memory.
+
+    :param array: Array to share.
+    :param blocks: List which the created block is appended to, so that it can be released by the caller.
+
+    :returns: Name, shape and dtype of the shared array.
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+
+    return block.name, array.shape, array.dtype.str
+
+
+def _attach_array(spec, blocks):
+    """
+    Attaches to an array shared by _share_array without copying it.
+
+    :param spec: Name, shape and dtype of the shared array.
+    :param blocks: List which the attached block is appended to, to keep it open while the array is used.
+
+    :returns: Array backed by shared memory.
+    """
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _share_matrix(matrix, blocks):
+    """
+    Copies a dense array or a CSR matrix into shared memory.
+
+    :param matrix: Array or CSR matrix.
+    :param blocks: List which created blocks are appended to.
+
+    :returns: Description of the shared matrix for _attach_matrix.
+    """
+    if sparse.issparse(matrix):
+        return 'csr', matrix.shape, [_share_array(part, blocks)
+                                     for part in (matrix.data, matrix.indices, matrix.indptr)]
+
+    return 'dense', matrix.shape, [_share_array(np.ascontiguousarray(matrix), blocks)]
+
+
+def _attach_matrix(description, blocks):
+    """
+    Attaches to a matrix shared by _share_matrix.
+
+    :param description: Description of the shared matrix.
+    :param blocks: List which attached blocks are appended to.
+
+    :returns: Array or CSR matrix backed by shared memory.
+    """
+    kind, shape, specs = description
+    parts = [_attach_array(spec, blocks) for spec in specs]
+    if kind == 'csr':
+        return sparse.csr_matrix(tuple(parts), shape=shape, copy=False)
+
+    return parts[0]
+
+
+def _init_sweep_worker(matrix_description, graph_description):
+    """
+    Attaches worker process to the matrix and the affinity graph shared by the parent, once per worker.
+
+    :param matrix_description: Description of the shared transformed matrix.
+    :param graph_description: Description of the shared affinity graph, None if spectral clustering isn't swept.
+    """
+    blocks = []
+    _SWEEP_DATA['blocks'] = blocks
+    _SWEEP_DATA['matrix'] = _attach_matrix(matrix_description, blocks)
+    _SWEEP_DATA['graph'] = None if graph_description is None else _attach_matrix(graph_description, blocks)
+
+
+def _inertia(matrix, labels):
+    """
+    Computes sum of squared distances of cocktails to centers of their clusters, for dense and sparse matrices.
+
+    :param matrix: Array or CSR matrix.
+    :param labels: Cluster labels.
+
+    :returns: Inertia of clustering.
+    """
+    _, codes = np.unique(labels, return_inverse=True)
+    indicator = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))))
+    sums = indicator @ matrix
+    sums = sums.toarray() if sparse.issparse(sums) else sums
+    counts = np.asarray(indicator.sum(axis=1)).ravel()
+
+    squared_norms = matrix.multiply(matrix).sum() if sparse.issparse(matrix) else np.square(matrix).sum()
+    return float(squared_norms - (np.square(sums).sum(axis=1) / counts).sum())
+
+
+def _davies_bouldin(matrix, labels):
+    """
+    Computes Davies-Bouldin index, like davies_bouldin_score but also for sparse matrices.
+
+    :param matrix: Array or CSR matrix.
+    :param labels: Cluster labels.
+
+    :returns: Davies-Bouldin index, lower is better.
+    """
+    _, codes = np.unique(labels, return_inverse=True)
+    indicator = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))))
+    counts = np.asarray(indicator.sum(axis=1)).ravel()
+    sums = indicator @ matrix
+    centroids = (sums.toarray() if sparse.issparse(sums) else sums) / counts[:, None]
+
+    # Distance of each cocktail to its centroid from ||x||^2 - 2 x.c + ||c||^2
+    if sparse.issparse(matrix):
+        squared_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        products = np.asarray(matrix.multiply(centroids[codes]).sum(axis=1)).ravel()
+    else:
+        squared_norms = np.square(matrix).sum(axis=1)
+        products = (matrix * centroids[codes]).sum(axis=1)
+    distances = np.sqrt(np.maximum(squared_norms - 2 * products + np.square(centroids[codes]).sum(axis=1), 0))
+    intra_dists = np.bincount(codes, weights=distances) / counts
+
+    centroid_distances = np.sqrt(np.maximum(
+        np.square(centroids[:, None, :] - centroids[None, :, :]).sum(axis=2), 0))
+    if len(counts) < 2 or np.allclose(intra_dists, 0) or np.allclose(centroid_distances, 0):
+        return 0.0
+
+    centroid_distances[centroid_distances == 0] = np.inf
+    scores = (intra_dists[:, None] + intra_dists[None, :]) / centroid_distances
+
+    return float(np.mean(np.max(scores, axis=1)))
+
+
+def _run_sweep_task(algorithm, n_clusters, random_state, silhouette_sample_size):
+    """
+    Clusters shared matrix with one algorithm and number of clusters and evaluates the clustering.
+
+    :param algorithm: 'kmeans' or 'spectral'.
+    :param n_clusters: Number of clusters to form.
+    :param random_state: Random state for reproducibility.
+    :param silhouette_sample_size: Maximal number of cocktails silhouette is computed on.
+
+    :returns: Dictionary with metrics, time taken and labels.
+    """
+    matrix = _SWEEP_DATA['matrix']
+
+    start = time.perf_counter()
+    if algorithm == 'kmeans':
+        labels = KMeans(n_clusters=n_clusters, random_state=random_state).fit_predict(matrix)
+    else:
+        spectral = SpectralClustering(n_clusters=n_clusters, affinity='precomputed',
+                                      eigen_solver=_default_eigen_solver(), random_state=random_state)
+        labels = spectral.fit_predict(_SWEEP_DATA['graph'])
+    fit_time = time.perf_counter() - start
+
+    n_labels = len(np.unique(labels))
+    valid = 1 < n_labels < matrix.shape[0]
+    sample_size = silhouette_sample_size if matrix.shape[0] > silhouette_sample_size else None
+
+    return {'algorithm': algorithm,
+            'n_clusters': n_clusters,
+            'inertia': _inertia(matrix, labels),
+            'silhouette': silhouette_score(matrix, labels, sample_size=sample_size,
+                                           random_state=random_state) if valid else np.nan,
+            'davies_bouldin': _davies_bouldin(matrix, labels) if valid else np.nan,
+            'time_s': fit_time,
+            'labels': labels}
+
+
+def _randomized_pca(matrix, n_components, n_oversamples=10, n_iter=7, random_state=42):
+    """
+    Computes principal components with randomized SVD of the centered matrix. Sparse matrices are centered implicitly,
+    by subtracting the mean from products with the matrix, so they are never densified.
+
+    :param matrix: Array or CSR matrix.
+    :param n_components: Number of components.
+    :param n_oversamples: Number of additional random vectors, which improve accuracy.
+    :param n_iter: Number of power iterations.
+    :param random_state: Random state for reproducibility.
+
+    :returns: Coordinates of rows and explained variance ratio of components.
+    """
+    n_rows = matrix.shape[0]
+    mean = np.asarray(matrix.mean(axis=0)).ravel()
+
+    def multiply(vectors):
+        return matrix @ vectors - mean @ vectors
+
+    def multiply_transposed(vectors):
+        return matrix.T @ vectors - np.outer(mean, vectors.sum(axis=0))
+
+    rng = np.random.default_rng(random_state)
+    basis = multiply(rng.standard_normal((matrix.shape[1], n_components + n_oversamples)))
+    for _ in range(n_iter):
+        basis, _ = np.linalg.qr(basis)
+        basis, _ = np.linalg.qr(multiply_transposed(basis))
+        basis = multiply(basis)
+    basis, _ = np.linalg.qr(basis)
+
+    small_u, singular_values, components = np.linalg.svd(multiply_transposed(basis).T, full_matrices=False)
+    u, components = svd_flip(basis @ small_u, components)
+
+    if sparse.issparse(matrix):
+        total_variance = (np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel() - n_rows * mean ** 2).sum()
+    else:
+        total_variance = (np.square(matrix).sum(axis=0) - n_rows * mean ** 2).sum()
+    explained_variance_ratio = singular_values[:n_components] ** 2 / total_variance
+
+    return u[:, :n_components] * singular_values[:n_components], explained_variance_ratio
+
+
+def _downsample_by_density(x, y, max_points, n_bins=100, random_state=42):
+    """
+    Selects at most max_points points, thinning dense regions of the plot and keeping all points of sparse ones. Points
+    are binned into a grid and every cell keeps at most the same number of random points.
+
+    :param x: X coordinates of points.
+    :param y: Y coordinates of points.
+    :param max_points: Maximal number of selected points.
+    :param n_bins: Number of bins of the grid along each axis.
+    :param random_state: Random state for reproducibility.
+
+    :returns: Sorted positions of selected points.
+    """
+    if len(x) <= max_points:
+        return np.arange(len(x))
+
+    def bin_of(values):
+        edges = np.linspace(np.min(values), np.max(values), n_bins + 1)
+        return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, n_bins - 1)
+
+    _, cells = np.unique(bin_of(x) * n_bins + bin_of(y), return_inverse=True)
+    counts = np.bincount(cells)
+
+    # Largest number of points per cell which keeps the total within max_points
+    sorted_counts = np.sort(counts)
+    kept_below = np.concatenate([[0], np.cumsum(sorted_counts)[:-1]])
+    totals = kept_below + sorted_counts * (len(sorted_counts) - np.arange(len(sorted_counts)))
+    position = np.searchsorted(totals, max_points, side='right')
+    cap = sorted_counts[position - 1] if position > 0 else 0
+    if position < len(sorted_counts):
+        remaining = max_points - (kept_below[position] if position > 0 else 0)
+        cap = max(cap, remaining // (len(sorted_counts) - position))
+
+    # Random rank of each point within its cell
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(len(cells)), cells))
+    ranks = np.empty(len(cells), dtype=int)
+    ranks[order] = np.arange(len(cells)) - np.concatenate([[0], np.cumsum(counts)[:-1]])[cells[order]]
+
+    if cap == 0:
+        # Fewer points than occupied cells are selected, so a random point is kept in as many random cells as fit
+        return np.sort(rng.choice(np.flatnonzero(ranks == 0), size=max_points, replace=False))
+
+    return np.flatnonzero(ranks < cap)
+
+
+def _plot_scatter(cocktail_df, x, y, title, color_map, large_plot_points=LARGE_PLOT_POINTS,
+                  max_plot_points=MAX_PLOT_POINTS, image_path=None):
+    """
+    Plots cocktails on a scatter plot colored by labels. Large sets of cocktails are rendered with WebGL, with names
+    shown on hover instead of as text, and downsampled by density.
+
+    :param cocktail_df: DataFrame with coordinates, cocktail names and labels.
+    :param x: Name of column with x coordinates.
+    :param y: Name of column with y coordinates.
+    :param title: Plot title.
+    :param color_map: Dictionary mapping labels to colors.
+    :param large_plot_points: Number of cocktails above which the plot is rendered in large mode.
+    :param max_plot_points: Maximal number of cocktails shown in large mode.
+    :param image_path: Path of a static image the plot is written to instead of showing it, requires kaleido.
+    """
+    if len(cocktail_df) <= large_plot_points:
+        fig = px.scatter(cocktail_df, x=x, y=y,
+                         text='cocktail_name',
+                         color='labels',
+                         title=title,
+                         color_discrete_map=color_map,
+                         width=1200,
+                         height=800)
+        fig.update_traces(textposition='top center')
+    else:
+        shown = _downsample_by_density(cocktail_df[x].to_numpy(), cocktail_df[y].to_numpy(), max_plot_points)
+        fig = px.scatter(cocktail_df.iloc[shown], x=x, y=y,
+                         hover_name='cocktail_name',
+                         color='labels',
+                         title=title if len(shown) == len(cocktail_df) else
+                         f'{title} ({len(shown)} of {len(cocktail_df)} cocktails)',
+                         color_discrete_map=color_map,
+                         render_mode='webgl',
+                         width=1200,
+                         height=800)
+        fig.update_traces(marker={'size': 3})
+
+    if image_path is not None:
+        fig.write_image(image_path)
+    else:
+        fig.show()
+
+
+def _embed_tsne(matrix, random_state):
+    """
+    Embeds rows into 2D with Barnes-Hut t-SNE of scikit-learn.
+
+    :param matrix: Array or CSR matrix.
+    :param random_state: Random state for reproducibility.
+
+    :returns: Array of 2D coordinates.
+    """
+    # PCA initialization of t-SNE doesn't support sparse input
+    init = 'random' if sparse.issparse(matrix) else 'pca'
+    return TSNE(random_state=random_state, init=init, method='barnes_hut').fit_transform(matrix)
+
+
+def _embed_fft_tsne(matrix, random_state):
+    """
+    Embeds rows into 2D with FFT-accelerated t-SNE of optional openTSNE package, which scales to much larger matrices
+    than Barnes-Hut t-SNE.
+
+    :param matrix: Array or CSR matrix.
+    :param random_state: Random state for reproducibility.
+
+    :returns: Array of 2D coordinates.
+    """
+    import openTSNE
+
+    tsne = openTSNE.TSNE(n_components=2, negative_gradient_method='fft', random_state=random_state)
+    return np.asarray(tsne.fit(matrix.toarray() if sparse.issparse(matrix) else matrix))
+
+
+# Embedding methods by name, a method takes matrix and random state and returns 2D coordinates of its rows
+EMBEDDING_METHODS = {'tsne': _embed_tsne, 'fft_tsne': _embed_fft_tsne}
 
 
 class Clusterer:
@@ -18,56 +504,90 @@ class Clusterer:
         self.cocktails = cocktails
         self.ingredients = ingredients
         self.cocktails_and_ingredients = cocktails_and_ingredients
+        self.kmeans = None
+        self._affinity_graphs = {}
+        self.quantile_transformer = None
+        self._decompositions = {}
+        self._embeddings = {}
+        self._transformed_columns = None
+        self._transformed_zeros = None
 
-    def generate_cocktails_and_ingredients_matrix_with_volumes(self):
+    def generate_cocktails_and_ingredients_matrix_with_volumes(self, sparse_output=False):
         """
         Generates a matrix of cocktails and ingredients, where each entry is the volume of an ingredient in a cocktail.
 
-        :returns: A pivot table with cocktails as rows, ingredients as columns, and ingredient volumes as values.
+        :param sparse_output: If True, builds a sparse CocktailMatrix directly from integer codes of cocktails and
+                              ingredients instead of a dense pivot table.
+
+        :returns: A pivot table or CocktailMatrix with cocktails as rows, ingredients as columns, and ingredient volumes
+                  as values.
         """
         volume_df = self.cocktails_and_ingredients[['cocktail_name', 'ingredient_name', 'volume_oz']].fillna(0.01)
 
+        if sparse_output:
+            return self._generate_sparse_matrix(volume_df)
+
         cocktail_matrix = volume_df.pivot_table(index='cocktail_name',
                                                 columns='ingredient_name',
                                                 values='volume_oz',
                                                 fill_value=0)
         return cocktail_matrix
 
+    def _generate_sparse_matrix(self, volume_df):
+        """
+        Builds a CSR matrix of volumes, averaging volumes of an ingredient repeated in a cocktail like pivot table does.
+
+        :param volume_df: DataFrame with cocktail names, ingredient names and volumes.
+
+        :returns: CocktailMatrix with rows and columns sorted by name.
+        """
+        rows, cocktail_names = pd.factorize(volume_df['cocktail_name'], sort=True)
+        columns, ingredient_names = pd.factorize(volume_df['ingredient_name'], sort=True)
+        shape = (len(cocktail_names), len(ingredient_names))
+
+        # Duplicated entries are summed up on conversion, so the mean is the sum of volumes divided by the count
+        volumes = sparse.csr_matrix((volume_df['volume_oz'].to_numpy(dtype=float), (rows, columns)), shape=shape)
+        counts = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=shape)
+        volumes.data /= counts.data
+        volumes.eliminate_zeros()
+
+        return CocktailMatrix(volumes, cocktail_names, ingredient_names)
+
     def generate_table_with_cocktails_and_their_main_ingr_type(self):
         """
         Generates a table with each cocktail and its primary alcohol type based on the ingredient with the largest volume.
 
         :returns: DataFrame with columns for cocktail name and primary alcohol type.
         """
-        # Get main alcohol ingredient for each cocktail
-        result_df = self.cocktails_and_ingredients.set_index('cocktail_name').join(
-            self.cocktails.set_index('name')[['abv']],
-            how='left'
-        ).reset_index()  # Reset index to restore 'cocktail_name' as a column
-
-        result_df = self.ingredients[['name', 'type', 'generalized_type']].merge(result_df, left_on='name',
-                                                                                 right_on='ingredient_name',
-                                                                                 how='inner')
+        cocktails_and_ingredients = self.cocktails_and_ingredients
 
-        result_df.dropna(subset=['type'], inplace=True)
-        result_df.drop(columns=['name'], inplace=True)
+        # Types of ingredients looked up by their integer ids, which index ingredients table, cocktails with no typed
+        # ingredients are skipped
+        ingredients = self.ingredients
+        positions = ingredients.index.get_indexer(cocktails_and_ingredients['ingredient_id'])
+        found = positions >= 0
+        types = ingredients['type'].to_numpy()[positions[found]]
+        typed = pd.notna(types)
 
-        result_df.sort_values(by='cocktail_name', ascending=True, inplace=True)
+        # Cocktails are coded by their sorted names, as cocktails of the same name are one cocktail in the result
+        codes, cocktail_names = pd.factorize(cocktails_and_ingredients['cocktail_name'].to_numpy()[found][typed],
+                                             sort=True)
+        alcoholic = ingredients['generalized_type'].to_numpy()[positions[found]][typed] == 'Alcoholic'
+        volumes = pd.Series(cocktails_and_ingredients['volume_oz'].to_numpy(dtype=float)[found][typed][alcoholic])
 
-        max_volume_type_df = (
-            result_df.loc[result_df['generalized_type'] == "Alcoholic"]
-            .sort_values(by=['cocktail_name', 'volume_oz'], ascending=[True, False])
-            .drop_duplicates(subset=['cocktail_name'], keep='first')
-            [['cocktail_name', 'type']]
-        )
-
-        max_volume_type_df.rename(columns={'type': 'primary_alcohol_type'}, inplace=True)
+        # Alcoholic ingredient with the largest volume, the first one when volumes are equal or unknown
+        largest = volumes.fillna(-np.inf).groupby(codes[alcoholic], sort=False).idxmax()
+        primary_types = np.full(len(cocktail_names), np.nan, dtype=object)
+        primary_types[largest.index] = types[typed][alcoholic][largest.to_numpy()]
 
-        result_df = result_df.merge(max_volume_type_df, on='cocktail_name', how='left')
+        # Index of each cocktail is the position of its first row among rows of all cocktails sorted by name, where
+        # each row was repeated for every cocktail of the same name
+        repeats = self.cocktails['name'].value_counts().reindex(cocktail_names, fill_value=1).clip(lower=1)
+        sizes = np.bincount(codes, minlength=len(cocktail_names)) * repeats.to_numpy()
 
-        result_df = result_df[['primary_alcohol_type', 'cocktail_name']]
-        result_df.drop_duplicates(inplace=True)
-        result_df.reset_index(inplace=True)
+        result_df = pd.DataFrame({'index': np.cumsum(sizes) - sizes,
+                                  'primary_alcohol_type': primary_types,
+                                  'cocktail_name': cocktail_names})
         return result_df
 
     def generate_table_with_cocktails_and_style(self):
@@ -91,89 +611,378 @@ class Clusterer:
 
         return encoded_df
 
-    def transform_matrix(self, matrix, random_state=42):
+    def transform_matrix(self, matrix, random_state=42, n_quantiles=None):
         """
-        Transforms the data matrix using Quantile Transformation for scaling.
+        Fits Quantile Transformation on the data matrix and transforms it for scaling. The fitted transformation is kept
+        to project new cocktails with project_matrix, and can be saved with save_transformer.
+
+        For a CocktailMatrix only stored volumes are transformed, and every column is shifted by the transformed value of
+        zero, so that absent ingredients stay zero. A shift of a column doesn't change distances between cocktails.
 
         :param matrix: Original data matrix to transform.
         :param random_state: Random state for reproducibility.
+        :param n_quantiles: Number of quantiles, by default as many as rows up to the size of the subsample quantiles
+                            are estimated on.
+
+        :returns: Transformed matrix as a DataFrame or CocktailMatrix with the same index and columns as input.
+        """
+        # Quantiles are estimated on a subsample of rows, so there can't be more of them than rows in it
+        n_quantiles = min(len(matrix), n_quantiles or QUANTILES_SUBSAMPLE, QUANTILES_SUBSAMPLE)
+        quantile_transformer = QuantileTransformer(random_state=random_state, n_quantiles=n_quantiles,
+                                                   subsample=QUANTILES_SUBSAMPLE)
+        values = _values(matrix)
+        quantile_transformer.fit(values.to_numpy() if isinstance(values, pd.DataFrame) else values)
+
+        self.quantile_transformer = quantile_transformer
+        self._transformed_columns = matrix.columns
+        self._transformed_zeros = (quantile_transformer.transform(np.zeros((1, matrix.shape[1]))).ravel()
+                                   if isinstance(matrix, CocktailMatrix) else None)
+
+        return self._quantile_transform(matrix)
+
+    def project_matrix(self, matrix):
+        """
+        Transforms matrix of new cocktails with the fitted Quantile Transformation, without refitting it. Ingredients
+        unknown to the transformation are dropped and missing ones are treated as absent.
+
+        :param matrix: Data matrix of new cocktails, DataFrame or CocktailMatrix.
+
+        :returns: Transformed matrix of the same kind as the matrix the transformation was fitted on.
+        """
+        if self.quantile_transformer is None:
+            raise ValueError('Quantile Transformation has to be fitted with transform_matrix or loaded before')
+
+        positions = self._transformed_columns.get_indexer(matrix.columns)
+        known = positions >= 0
+
+        if isinstance(matrix, CocktailMatrix):
+            values = matrix.matrix.tocoo()
+        else:
+            values = sparse.coo_matrix(matrix.to_numpy(dtype=float))
+        entries = known[values.col]
+        aligned = sparse.csr_matrix((values.data[entries], (values.row[entries], positions[values.col[entries]])),
+                                    shape=(matrix.shape[0], len(self._transformed_columns)))
+        aligned = CocktailMatrix(aligned, matrix.index, self._transformed_columns)
+
+        if self._transformed_zeros is None:
+            aligned = aligned.to_frame()
+
+        return self._quantile_transform(aligned)
+
+    def _quantile_transform(self, matrix):
+        """
+        Applies the fitted Quantile Transformation to a matrix with the fitted columns.
+
+        :param matrix: DataFrame, or CocktailMatrix if the transformation was fitted on one.
 
-        :returns: Transformed matrix as a DataFrame with the same index and columns as input.
+        :returns: Transformed DataFrame or CocktailMatrix.
         """
-        quantile_transformer = QuantileTransformer(random_state=random_state, n_quantiles=len(matrix))
-        transformed_matrix = quantile_transformer.fit_transform(matrix)
+        values = _values(matrix)
+        transformed_matrix = self.quantile_transformer.transform(
+            values.to_numpy() if isinstance(values, pd.DataFrame) else values)
+
+        if isinstance(matrix, CocktailMatrix):
+            transformed_matrix = sparse.csr_matrix(transformed_matrix)
+            transformed_matrix.data -= self._transformed_zeros[transformed_matrix.indices]
+            transformed_matrix.eliminate_zeros()
+            return CocktailMatrix(transformed_matrix, matrix.index, matrix.columns)
 
         return pd.DataFrame(transformed_matrix, index=matrix.index, columns=matrix.columns)
 
+    def save_transformer(self, path):
+        """
+        Saves the fitted Quantile Transformation with columns it was fitted on to a pickle file.
+
+        :param path: Path of the file.
+        """
+        if self.quantile_transformer is None:
+            raise ValueError('Quantile Transformation has to be fitted with transform_matrix before saving')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'wb') as file:
+            pickle.dump({'quantile_transformer': self.quantile_transformer,
+                         'columns': self._transformed_columns,
+                         'zeros': self._transformed_zeros}, file)
+
+    def load_transformer(self, path):
+        """
+        Loads Quantile Transformation saved with save_transformer, so that new cocktails can be projected without
+        refitting it.
+
+        :param path: Path of the file.
+        """
+        with open(path, 'rb') as file:
+            state = pickle.load(file)
+
+        self.quantile_transformer = state['quantile_transformer']
+        self._transformed_columns = state['columns']
+        self._transformed_zeros = state['zeros']
+
+    def predict_clusters(self, matrix):
+        """
+        Projects new cocktails with the fitted Quantile Transformation and assigns them to clusters of the last K-Means
+        clustering, without refitting either of them.
+
+        :param matrix: Data matrix of new cocktails, DataFrame or CocktailMatrix.
+
+        :returns: Array of cluster labels.
+        """
+        if self.kmeans is None:
+            raise ValueError('Cocktails have to be clustered with K-Means before predicting clusters')
+
+        return self.kmeans.predict(_values(self.project_matrix(matrix)))
+
     def kmeans_clustering(self, transformed_matrix, n_clusters=5, random_state=42):
         """
         Applies K-Means clustering on the transformed matrix.
 
-        :param transformed_matrix: The data matrix to cluster.
+        :param transformed_matrix: The data matrix to cluster, DataFrame or CocktailMatrix.
         :param n_clusters: Number of clusters to form.
         :param random_state: Random state for reproducibility.
 
         :returns: Array of cluster labels.
         """
         kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
-        clusters = kmeans.fit_predict(transformed_matrix)
+        clusters = kmeans.fit_predict(_values(transformed_matrix))
+        self.kmeans = kmeans
 
         return clusters
 
-    def spectral_clustering(self, transformed_matrix, n_clusters=5, random_state=42):
+    def minibatch_kmeans_clustering(self, blocks, n_clusters=5, batch_size=1024, n_epochs=1, random_state=42):
+        """
+        Applies Mini-Batch K-Means clustering reading the matrix in blocks of rows, so that it doesn't have to fit in
+        memory. The fitted model is kept to label new cocktails with update_kmeans_clustering.
+
+        :param blocks: The data matrix to cluster (DataFrame, CocktailMatrix or memory-mapped array), or a function
+                       returning a fresh iterator over its blocks of rows (arrays or sparse matrices), as blocks are
+                       read once per epoch and once more to assign labels.
+        :param n_clusters: Number of clusters to form.
+        :param batch_size: Number of rows in each update of cluster centers.
+        :param n_epochs: Number of passes over the matrix.
+        :param random_state: Random state for reproducibility.
+
+        :returns: Array of cluster labels.
+        """
+        if callable(blocks):
+            iter_blocks = blocks
+        else:
+            def iter_blocks():
+                return _iter_row_chunks(blocks, batch_size)
+
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state)
+        for _ in range(n_epochs):
+            for block in iter_blocks():
+                for batch in _iter_row_chunks(block, batch_size):
+                    kmeans.partial_fit(batch)
+        self.kmeans = kmeans
+
+        return np.concatenate([kmeans.predict(block) for block in iter_blocks()])
+
+    def update_kmeans_clustering(self, transformed_matrix):
+        """
+        Updates cluster centers of Mini-Batch K-Means with new cocktails and assigns them to clusters. Labels of
+        cocktails clustered before aren't recomputed.
+
+        :param transformed_matrix: The data matrix of new cocktails, with the same columns as the clustered matrix.
+
+        :returns: Array of cluster labels of new cocktails.
+        """
+        if not isinstance(self.kmeans, MiniBatchKMeans):
+            raise ValueError('Cocktails have to be clustered with minibatch_kmeans_clustering before update')
+
+        batches = list(_iter_row_chunks(transformed_matrix, self.kmeans.batch_size))
+        for batch in batches:
+            self.kmeans.partial_fit(batch)
+
+        return np.concatenate([self.kmeans.predict(batch) for batch in batches])
+
+    def affinity_graph(self, transformed_matrix, n_neighbors=10):
+        """
+        Builds the symmetric k-nearest neighbors affinity graph used by spectral clustering, the same graph which
+        SpectralClustering builds with affinity='nearest_neighbors'. Graphs are cached per contents of the matrix, so
+        that it is built once for all numbers of clusters.
+
+        :param transformed_matrix: The data matrix, DataFrame or CocktailMatrix.
+        :param n_neighbors: Number of neighbors of each cocktail.
+
+        :returns: Sparse affinity matrix of cocktails.
+        """
+        key = (_fingerprint(transformed_matrix), n_neighbors)
+        if key not in self._affinity_graphs:
+            connectivity = kneighbors_graph(_values(transformed_matrix), n_neighbors=n_neighbors, include_self=True)
+            self._affinity_graphs[key] = 0.5 * (connectivity + connectivity.T)
+
+        return self._affinity_graphs[key]
+
+    def spectral_clustering(self, transformed_matrix, n_clusters=5, random_state=42, precomputed_graph=False,
+                            n_neighbors=10, eigen_solver=None):
         """
         Applies Spectral clustering on the transformed matrix.
 
-        :param transformed_matrix: The data matrix to cluster.
+        :param transformed_matrix: The data matrix to cluster, DataFrame or CocktailMatrix.
         :param n_clusters: Number of clusters to form.
         :param random_state: Random state for reproducibility.
+        :param precomputed_graph: If True, reuses the cached affinity graph of the matrix instead of building it again.
+        :param n_neighbors: Number of neighbors in the affinity graph.
+        :param eigen_solver: Eigensolver of the graph Laplacian, 'arpack', 'lobpcg' or 'amg'. By default 'arpack', or
+                             with precomputed graph 'amg' if pyamg is installed and 'lobpcg' otherwise.
 
         :returns: Array of cluster labels.
         """
-        spectral = SpectralClustering(n_clusters=n_clusters, affinity='nearest_neighbors', random_state=random_state)
-        clusters = spectral.fit_predict(transformed_matrix)
+        if not precomputed_graph:
+            spectral = SpectralClustering(n_clusters=n_clusters, affinity='nearest_neighbors', n_neighbors=n_neighbors,
+                                          eigen_solver=eigen_solver, random_state=random_state)
+            return spectral.fit_predict(_values(transformed_matrix))
+
+        spectral = SpectralClustering(n_clusters=n_clusters, affinity='precomputed',
+                                      eigen_solver=eigen_solver or _default_eigen_solver(), random_state=random_state)
+        clusters = spectral.fit_predict(self.affinity_graph(transformed_matrix, n_neighbors))
 
         return clusters
 
-    def plot_pca_decomposition(self, transformed_matrix, labels, color_map, title):
+    def sweep_n_clusters(self, transformed_matrix, n_clusters_range=range(2, 11), algorithms=('kmeans', 'spectral'),
+                         criterion='silhouette', silhouette_sample_size=10_000, n_neighbors=10, n_jobs=None,
+                         random_state=42):
+        """
+        Clusters the transformed matrix with every algorithm and number of clusters, in a pool of processes which read
+        the matrix and the affinity graph from shared memory, and evaluates each clustering.
+
+        :param transformed_matrix: The data matrix to cluster, DataFrame or CocktailMatrix.
+        :param n_clusters_range: Numbers of clusters to try.
+        :param algorithms: Algorithms to try, 'kmeans' and/or 'spectral'.
+        :param criterion: Metric used to pick the best clustering, 'silhouette' (maximized) or 'davies_bouldin'
+                          (minimized).
+        :param silhouette_sample_size: Maximal number of cocktails silhouette is computed on.
+        :param n_neighbors: Number of neighbors in the affinity graph of spectral clustering.
+        :param n_jobs: Number of worker processes, everything runs in current process if None or 1.
+        :param random_state: Random state for reproducibility.
+
+        :returns: DataFrame with inertia, silhouette, Davies-Bouldin index and time taken of each clustering, and
+                  array of labels of the best one.
         """
-        Reduces data to 2D using PCA and plots it.
+        matrix = _values(transformed_matrix)
+        matrix = matrix.to_numpy(dtype=float) if isinstance(matrix, pd.DataFrame) else matrix
+        graph = self.affinity_graph(transformed_matrix, n_neighbors).tocsr() if 'spectral' in algorithms else None
+        tasks = [(algorithm, n_clusters) for algorithm in algorithms for n_clusters in n_clusters_range]
+
+        if n_jobs is None or n_jobs == 1:
+            _SWEEP_DATA.update(matrix=matrix, graph=graph)
+            try:
+                runs = [_run_sweep_task(algorithm, n_clusters, random_state, silhouette_sample_size)
+                        for algorithm, n_clusters in tasks]
+            finally:
+                _SWEEP_DATA.clear()
+        else:
+            blocks = []
+            try:
+                matrix_description = _share_matrix(matrix, blocks)
+                graph_description = None if graph is None else _share_matrix(graph, blocks)
+
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_sweep_worker,
+                                         initargs=(matrix_description, graph_description)) as executor:
+                    runs = list(executor.map(_run_sweep_task, *zip(*tasks), [random_state] * len(tasks),
+                                             [silhouette_sample_size] * len(tasks)))
+            finally:
+                for block in blocks:
+                    block.close()
+                    block.unlink()
+
+        results = pd.DataFrame(runs)
+        if criterion == 'silhouette':
+            best = results['silhouette'].idxmax()
+        else:
+            best = results['davies_bouldin'].idxmin()
+
+        return results.drop(columns='labels'), results.at[best, 'labels']
+
+    def decompose(self, transformed_matrix, n_components=None, method='auto', batch_size=10_000, random_state=42):
+        """
+        Decomposes the transformed matrix into principal components. Decompositions are cached per contents of the
+        matrix, method and number of components, so plot_pca_decomposition, plot_scree_plot and embed reuse the ones
+        they ask for regardless of what was decomposed before.
+
+        :param transformed_matrix: The data matrix to decompose, DataFrame or CocktailMatrix.
+        :param n_components: Number of components, all for 'full' method and DEFAULT_N_COMPONENTS for the others
+                             by default.
+        :param method: 'full' PCA, 'randomized' SVD which doesn't densify sparse matrices, 'incremental' PCA over
+                       chunks of rows, or 'auto' to use full PCA for matrices with at most
+                       FULL_DECOMPOSITION_MAX_COLUMNS columns and randomized SVD otherwise.
+        :param batch_size: Number of rows in a chunk of incremental PCA.
+        :param random_state: Random state for reproducibility.
 
-        :param transformed_matrix: The data matrix to reduce and plot.
+        :returns: Decomposition with coordinates of cocktails and explained variance ratio of components.
+        """
+        if method == 'auto':
+            method = 'full' if transformed_matrix.shape[1] <= FULL_DECOMPOSITION_MAX_COLUMNS else 'randomized'
+        if n_components is None and method != 'full':
+            n_components = DEFAULT_N_COMPONENTS
+        if n_components is not None:
+            n_components = min(n_components, *transformed_matrix.shape)
+
+        key = (_fingerprint(transformed_matrix), method, n_components)
+        if key in self._decompositions:
+            return self._decompositions[key]
+
+        values = _values(transformed_matrix)
+        values = values.to_numpy(dtype=float) if isinstance(values, pd.DataFrame) else values
+
+        if method == 'full':
+            # Full decomposition of sparse input goes through the covariance matrix of ingredients, which is small
+            pca = PCA(n_components=n_components, svd_solver='covariance_eigh' if sparse.issparse(values) else 'auto')
+            coordinates = pca.fit_transform(values)
+            explained_variance_ratio = pca.explained_variance_ratio_
+        elif method == 'randomized':
+            coordinates, explained_variance_ratio = _randomized_pca(values, n_components, random_state=random_state)
+        elif method == 'incremental':
+            # Each chunk has to have at least as many rows as there are components
+            batch_size = max(batch_size, n_components)
+            pca = IncrementalPCA(n_components=n_components, batch_size=batch_size)
+            for chunk in _iter_row_chunks(values, batch_size):
+                pca.partial_fit(chunk.toarray() if sparse.issparse(chunk) else chunk)
+            coordinates = np.vstack([pca.transform(chunk.toarray() if sparse.issparse(chunk) else chunk)
+                                     for chunk in _iter_row_chunks(values, batch_size)])
+            explained_variance_ratio = pca.explained_variance_ratio_
+        else:
+            raise ValueError(f'Unknown decomposition method {method}')
+
+        decomposition = Decomposition(coordinates, explained_variance_ratio, method, n_components)
+        self._decompositions[key] = decomposition
+
+        return decomposition
+
+    def plot_pca_decomposition(self, transformed_matrix, labels, color_map, title,
+                               large_plot_points=LARGE_PLOT_POINTS, max_plot_points=MAX_PLOT_POINTS, image_path=None):
+        """
+        Reduces data to 2D using PCA and plots it. Reuses decomposition with default parameters of decompose, which
+        for matrices with at most FULL_DECOMPOSITION_MAX_COLUMNS columns is the one of plot_scree_plot.
+
+        :param transformed_matrix: The data matrix to reduce and plot, DataFrame or CocktailMatrix.
         :param labels: Cluster labels for coloring.
         :param color_map: Dictionary mapping labels to colors.
         :param title: Plot title.
+        :param large_plot_points: Number of cocktails above which the plot is rendered with WebGL and hover names.
+        :param max_plot_points: Maximal number of cocktails shown, denser regions are downsampled.
+        :param image_path: Path of a static image the plot is written to instead of showing it, requires kaleido.
         """
-        pca = PCA(n_components=2)
-        cocktail_coords = pca.fit_transform(transformed_matrix)
+        cocktail_coords = self.decompose(transformed_matrix).coordinates[:, :2]
 
         cocktail_df = pd.DataFrame(cocktail_coords, columns=['PC1', 'PC2'])
         cocktail_df['cocktail_name'] = transformed_matrix.index
         cocktail_df['labels'] = labels  # Add cluster labels
 
-        fig = px.scatter(
-            cocktail_df, x='PC1', y='PC2',
-            text='cocktail_name',
-            color='labels',
-            title=title,
-            color_discrete_map=color_map,
-            width=1200,
-            height=800
-        )
-
-        fig.update_traces(textposition='top center')
-        fig.show()
+        _plot_scatter(cocktail_df, 'PC1', 'PC2', title, color_map, large_plot_points, max_plot_points, image_path)
 
     def plot_scree_plot(self, transformed_matrix):
         """
-        Generates a scree plot of explained variance by each principal component using PCA.
+        Generates a scree plot of explained variance by each principal component using PCA. Always shows the full
+        spectrum, reusing full decomposition of decompose if it was computed before.
 
-        :param transformed_matrix: The data matrix to analyze.
+        :param transformed_matrix: The data matrix to analyze, DataFrame or CocktailMatrix.
         """
-        pca = PCA()
-        pca.fit(transformed_matrix)
-
-        explained_variance = pca.explained_variance_ratio_
+        explained_variance = self.decompose(transformed_matrix, method='full').explained_variance_ratio
 
         plt.figure(figsize=(25, 6))
         plt.bar(np.arange(1, len(explained_variance) + 1), explained_variance, color='skyblue', edgecolor='black')
@@ -184,31 +993,94 @@ class Clusterer:
         plt.grid(True, axis='y')
         plt.show()
 
-    def plot_tsne_decomposition(self, transformed_matrix, labels, color_map, title, random_state=42):
+    def embed(self, transformed_matrix, method='tsne', n_pca_components=50, sample_size=None, n_neighbors=5,
+              random_state=42):
+        """
+        Embeds the transformed matrix into 2D. The matrix is first reduced with PCA computed by decompose, then the
+        embedding is fitted on all cocktails, or on a random sample of them with the rest placed at the
+        distance-weighted mean of embeddings of their nearest sampled neighbors. Embeddings are cached per contents of
+        the matrix and parameters.
+
+        :param transformed_matrix: The data matrix to embed, DataFrame or CocktailMatrix.
+        :param method: Name of embedding method in EMBEDDING_METHODS, 'tsne' or 'fft_tsne' (requires openTSNE).
+        :param n_pca_components: Number of principal components the embedding is fitted on, None to fit it on the
+                                 matrix itself.
+        :param sample_size: Number of cocktails the embedding is fitted on, all by default.
+        :param n_neighbors: Number of nearest sampled neighbors used to place the rest of cocktails.
+        :param random_state: Random state for reproducibility.
+
+        :returns: Embedding with 2D coordinates of cocktails and seconds taken by PCA, fitting and interpolation.
+        """
+        key = (_fingerprint(transformed_matrix), method, n_pca_components, sample_size, n_neighbors, random_state)
+        if key in self._embeddings:
+            return self._embeddings[key]
+
+        embed = EMBEDDING_METHODS[method]
+        timings = {}
+
+        start = time.perf_counter()
+        if n_pca_components is None:
+            matrix = _values(transformed_matrix)
+            matrix = matrix.to_numpy(dtype=float) if isinstance(matrix, pd.DataFrame) else matrix
+        else:
+            matrix = self.decompose(transformed_matrix, n_components=n_pca_components).coordinates[:, :n_pca_components]
+        timings['pca_s'] = time.perf_counter() - start
+
+        n_rows = matrix.shape[0]
+        if sample_size is None or sample_size >= n_rows:
+            start = time.perf_counter()
+            coordinates = embed(matrix, random_state)
+            timings['fit_s'] = time.perf_counter() - start
+            timings['interpolation_s'] = 0.0
+        else:
+            rng = np.random.default_rng(random_state)
+            sample = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+            rest = np.setdiff1d(np.arange(n_rows), sample)
+
+            start = time.perf_counter()
+            coordinates = np.empty((n_rows, 2))
+            coordinates[sample] = embed(matrix[sample], random_state)
+            timings['fit_s'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            distances, neighbors = NearestNeighbors(n_neighbors=n_neighbors).fit(matrix[sample]).kneighbors(
+                matrix[rest])
+            # Cocktails equal to a sampled one get its position
+            weights = 1 / np.maximum(distances, 1e-12)
+            weights /= weights.sum(axis=1, keepdims=True)
+            coordinates[rest] = np.einsum('ij,ijk->ik', weights, coordinates[sample][neighbors])
+            timings['interpolation_s'] = time.perf_counter() - start
+
+        embedding = Embedding(coordinates, timings)
+        self._embeddings[key] = embedding
+
+        return embedding
+
+    def plot_tsne_decomposition(self, transformed_matrix, labels, color_map, title, random_state=42, method='tsne',
+                                n_pca_components=None, sample_size=None, large_plot_points=LARGE_PLOT_POINTS,
+                                max_plot_points=MAX_PLOT_POINTS, image_path=None):
         """
         Reduces data to 2D using t-SNE and plots it.
 
-        :param transformed_matrix: The data matrix to reduce and plot.
+        :param transformed_matrix: The data matrix to reduce and plot, DataFrame or CocktailMatrix.
         :param labels: Cluster labels for coloring.
         :param color_map: Dictionary mapping labels to colors.
         :param title: Plot title.
         :param random_state: Random state for reproducibility.
+        :param method: Name of embedding method, see embed.
+        :param n_pca_components: Number of principal components t-SNE is fitted on, e.g. 50 to speed it up on large
+                                 matrices, None to fit it on the matrix itself.
+        :param sample_size: Number of cocktails t-SNE is fitted on, the rest is interpolated, all by default.
+        :param large_plot_points: Number of cocktails above which the plot is rendered with WebGL and hover names.
+        :param max_plot_points: Maximal number of cocktails shown, denser regions are downsampled.
+        :param image_path: Path of a static image the plot is written to instead of showing it, requires kaleido.
         """
-        tsne = TSNE(random_state=random_state)
-        cocktails_coords = tsne.fit_transform(transformed_matrix)
+        embedding = self.embed(transformed_matrix, method=method, n_pca_components=n_pca_components,
+                               sample_size=sample_size, random_state=random_state)
+        cocktails_coords = embedding.coordinates
 
         cocktail_df = pd.DataFrame(cocktails_coords, columns=['x', 'y'])
         cocktail_df['cocktail_name'] = transformed_matrix.index
         cocktail_df['labels'] = labels
 
-        #
-        fig = px.scatter(cocktail_df, x='x', y='y',
-                         text='cocktail_name',
-                         color='labels',
-                         title=title,
-                         color_discrete_map=color_map,
-                         width=1200,
-                         height=800)
-
-        fig.update_traces(textposition='top center')
-        fig.show()
+        _plot_scatter(cocktail_df, 'x', 'y', title, color_map, large_plot_points, max_plot_points, image_path)
@@ -1,68 +1,1045 @@
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 import pulp
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
 from collections import defaultdict
 
+# Number of set bits of every byte, used to count bits of packed masks
+_BYTE_POPCOUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+# Inventories are queried in blocks of this many, which bounds memory of bitsets of cocktails
+_INVENTORY_BLOCK_SIZE = 64 * 256
+
+# Backends solving the ingredients problem which can be selected by name
+SOLVERS = {'cbc', 'highs', 'heuristic'}
+
+# Time budget of the heuristic in seconds when no time limit is given, it usually stops much earlier
+DEFAULT_HEURISTIC_TIME_LIMIT = 1.
+
+# Number of restarts of the heuristic in a row without a better selection after which it stops
+DEFAULT_HEURISTIC_MAX_STALLS = 20
+
+# Optimizer solving scenarios in a worker process, set once by the pool initializer
+_SCENARIO_OPTIMIZER = None
+
+
+def _popcount(masks):
+    """
+    Counts set bits of packed masks along the last axis
+    :param masks: Array of uint64 words
+    :return: Array of counts with the last axis removed
+    """
+    return _BYTE_POPCOUNTS[masks.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def _pack_bits(rows, positions, n_rows, n_bits):
+    """
+    Packs sets of positions into bitmasks
+    :param rows: Row of mask of each position
+    :param positions: Positions of set bits
+    :param n_rows: Number of masks
+    :param n_bits: Number of bits of a mask
+    :return: Array of masks with a row of uint64 words per set
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    masks = np.zeros((n_rows, max(1, (n_bits + 63) // 64)), dtype=np.uint64)
+    bits = np.left_shift(np.uint64(1), (positions % 64).astype(np.uint64))
+    np.bitwise_or.at(masks, (np.asarray(rows, dtype=np.int64), positions // 64), bits)
+    return masks
+
+
+class RecipeIndex:
+    """
+    A class used to answer which cocktails can be made from given inventories of ingredients. Each recipe is a bitmask
+    over integer codes of ingredients packed into uint64 words. Batches of inventories are transposed into a bitmask
+    over inventories for each ingredient, so a recipe is checked against 64 inventories with one operation per word
+    """
+    def __init__(self, cocktails_and_ingredients):
+        """
+        Compiles recipes, cocktails of the same name are one recipe with ingredients of all of them
+        :param cocktails_and_ingredients: Cocktails and ingredients dataframe
+        """
+        ingredient_codes, self.ingredient_ids = pd.factorize(cocktails_and_ingredients['ingredient_id'], sort=True)
+        cocktail_codes, self.cocktail_names = pd.factorize(cocktails_and_ingredients['cocktail_name'], sort=True)
+
+        names = pd.Series(cocktails_and_ingredients['ingredient_name'].to_numpy(), index=ingredient_codes)
+        self.ingredient_names = names[~names.index.duplicated()].sort_index().to_numpy()
+        self._codes = {**{name: code for code, name in enumerate(self.ingredient_names)},
+                       **{ingredient_id: code for code, ingredient_id in enumerate(self.ingredient_ids)}}
+
+        self.masks = _pack_bits(cocktail_codes, ingredient_codes, len(self.cocktail_names), len(self.ingredient_ids))
+        self.sizes = _popcount(self.masks)
+
+        # Codes of ingredients of each recipe, padded with a code of an ingredient present in every inventory
+        recipes = pd.DataFrame({'cocktail': cocktail_codes, 'ingredient': ingredient_codes}).drop_duplicates()
+        recipes = recipes.sort_values(['cocktail', 'ingredient'])
+        slots = recipes.groupby('cocktail').cumcount().to_numpy()
+        self._recipe_codes = np.full((len(self.cocktail_names), slots.max(initial=-1) + 1), len(self.ingredient_ids))
+        self._recipe_codes[recipes['cocktail'].to_numpy(), slots] = recipes['ingredient'].to_numpy()
+
+    def __len__(self):
+        return len(self.cocktail_names)
+
+    def pairs(self):
+        """
+        Lists distinct pairs of cocktails and their ingredients
+        :return: Arrays of cocktail codes and ingredient codes
+        """
+        cocktail_codes, slots = np.nonzero(self._recipe_codes < len(self.ingredient_ids))
+        return cocktail_codes, self._recipe_codes[cocktail_codes, slots]
+
+    def _inventory_codes(self, inventories):
+        """
+        Looks up codes of ingredients of inventories, ingredients unknown to the index are ignored as no recipe needs
+        them
+        :param inventories: List of inventories, each a collection of ingredient names or ids
+        :return: Arrays of inventory positions and ingredient codes
+        """
+        rows, ingredient_codes = [], []
+        for row, inventory in enumerate(inventories):
+            for ingredient in inventory:
+                code = self._codes.get(ingredient)
+                if code is not None:
+                    rows.append(row)
+                    ingredient_codes.append(code)
+
+        return np.array(rows, dtype=np.int64), np.array(ingredient_codes, dtype=np.int64)
+
+    def encode(self, inventories):
+        """
+        Packs inventories into bitmasks over ingredients, like recipes
+        :param inventories: List of inventories, each a collection of ingredient names or ids
+        :return: Array of masks with a row of uint64 words per inventory
+        """
+        rows, ingredient_codes = self._inventory_codes(inventories)
+        return _pack_bits(rows, ingredient_codes, len(inventories), len(self.ingredient_ids))
+
+    def _missing_thresholds(self, inventories, max_missing):
+        """
+        Compares inventories with all recipes. For each threshold j up to max_missing, computes a bitmask over
+        inventories of each recipe, whose bits are set for inventories missing more than j of its ingredients
+        :param inventories: List of inventories
+        :param max_missing: Largest threshold
+        :return: List of arrays of bitmasks with a row per cocktail, one array per threshold
+        """
+        rows, ingredient_codes = self._inventory_codes(inventories)
+
+        # Bitmask over inventories of each ingredient, and of the padding ingredient present in all inventories
+        present = _pack_bits(ingredient_codes, rows, len(self.ingredient_ids) + 1, len(inventories))
+        present[-1] = ~np.uint64(0)
+
+        exceeded = [np.zeros((len(self), present.shape[1]), dtype=np.uint64) for _ in range(max_missing + 1)]
+        for slot in range(self._recipe_codes.shape[1]):
+            missing = ~present[self._recipe_codes[:, slot]]
+            # Counts of missing ingredients are kept in unary code, saturated at max_missing + 1
+            for threshold in range(max_missing, 0, -1):
+                exceeded[threshold] |= exceeded[threshold - 1] & missing
+            exceeded[0] |= missing
+
+        return exceeded
+
+    def _unpack(self, masks, n_inventories):
+        """
+        Unpacks bitmasks over inventories of each recipe
+        :param masks: Array of bitmasks with a row per cocktail
+        :param n_inventories: Number of inventories
+        :return: Boolean array with a row per inventory and a column per cocktail
+        """
+        bits = np.unpackbits(masks.view(np.uint8), axis=1, bitorder='little')
+        return bits[:, :n_inventories].T.astype(bool)
+
+    def missing_counts(self, inventories, max_missing=0):
+        """
+        Counts ingredients of each recipe missing from each inventory, counting up to max_missing + 1
+        :param inventories: List of inventories, each a collection of ingredient names or ids
+        :param max_missing: Largest count of missing ingredients which is exact, larger counts are max_missing + 1
+        :return: Array of counts with a row per inventory and a column per cocktail
+        """
+        counts = np.zeros((len(inventories), len(self)), dtype=np.int64)
+        for start in range(0, len(inventories), _INVENTORY_BLOCK_SIZE):
+            block = inventories[start:start + _INVENTORY_BLOCK_SIZE]
+            for masks in self._missing_thresholds(block, max_missing):
+                counts[start:start + len(block)] += self._unpack(masks, len(block))
+
+        return counts
+
+    def makeable(self, inventories, max_missing=0):
+        """
+        Finds cocktails which can be made from each inventory with at most max_missing ingredients bought
+        :param inventories: List of inventories, each a collection of ingredient names or ids
+        :param max_missing: Number of ingredients which may be missing, 0 for cocktails makeable right away
+        :return: Boolean array with a row per inventory and a column per cocktail
+        """
+        return self.missing_counts(inventories, max_missing) <= max_missing
+
+    def query(self, inventories, max_missing=0):
+        """
+        Lists cocktails which can be made from each inventory with at most max_missing ingredients bought
+        :param inventories: List of inventories, each a collection of ingredient names or ids
+        :param max_missing: Number of ingredients which may be missing
+        :return: Dataframe with inventory position, cocktail name and number of missing ingredients, sorted by
+        inventory, number of missing ingredients and cocktail name
+        """
+        counts = self.missing_counts(inventories, max_missing)
+        inventory_rows, cocktail_codes = np.nonzero(counts <= max_missing)
+        missing = counts[inventory_rows, cocktail_codes]
+        order = np.lexsort((cocktail_codes, missing, inventory_rows))
+
+        return pd.DataFrame({'inventory': inventory_rows[order],
+                             'cocktail_name': self.cocktail_names[cocktail_codes[order]],
+                             'missing': missing[order]})
+
+    def missing_ingredients(self, inventory, cocktail_name):
+        """
+        Lists ingredients of a cocktail missing from an inventory
+        :param inventory: Collection of ingredient names or ids
+        :param cocktail_name:
+        :return: List of names of missing ingredients
+        """
+        mask = self.masks[self.cocktail_names.get_loc(cocktail_name)] & ~self.encode([inventory])[0]
+        bits = np.unpackbits(mask.view(np.uint8), bitorder='little')
+        return list(self.ingredient_names[np.flatnonzero(bits)])
+
+
+def _selection_mask(recipes, selected):
+    """
+    Packs a selection of ingredients into a bitmask, like recipes
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :return: Array of uint64 words
+    """
+    codes = np.flatnonzero(selected)
+    return _pack_bits(np.zeros(len(codes)), codes, 1, len(recipes.ingredient_ids))[0]
+
+
+def _missing_counts(recipes, selected):
+    """
+    Counts ingredients of each recipe missing from a selection
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :return: Array of counts over cocktail codes
+    """
+    return _popcount(recipes.masks & ~_selection_mask(recipes, selected))
+
+
+def _selection_scores(recipes, selected):
+    """
+    Scores adding each ingredient to a selection by the cocktails it brings closer to makeable, a cocktail missing k
+    ingredients counting 1 / 2^(k - 1), so cocktails which become makeable count 1. Scores removing each ingredient by
+    number of makeable cocktails which use it
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :return: Arrays of scores of adding and of losses of removing over ingredient codes
+    """
+    counts = _missing_counts(recipes, selected)
+    cocktail_codes, ingredient_codes = recipes.pairs()
+    pair_counts = counts[cocktail_codes]
+    missing = ~selected[ingredient_codes]
+
+    scores = np.bincount(ingredient_codes[missing], weights=0.5 ** (pair_counts[missing] - 1.),
+                         minlength=len(recipes.ingredient_ids))
+    losses = np.bincount(ingredient_codes[pair_counts == 0], minlength=len(recipes.ingredient_ids))
+    return scores, losses
+
+
+def _adjust_selection(recipes, selected, num_ingredients, excluded=None, fixed=None):
+    """
+    Greedily adds ingredients with the largest score to a selection, or removes ingredients with the smallest loss,
+    until it has num_ingredients ingredients. Ties are broken by number of cocktails using an ingredient
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :param num_ingredients:
+    :param excluded: Boolean array over ingredient codes which must not be added, None to allow all
+    :param fixed: Boolean array over ingredient codes which must not be removed, None to allow all
+    :return: Adjusted boolean array over ingredient codes
+    """
+    selected = selected.copy()
+    excluded = np.zeros_like(selected) if excluded is None else excluded & ~selected
+    fixed = np.zeros_like(selected) if fixed is None else fixed & selected
+    num_ingredients = min(max(num_ingredients, fixed.sum()), len(selected) - excluded.sum())
+
+    usage = np.bincount(recipes.pairs()[1], minlength=len(recipes.ingredient_ids))
+    tie_breaker = usage / (usage.max(initial=0) + 1)
+
+    while selected.sum() != num_ingredients:
+        scores, losses = _selection_scores(recipes, selected)
+        if selected.sum() < num_ingredients:
+            selected[np.argmax(np.where(selected | excluded, -np.inf, scores + tie_breaker))] = True
+        else:
+            selected[np.argmin(np.where(selected & ~fixed, losses + tie_breaker, np.inf))] = False
+
+    return selected
+
+
+def _greedy_selection(recipes, selected, num_ingredients, deadline=np.inf, rng=None):
+    """
+    Greedily completes cocktails, each time the one whose missing ingredients make the most cocktails makeable per
+    ingredient, among cocktails missing the fewest ingredients. Cocktails made makeable by missing ingredients of a
+    cocktail are those whose missing ingredients are a subset of them, found by overlaps of missing ingredients. The
+    rest of the budget is filled by _adjust_selection, or at once by scores of ingredients when time runs out
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes to start from
+    :param num_ingredients:
+    :param deadline: Value of time.perf_counter after which cocktails are no longer completed
+    :param rng: Random generator which randomizes ties, None for deterministic ties
+    :return: Boolean array over ingredient codes
+    """
+    selected = selected.copy()
+    cocktail_codes, ingredient_codes = recipes.pairs()
+
+    while selected.sum() < num_ingredients and time.perf_counter() < deadline:
+        counts = _missing_counts(recipes, selected)
+        budget = num_ingredients - selected.sum()
+        open_counts = counts[(counts > 0) & (counts <= budget)]
+        if len(open_counts) == 0:
+            break
+
+        candidates = np.flatnonzero((counts > 0) & (counts <= min(budget, open_counts.min() + 1)))
+        positions = np.full(len(recipes), -1)
+        positions[candidates] = np.arange(len(candidates))
+        missing = (positions[cocktail_codes] >= 0) & ~selected[ingredient_codes]
+        incidence = sparse.csr_matrix((np.ones(missing.sum()), (positions[cocktail_codes[missing]],
+                                                                ingredient_codes[missing])),
+                                      shape=(len(candidates), len(selected)))
+
+        overlaps = (incidence @ incidence.T).tocoo()
+        contained = overlaps.data == counts[candidates][overlaps.row]
+        gains = np.bincount(overlaps.col[contained], minlength=len(candidates))
+
+        # Ties are broken by scores of the missing ingredients, which favour cocktails close to many others
+        scores = incidence @ _selection_scores(recipes, selected)[0]
+        if rng is not None:
+            scores = scores * rng.random(len(scores))
+        best = np.lexsort((-scores, -gains, -gains / counts[candidates]))[0]
+        selected[incidence[best].indices] = True
+
+    if selected.sum() < num_ingredients and time.perf_counter() >= deadline:
+        # Out of time, the rest is filled at once with ingredients of the largest scores
+        scores = np.where(selected, -np.inf, _selection_scores(recipes, selected)[0])
+        selected[np.argsort(-scores, kind='stable')[:num_ingredients - selected.sum()]] = True
+
+    return _adjust_selection(recipes, selected, num_ingredients)
+
+
+def _best_swap(recipes, selected):
+    """
+    Finds the swap of a selected ingredient for an unselected one which makes the most cocktails makeable. Swapping i
+    for j gains cocktails missing only j which do not use i, and loses makeable cocktails which use i
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :return: Codes of removed and added ingredient, and change of number of makeable cocktails
+    """
+    counts = _missing_counts(recipes, selected)
+    cocktail_codes, ingredient_codes = recipes.pairs()
+    pair_counts = counts[cocktail_codes]
+    pair_selected = selected[ingredient_codes]
+    n_ingredients = len(recipes.ingredient_ids)
+
+    gains = np.bincount(ingredient_codes[(pair_counts == 1) & ~pair_selected], minlength=n_ingredients)
+    losses = np.bincount(ingredient_codes[pair_counts == 0], minlength=n_ingredients)
+
+    # Missing ingredient of each cocktail missing one, and selected ingredients of these cocktails
+    missing_ingredient = np.zeros(len(recipes), dtype=np.int64)
+    missing_ingredient[cocktail_codes[(pair_counts == 1) & ~pair_selected]] = \
+        ingredient_codes[(pair_counts == 1) & ~pair_selected]
+    shared = (pair_counts == 1) & pair_selected
+
+    selected_codes = np.flatnonzero(selected)
+    positions = np.cumsum(selected) - 1
+    conflicts = np.bincount(positions[ingredient_codes[shared]] * n_ingredients
+                            + missing_ingredient[cocktail_codes[shared]],
+                            minlength=len(selected_codes) * n_ingredients).reshape(len(selected_codes), n_ingredients)
+
+    deltas = np.where(selected, -np.inf, gains - conflicts - losses[selected_codes, None])
+    removed, added = np.unravel_index(np.argmax(deltas), deltas.shape)
+    return selected_codes[removed], added, deltas[removed, added]
+
+
+def _improve_by_swaps(recipes, selected, deadline):
+    """
+    Local search which applies the best improving swap of ingredients until there is none or time runs out
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :param deadline: Value of time.perf_counter after which the search stops
+    :return: Improved boolean array over ingredient codes
+    """
+    selected = selected.copy()
+    while 0 < selected.sum() < len(selected) and time.perf_counter() < deadline:
+        removed, added, delta = _best_swap(recipes, selected)
+        if delta <= 0:
+            break
+        selected[removed], selected[added] = False, True
+
+    return selected
+
+
+def _heuristic_selection(recipes, num_ingredients, time_limit=1., random_state=42, start=None,
+                         max_stalls=DEFAULT_HEURISTIC_MAX_STALLS, bound=None):
+    """
+    Selects ingredients with iterated local search. A greedy selection is improved with swaps. Then repeatedly missing
+    ingredients of a random cocktail, likely one missing few, are forced into the best selection, ingredients with the
+    smallest loss are removed, and the result is improved again and kept if it is at least as good as the best. The
+    search stops when the selection reaches the LP bound, which proves it optimal, after max_stalls restarts in a row
+    without a better selection, or at the time limit, whichever comes first
+    :param recipes: RecipeIndex
+    :param num_ingredients:
+    :param time_limit: Largest time in seconds
+    :param random_state: Random state for reproducibility
+    :param start: Boolean array over ingredient codes to start from, None to start from an empty selection
+    :param max_stalls: Number of restarts in a row without a better selection after which the search stops
+    :param bound: Bound of _lp_bound if it is already computed, None to compute it
+    :return: Boolean array over ingredient codes of selected ingredients
+    """
+    deadline = time.perf_counter() + time_limit
+    rng = np.random.default_rng(random_state)
+    start = np.zeros(len(recipes.ingredient_ids), dtype=bool) if start is None else start
+    # Numbers of cocktails are integers, so the floor of the bound is already optimal
+    target = np.floor((_lp_bound(recipes, num_ingredients) if bound is None else bound) + 1e-9)
+
+    best = _improve_by_swaps(recipes, _greedy_selection(recipes, start, num_ingredients, deadline), deadline)
+    counts = _missing_counts(recipes, best)
+    n_makeable, stalls = np.sum(counts == 0), 0
+
+    # Also stops when all cocktails which fit into the budget are makeable
+    while (n_makeable < target and stalls < max_stalls and np.any(counts[recipes.sizes <= num_ingredients] > 0)
+           and time.perf_counter() < deadline):
+        kept = best.copy()
+        kept[rng.choice(np.flatnonzero(best), size=max(1, best.sum() // 4), replace=False)] = False
+        candidate = _greedy_selection(recipes, kept, num_ingredients, deadline, rng)
+        candidate = _improve_by_swaps(recipes, candidate, deadline)
+
+        candidate_counts = _missing_counts(recipes, candidate)
+        n_candidate = np.sum(candidate_counts == 0)
+        stalls = 0 if n_candidate > n_makeable else stalls + 1
+        if n_candidate >= n_makeable:
+            best, counts, n_makeable = candidate, candidate_counts, n_candidate
+
+    return best
+
+
+def _lp_bound(recipes, num_ingredients, n_iterations=100):
+    """
+    Bounds the LP relaxation of the ingredients problem from above with its dual. Splitting each cocktail into weights
+    on its ingredients which sum to 1 gives y_c <= sum of w_ci * x_i, so the number of makeable cocktails is at most
+    the sum of the num_ingredients largest total weights of ingredients. Splits are improved with Frank-Wolfe steps
+    which move weight onto the least loaded ingredient of each cocktail
+    :param recipes: RecipeIndex
+    :param num_ingredients:
+    :param n_iterations: Number of Frank-Wolfe steps
+    :return: The smallest bound found
+    """
+    codes = recipes._recipe_codes
+    n_ingredients = len(recipes.ingredient_ids)
+    num_ingredients = min(num_ingredients, n_ingredients)
+    weights = (codes < n_ingredients) / recipes.sizes[:, None]
+
+    bound = np.inf
+    for iteration in range(n_iterations):
+        loads = np.bincount(codes.ravel(), weights=weights.ravel(), minlength=n_ingredients + 1)
+        loads[-1] = np.inf
+        bound = min(bound, np.partition(loads[:-1], n_ingredients - num_ingredients)[n_ingredients - num_ingredients:]
+                    .sum() if num_ingredients > 0 else 0.)
+
+        least_loaded = np.zeros_like(weights)
+        least_loaded[np.arange(len(codes)), np.argmin(loads[codes], axis=1)] = 1.
+        step = 2 / (iteration + 2)
+        weights = (1 - step) * weights + step * least_loaded
+
+    return bound
+
+
+def _selection_result(recipes, selected, weights=None, costs=None, prep_methods=None):
+    """
+    Describes a selection of ingredients
+    :param recipes: RecipeIndex
+    :param selected: Boolean array over ingredient codes
+    :param weights: Array of weights over cocktail codes, to report the total weight of makeable cocktails
+    :param costs: Array of costs over ingredient codes, to report the total cost of selected ingredients
+    :param prep_methods: Array of codes of preparation methods over cocktail codes, to report how many of them the
+    makeable cocktails use
+    :return: Dictionary of 'selected_ingredients', 'num_cocktails', 'makeable_cocktails', 'ingredient_usage', and
+    'total_weight', 'total_cost' and 'num_prep_methods' if their arrays are given
+    """
+    makeable = recipes.makeable([recipes.ingredient_ids[selected]])[0]
+    cocktail_codes, ingredient_codes = recipes.pairs()
+    usage = np.bincount(ingredient_codes[makeable[cocktail_codes]], minlength=len(selected))
+
+    ingredient_usage = defaultdict(int)
+    for code in np.flatnonzero(usage):
+        ingredient_usage[recipes.ingredient_names[code]] += int(usage[code])
+
+    result = {
+        'selected_ingredients': list(recipes.ingredient_names[selected]),
+        'num_cocktails': int(makeable.sum()),
+        'makeable_cocktails': list(recipes.cocktail_names[makeable]),
+        'ingredient_usage': ingredient_usage
+    }
+    if weights is not None:
+        result['total_weight'] = float(weights[makeable].sum())
+    if costs is not None:
+        result['total_cost'] = float(costs[selected].sum())
+    if prep_methods is not None:
+        result['num_prep_methods'] = len(np.unique(prep_methods[makeable & (prep_methods >= 0)]))
+    return result
+
+
+class Solver:
+    """
+    A class used to choose a backend solving the ingredients problem and its limits, which bound latency of queries
+    """
+    def __init__(self, backend='cbc', time_limit=None, mip_gap=None, threads=None, random_state=42):
+        """
+        :param backend: 'cbc' for CBC subprocess through PuLP, 'highs' for HiGHS in process, 'heuristic' for greedy and
+        local search on bitmasks
+        :param time_limit: Time limit in seconds, None for no limit, or DEFAULT_HEURISTIC_TIME_LIMIT for the heuristic.
+        Solvers stopped by the limit return the best selection found
+        :param mip_gap: Relative MIP gap at which CBC and HiGHS stop, None for their default
+        :param threads: Number of threads of CBC and of HiGHS, None for their default. HiGHS bundled with scipy, used
+        when highspy is not installed, has no such option and runs with its default, with a warning
+        :param random_state: Random state of the heuristic
+        """
+        if backend not in SOLVERS:
+            raise ValueError(f'Unknown solver {backend}, expected cbc, highs or heuristic')
+
+        self.backend = backend
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.threads = threads
+        self.random_state = random_state
+
+
+class IngredientModel:
+    """
+    A class used to hold the MILP of ingredients problem over a recipe index. The model is built once, and solved for
+    different numbers of ingredients, budgets and numbers of preparation methods by changing right-hand sides of its
+    constraints. Cocktails may be weighted, ingredients may have costs limited by a budget, some ingredients may be
+    required or forbidden, and makeable cocktails may have to use at least k distinct preparation methods.
+
+    Required ingredients are taken out of the model, as if they were always available, and forbidden ones remove
+    cocktails which use them. The model is then reduced before building without changing its optimum:
+    - cocktails with more missing ingredients than the largest number of ingredients solved for are dropped, they are
+    never makeable
+    - cocktails with identical sets of ingredients, and preparation methods if they are constrained, are merged into
+    one variable weighted by their total weight
+    - ingredients of no remaining cocktail are dropped, and ingredients used by exactly the same cocktails are merged
+    into one variable counted as all of them, with their total cost, as selecting only some of them makes no more
+    cocktails
+    The cardinality constraint is then an inequality, selections are padded to the number of ingredients afterwards
+    unless ingredients have costs
+    """
+    def __init__(self, recipes, max_ingredients=None, reduce=True, weights=None, costs=None, included=None,
+                 excluded=None, prep_methods=None):
+        """
+        Reduces the model, which has a binary variable per group of ingredients and per group of cocktails, and a
+        constraint per distinct pair of them. The PuLP problem is only built for CBC
+        :param recipes: RecipeIndex
+        :param max_ingredients: Largest number of ingredients the model will be solved for, None if unknown
+        :param reduce: If the model is reduced, otherwise it has a variable per ingredient and per cocktail
+        :param weights: Array of weights over cocktail codes, None to count cocktails
+        :param costs: Array of costs over ingredient codes, None for no budget constraint
+        :param included: Boolean array over ingredient codes which must be selected, None for no such ingredients
+        :param excluded: Boolean array over ingredient codes which must not be selected, None for no such ingredients
+        :param prep_methods: Array of codes of preparation methods over cocktail codes, -1 if unknown, None for no
+        constraint on preparation methods
+        """
+        self.recipes = recipes
+        n_ingredients = len(recipes.ingredient_ids)
+        cocktail_codes, ingredient_codes = recipes.pairs()
+
+        self.included = np.zeros(n_ingredients, dtype=bool) if included is None else included
+        self.excluded = np.zeros(n_ingredients, dtype=bool) if excluded is None else excluded & ~self.included
+        self.costs = costs
+        self.reduce = reduce
+        weights = np.ones(len(recipes)) if weights is None else weights
+
+        # Recipes only need ingredients which are not required, recipes needing forbidden ones are never makeable
+        masks = recipes.masks & ~_selection_mask(recipes, self.included)
+        feasible = ~(masks & _selection_mask(recipes, self.excluded)).any(axis=1)
+        if reduce and max_ingredients is not None:
+            feasible &= _popcount(masks) <= max_ingredients - self.included.sum()
+
+        keys = masks if prep_methods is None else np.c_[masks, prep_methods.astype(np.uint64)]
+        if reduce:
+            cocktail_groups = np.unique(keys[feasible], axis=0, return_inverse=True)[1].ravel()
+        else:
+            cocktail_groups = np.arange(feasible.sum())
+        self.cocktail_groups = np.full(len(recipes), -1)
+        self.cocktail_groups[feasible] = cocktail_groups
+        self.weights = np.bincount(cocktail_groups, weights=weights[feasible],
+                                   minlength=cocktail_groups.max(initial=-1) + 1)
+
+        # Bitmask over groups of cocktails of each ingredient, equal for ingredients used by the same cocktails
+        kept = (self.cocktail_groups[cocktail_codes] >= 0) & ~self.included[ingredient_codes]
+        if reduce:
+            columns = _pack_bits(ingredient_codes[kept], self.cocktail_groups[cocktail_codes[kept]], n_ingredients,
+                                 len(self.weights))
+            used = np.zeros(n_ingredients, dtype=bool)
+            used[ingredient_codes[kept]] = True
+            ingredient_groups = np.unique(columns[used], axis=0, return_inverse=True)[1].ravel()
+        else:
+            used = ~self.included & ~self.excluded
+            ingredient_groups = np.arange(used.sum())
+        self.ingredient_groups = np.full(n_ingredients, -1)
+        self.ingredient_groups[used] = ingredient_groups
+        self.group_sizes = np.bincount(ingredient_groups, minlength=ingredient_groups.max(initial=-1) + 1)
+        self.group_costs = None if costs is None else np.bincount(ingredient_groups, weights=costs[used],
+                                                                  minlength=len(self.group_sizes))
+
+        pairs = np.c_[self.cocktail_groups[cocktail_codes], self.ingredient_groups[ingredient_codes]]
+        self.pairs = np.unique(pairs[(pairs >= 0).all(axis=1)], axis=0)
+
+        # Preparation method of each group of cocktails, as positions among methods of feasible cocktails
+        self.method_groups, self.n_methods = None, 0
+        if prep_methods is not None:
+            self.method_groups = np.full(len(self.weights), -1)
+            self.method_groups[cocktail_groups] = prep_methods[feasible]
+            known = self.method_groups >= 0
+            methods, self.method_groups[known] = np.unique(self.method_groups[known], return_inverse=True)
+            self.n_methods = len(methods)
+
+        self.constraints, self.names = self._constraint_matrix()
+        self._problem, self.x, self.y, self.z = None, None, None, None
+
+    @property
+    def n_variables(self):
+        return self.constraints.shape[1]
+
+    @property
+    def n_constraints(self):
+        return self.constraints.shape[0]
+
+    def _constraint_matrix(self):
+        """
+        Builds rows of all constraints: links of cocktails to their ingredients, the cardinality constraint, the budget
+        constraint if ingredients have costs, and if preparation methods are constrained, links of methods to cocktails
+        using them and the constraint on their number. Variables are groups of ingredients, groups of cocktails and
+        preparation methods
+        :return: Sparse matrix of constraints and name of each row
+        """
+        n_x, n_y = len(self.group_sizes), len(self.weights)
+        n_z = self.n_methods
+        links = np.arange(len(self.pairs))
+
+        rows = [links, links, np.full(n_x, len(links))]
+        columns = [n_x + self.pairs[:, 0], self.pairs[:, 1], np.arange(n_x)]
+        values = [np.ones(len(links)), -np.ones(len(links)), self.group_sizes]
+        names = [f'recipe_{link}' for link in links] + ['num_ingredients']
+
+        if self.group_costs is not None:
+            rows.append(np.full(n_x, len(names)))
+            columns.append(np.arange(n_x))
+            values.append(self.group_costs)
+            names.append('budget')
+
+        if self.method_groups is not None:
+            grouped = np.flatnonzero(self.method_groups >= 0)
+            rows += [len(names) + self.method_groups[grouped], len(names) + np.arange(n_z)]
+            columns += [n_x + grouped, n_x + n_y + np.arange(n_z)]
+            values += [-np.ones(len(grouped)), np.ones(n_z)]
+            names += [f'prep_method_{method}' for method in range(n_z)]
+
+            rows.append(np.full(n_z, len(names)))
+            columns.append(n_x + n_y + np.arange(n_z))
+            values.append(np.ones(n_z))
+            names.append('min_prep_methods')
+
+        constraints = sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+                                        shape=(len(names), n_x + n_y + n_z))
+        return constraints, names
+
+    def _bounds(self, num_ingredients, budget=None, min_prep_methods=0):
+        """
+        Computes bounds of constraints for a number of ingredients, a budget and a number of preparation methods, less
+        what required ingredients already use
+        :param num_ingredients:
+        :param budget: Largest total cost of ingredients, None for no limit
+        :param min_prep_methods: Smallest number of distinct preparation methods of makeable cocktails
+        :return: Arrays of lower and upper bounds of constraints
+        """
+        lower = np.full(self.n_constraints, -np.inf)
+        upper = np.zeros(self.n_constraints)
+
+        remaining = num_ingredients - self.included.sum()
+        position = self.names.index('num_ingredients')
+        upper[position] = remaining
+        if not self.reduce:
+            lower[position] = remaining
+        if 'budget' in self.names:
+            upper[self.names.index('budget')] = np.inf if budget is None else budget - self.costs[self.included].sum()
+        if 'min_prep_methods' in self.names:
+            lower[self.names.index('min_prep_methods')], upper[self.names.index('min_prep_methods')] = \
+                min_prep_methods, np.inf
+
+        return lower, upper
+
+    @property
+    def problem(self):
+        """
+        PuLP problem of the model, built on first use. Right-hand sides are set before each solve
+        :return: pulp.LpProblem
+        """
+        if self._problem is None:
+            n_x, n_y = len(self.group_sizes), len(self.weights)
+            self._problem = pulp.LpProblem("Cocktail_Optimizer", pulp.LpMaximize)
+            self.x = [pulp.LpVariable(f"ingredient_{group}", cat='Binary') for group in range(n_x)]
+            self.y = [pulp.LpVariable(f"cocktail_{group}", cat='Binary') for group in range(n_y)]
+            self.z = [pulp.LpVariable(f"prep_method_{method}", cat='Binary')
+                      for method in range(self.n_variables - n_x - n_y)]
+            variables = self.x + self.y + self.z
+
+            self._problem += pulp.LpAffineExpression([(y, float(weight)) for y, weight in zip(self.y, self.weights)])
+
+            lower, upper = self._bounds(0, 0, 0)
+            for row, name in enumerate(self.names):
+                start, end = self.constraints.indptr[row], self.constraints.indptr[row + 1]
+                expression = pulp.LpAffineExpression(
+                    [(variables[column], float(value))
+                     for column, value in zip(self.constraints.indices[start:end], self.constraints.data[start:end])])
+                sense = pulp.LpConstraintEQ if lower[row] == upper[row] else \
+                    pulp.LpConstraintLE if lower[row] == -np.inf else pulp.LpConstraintGE
+                self._problem.addConstraint(pulp.LpConstraint(expression, sense, name, 0))
+
+        return self._problem
+
+    def warm_start(self, selected):
+        """
+        Sets initial values of variables to a selection of ingredients and cocktails makeable from it, a group of
+        ingredients is selected if all of them are
+        :param selected: Boolean array over ingredient codes
+        :return:
+        """
+        grouped = self.ingredient_groups >= 0
+        counts = np.bincount(self.ingredient_groups[grouped], weights=selected[grouped],
+                             minlength=len(self.group_sizes))
+        makeable = np.zeros(len(self.weights), dtype=bool)
+        makeable_codes = self.recipes.makeable([self.recipes.ingredient_ids[selected | self.included]])[0]
+        makeable[self.cocktail_groups[makeable_codes & (self.cocktail_groups >= 0)]] = True
+
+        methods = np.zeros(len(self.z), dtype=bool)
+        if self.method_groups is not None:
+            methods[self.method_groups[makeable & (self.method_groups >= 0)]] = True
+
+        for variables, values in ((self.x, counts == self.group_sizes), (self.y, makeable), (self.z, methods)):
+            for variable, value in zip(variables, values):
+                variable.setInitialValue(int(value))
+
+    def _set_rhs(self, bounds):
+        """
+        Sets right-hand sides of the PuLP problem which change between solves
+        :param bounds: Arrays of lower and upper bounds of constraints
+        :return:
+        """
+        lower, upper = bounds
+        for name in ('num_ingredients', 'budget', 'min_prep_methods'):
+            if name in self.names:
+                row = self.names.index(name)
+                rhs = upper[row] if np.isfinite(upper[row]) else lower[row]
+                if not np.isfinite(rhs):
+                    rhs = self.group_costs.sum() + 1
+                self.problem.constraints[name].changeRHS(float(rhs))
+
+    def _solve_cbc(self, bounds, solver, warm_start):
+        """
+        Solves the PuLP problem with CBC, warm-started if a selection is given
+        :param bounds: Arrays of lower and upper bounds of constraints
+        :param solver: Solver
+        :param warm_start: Boolean array over ingredient codes, None to solve cold
+        :return: Boolean array over groups of ingredients
+        """
+        self._set_rhs(bounds)
+        if warm_start is not None:
+            self.warm_start(warm_start)
+
+        self.problem.solve(pulp.PULP_CBC_CMD(msg=False, warmStart=warm_start is not None, timeLimit=solver.time_limit,
+                                             gapRel=solver.mip_gap, threads=solver.threads))
+        if self.problem.status == pulp.LpStatusInfeasible:
+            raise ValueError('No selection of ingredients satisfies the constraints')
+        return np.array([round(variable.value() or 0) == 1 for variable in self.x], dtype=bool)
+
+    def _solve_highs(self, bounds, solver):
+        """
+        Solves the model in process with HiGHS, through its Python API highspy if it is installed, otherwise with HiGHS
+        bundled with scipy from the sparse matrix of constraints, without building the PuLP problem. Neither writes
+        model files
+        :param bounds: Arrays of lower and upper bounds of constraints
+        :param solver: Solver
+        :return: Boolean array over groups of ingredients, all False if no solution was found within the time limit
+        """
+        try:
+            import highspy  # noqa: F401
+        except ImportError:
+            return self._solve_scipy_highs(bounds, solver)
+
+        self._set_rhs(bounds)
+        self.problem.solve(pulp.HiGHS(msg=False, timeLimit=solver.time_limit, gapRel=solver.mip_gap,
+                                      threads=solver.threads))
+        if self.problem.status == pulp.LpStatusInfeasible:
+            raise ValueError('No selection of ingredients satisfies the constraints')
+        return np.array([round(variable.value() or 0) == 1 for variable in self.x], dtype=bool)
+
+    def _solve_scipy_highs(self, bounds, solver):
+        """
+        Solves the model with HiGHS bundled with scipy, from the sparse matrix of constraints
+        :param bounds: Arrays of lower and upper bounds of constraints
+        :param solver: Solver
+        :return: Boolean array over groups of ingredients, all False if no solution was found within the time limit
+        """
+        if solver.threads is not None:
+            warnings.warn('threads are ignored by HiGHS bundled with scipy, install highspy to set them',
+                          RuntimeWarning)
+
+        options = {'disp': False}
+        if solver.time_limit is not None:
+            options['time_limit'] = solver.time_limit
+        if solver.mip_gap is not None:
+            options['mip_rel_gap'] = solver.mip_gap
+
+        n_x = len(self.group_sizes)
+        objective = np.zeros(self.n_variables)
+        objective[n_x:n_x + len(self.weights)] = -self.weights
+
+        result = milp(objective, constraints=LinearConstraint(self.constraints, *bounds),
+                      integrality=np.ones(self.n_variables), bounds=Bounds(0, 1), options=options)
+        if result.status == 2:
+            raise ValueError('No selection of ingredients satisfies the constraints')
+        if result.x is None:
+            return np.zeros(n_x, dtype=bool)
+        return np.round(result.x[:n_x]) == 1
+
+    def solve(self, num_ingredients, solver=None, warm_start=None, budget=None, min_prep_methods=0):
+        """
+        Solves the model for num_ingredients ingredients
+        :param num_ingredients:
+        :param solver: Solver with 'cbc' or 'highs' backend, None for CBC without limits
+        :param warm_start: Boolean array over ingredient codes of a selection of num_ingredients ingredients to start
+        from, None to solve cold. Only CBC is warm-started
+        :param budget: Largest total cost of ingredients, None for no limit, requires costs
+        :param min_prep_methods: Smallest number of distinct preparation methods of makeable cocktails, requires
+        preparation methods
+        :return: Boolean array over ingredient codes of selected ingredients, padded greedily to num_ingredients unless
+        ingredients have costs
+        """
+        solver = Solver() if solver is None else solver
+        bounds = self._bounds(num_ingredients, budget, min_prep_methods)
+        if self.n_variables == 0:
+            # Nothing fits, constraints without variables are 0 and solvers reject empty models
+            if (bounds[0] > 0).any() or (bounds[1] < 0).any():
+                raise ValueError('No selection of ingredients satisfies the constraints')
+            chosen = np.zeros(0, dtype=bool)
+        elif solver.backend == 'highs':
+            chosen = self._solve_highs(bounds, solver)
+        else:
+            chosen = self._solve_cbc(bounds, solver, warm_start)
+
+        # Dropped ingredients have group -1, which picks the trailing False
+        selected = np.r_[chosen, False][self.ingredient_groups] | self.included
+        if self.costs is not None:
+            return selected
+        return _adjust_selection(self.recipes, selected, num_ingredients, excluded=self.excluded, fixed=self.included)
+
+
+def _as_solver(solver, time_limit=None, mip_gap=None, threads=None):
+    """
+    Makes a Solver from a backend name and limits, Solver instances are returned as they are
+    :param solver: Solver or name of a backend
+    :param time_limit: Time limit in seconds
+    :param mip_gap: Relative MIP gap
+    :param threads: Number of threads of CBC and HiGHS
+    :return: Solver
+    """
+    if isinstance(solver, Solver):
+        return solver
+    return Solver(solver, time_limit, mip_gap, threads)
+
+
+def _init_scenario_worker(optimizer):
+    """
+    Sets the optimizer of a worker process, so that it is sent once per worker instead of once per scenario
+    :param optimizer: Optimizer
+    :return:
+    """
+    global _SCENARIO_OPTIMIZER
+    _SCENARIO_OPTIMIZER = optimizer
+
+
+def _solve_scenario(scenario):
+    """
+    Solves one scenario with the optimizer of a worker process
+    :param scenario: Dictionary of keyword arguments of find_n_ingredients_to_make_largest_amount_of_cocktails
+    :return: Result dictionary
+    """
+    return _SCENARIO_OPTIMIZER.find_n_ingredients_to_make_largest_amount_of_cocktails(**scenario)
+
+
+def _cocktail_values(recipes, values):
+    """
+    Aligns values given by cocktail name with cocktail codes
+    :param recipes: RecipeIndex
+    :param values: Series indexed by cocktail names, e.g. popularity
+    :return: Array over cocktail codes, 0 for cocktails without a value
+    """
+    values = values[~values.index.duplicated()]
+    return values.reindex(recipes.cocktail_names).fillna(0).to_numpy(dtype=float)
+
+
+def _ingredient_values(recipes, values):
+    """
+    Aligns values given by ingredient name or id with ingredient codes, ingredients unknown to the index are ignored
+    :param recipes: RecipeIndex
+    :param values: Series indexed by ingredient names or ids, e.g. prices
+    :return: Array over ingredient codes, 0 for ingredients without a value
+    """
+    result = np.zeros(len(recipes.ingredient_ids))
+    for ingredient, value in values.items():
+        code = recipes._codes.get(ingredient)
+        if code is not None:
+            result[code] = value
+    return result
+
+
+def _ingredient_flags(recipes, ingredients, strict=False):
+    """
+    Marks given ingredients
+    :param recipes: RecipeIndex
+    :param ingredients: Collection of ingredient names or ids
+    :param strict: If ingredients unknown to the index raise ValueError, otherwise they are ignored
+    :return: Boolean array over ingredient codes
+    """
+    if strict:
+        unknown = [ingredient for ingredient in ingredients if ingredient not in recipes._codes]
+        if unknown:
+            raise ValueError(f'Ingredients {unknown} are not used by any of the cocktails considered')
+
+    flags = np.zeros(len(recipes.ingredient_ids), dtype=bool)
+    flags[recipes._inventory_codes([ingredients])[1]] = True
+    return flags
+
+
+def _prep_method_codes(recipes, cocktails):
+    """
+    Encodes preparation methods of cocktails, 'Unknown' and missing methods are not counted as a method
+    :param recipes: RecipeIndex
+    :param cocktails: Cocktails dataframe with 'name' and 'prep_method' columns
+    :return: Array of codes of preparation methods over cocktail codes, -1 if unknown
+    """
+    methods = cocktails.drop_duplicates('name').set_index('name')['prep_method'].astype(object)
+    methods = methods.reindex(recipes.cocktail_names)
+    return pd.factorize(methods.where(methods != 'Unknown'))[0]
+
 
 class Optimizer:
     """
     A class used to perform optimization on ingredients problem: finds n ingredients with which you can make
     the largest amount of different cocktails
     """
-    def __init__(self, ingredients, cocktails_and_ingredients):
+    def __init__(self, ingredients, cocktails_and_ingredients, cocktails=None):
         self.ingredients = ingredients
         self.cocktails_and_ingredients = cocktails_and_ingredients
+        self.cocktails = cocktails
+        self._recipe_index = None
 
-    def _optimize_cocktail_ingredients(self, df, num_ingredients):
+    @property
+    def recipe_index(self):
         """
-        Finds n ingredients with which you can make the largest amount of different cocktails, and return it along with
-        the cocktails you can make, and their usage
-        :param df: Cocktails and ingredients dataframe
-        :param num_ingredients:
-        :return: Dictionary of 'selected_ingredients', 'num_cocktails', 'makeable_cocktails', 'ingredient_usage'
+        Recipe index of all cocktails, compiled on first use
+        :return: RecipeIndex
         """
+        if self._recipe_index is None:
+            self._recipe_index = RecipeIndex(self.cocktails_and_ingredients)
+        return self._recipe_index
 
-        # Create mappings of cocktails to ingredients
-        cocktail_ingredients = defaultdict(set)
-        all_ingredients = set()
-        for _, row in df.iterrows():
-            cocktail_ingredients[row['cocktail_name']].add(row['ingredient_name'])
-            all_ingredients.add(row['ingredient_name'])
-
-        prob = pulp.LpProblem("Cocktail_Optimizer", pulp.LpMaximize)
+    def find_makeable_cocktails(self, inventories, max_missing=0):
+        """
+        Finds cocktails which can be made from each of given inventories of a bar
+        :param inventories: List of inventories, each a collection of ingredient names or ids
+        :param max_missing: Number of ingredients which may be missing, e.g. 1 for cocktails needing one more ingredient
+        :return: Dataframe with inventory position, cocktail name and number of missing ingredients
+        """
+        return self.recipe_index.query(inventories, max_missing)
 
-        x = pulp.LpVariable.dicts("ingredient",
-                                  all_ingredients,
-                                  cat='Binary')
+    def tag_weights(self, tag='IBA', weight=2.):
+        """
+        Weights cocktails by a tag, to prefer e.g. IBA cocktails when finding ingredients
+        :param tag: Tag from 'tags' column of cocktails
+        :param weight: Weight of cocktails with the tag, other cocktails weigh 1
+        :return: Series of weights indexed by cocktail names
+        """
+        if self.cocktails is None:
+            raise ValueError('Weights by tag need the cocktails dataframe')
 
-        y = pulp.LpVariable.dicts("cocktail",
-                                  cocktail_ingredients.keys(),
-                                  cat='Binary')
+        cocktails_and_tags = self.cocktails.explode('tags')
+        tagged = cocktails_and_tags['tags'].eq(tag).groupby(cocktails_and_tags['name']).any()
+        return tagged.map({True: weight, False: 1.})
 
-        prob += pulp.lpSum(y[c] for c in cocktail_ingredients.keys())
+    def _optimize_cocktail_ingredients(self, df, num_ingredients, solver=None, cocktail_weights=None,
+                                       ingredient_costs=None, budget=None, must_include=None, must_exclude=None,
+                                       min_prep_methods=0):
+        """
+        Finds n ingredients with which you can make the largest amount of different cocktails, and return it along with
+        the cocktails you can make, and their usage
+        :param df: Cocktails and ingredients dataframe
+        :param num_ingredients:
+        :param solver: Solver, None for CBC without limits
+        :param cocktail_weights: Series of weights indexed by cocktail names to maximize instead of the number of
+        cocktails, cocktails without a weight weigh 0
+        :param ingredient_costs: Series of costs indexed by ingredient names or ids, ingredients without a cost are free
+        :param budget: Largest total cost of selected ingredients, requires ingredient_costs
+        :param must_include: Ingredient names or ids which must be selected
+        :param must_exclude: Ingredient names or ids which must not be selected
+        :param min_prep_methods: Smallest number of distinct prep_methods of makeable cocktails, requires cocktails
+        :return: Dictionary of 'selected_ingredients', 'num_cocktails', 'makeable_cocktails', 'ingredient_usage',
+        'total_weight', 'total_cost' and 'num_prep_methods' if they are constrained, and 'lp_bound' and 'gap' to it if
+        solver is the heuristic
+        """
+        solver = Solver() if solver is None else solver
+        recipes = self.recipe_index if df is self.cocktails_and_ingredients else RecipeIndex(df)
 
-        prob += pulp.lpSum(x[i] for i in all_ingredients) == num_ingredients
+        constrained = [cocktail_weights, ingredient_costs, budget, must_include, must_exclude]
+        if budget is not None and ingredient_costs is None:
+            raise ValueError('A budget needs ingredient_costs')
+        if min_prep_methods > 0 and self.cocktails is None:
+            raise ValueError('Constraints on prep_methods need the cocktails dataframe')
 
-        for cocktail, ingredients in cocktail_ingredients.items():
-            for ingredient in ingredients:
-                prob += y[cocktail] <= x[ingredient]
+        if solver.backend != 'heuristic':
+            weights = None if cocktail_weights is None else _cocktail_values(recipes, cocktail_weights)
+            costs = None if ingredient_costs is None else _ingredient_values(recipes, ingredient_costs)
+            prep_methods = _prep_method_codes(recipes, self.cocktails) if min_prep_methods > 0 else None
+            included = None if must_include is None else _ingredient_flags(recipes, must_include, strict=True)
+            excluded = None if must_exclude is None else _ingredient_flags(recipes, must_exclude)
+            if included is not None and excluded is not None and (included & excluded).any():
+                raise ValueError(f'Ingredients {list(recipes.ingredient_names[included & excluded])} are both '
+                                 f'required and forbidden')
 
-        prob.solve(pulp.PULP_CBC_CMD(msg=False))
+            model = IngredientModel(recipes, num_ingredients, weights=weights, costs=costs, included=included,
+                                    excluded=excluded, prep_methods=prep_methods)
+            selected = model.solve(num_ingredients, solver, budget=budget, min_prep_methods=min_prep_methods)
+            return _selection_result(recipes, selected, weights, costs, prep_methods)
 
-        selected_ingredients = [i for i in all_ingredients if x[i].value() == 1]
-        makeable_cocktails = [c for c in cocktail_ingredients.keys()
-                              if y[c].value() == 1]
+        if any(value is not None for value in constrained) or min_prep_methods > 0:
+            raise ValueError("The 'heuristic' solver only maximizes the number of cocktails, use 'cbc' or 'highs' "
+                             "for weights and constraints")
 
-        ingredient_usage = defaultdict(int)
-        for cocktail in makeable_cocktails:
-            for ingredient in cocktail_ingredients[cocktail]:
-                if ingredient in selected_ingredients:
-                    ingredient_usage[ingredient] += 1
+        time_limit = DEFAULT_HEURISTIC_TIME_LIMIT if solver.time_limit is None else solver.time_limit
+        bound = _lp_bound(recipes, num_ingredients)
+        result = _selection_result(recipes, _heuristic_selection(recipes, num_ingredients, time_limit,
+                                                                 solver.random_state, bound=bound))
+        result['lp_bound'] = bound
+        result['gap'] = 1 - result['num_cocktails'] / result['lp_bound'] if result['lp_bound'] > 0 else 0.
+        return result
 
-        return {
-            'selected_ingredients': selected_ingredients,
-            'num_cocktails': len(makeable_cocktails),
-            'makeable_cocktails': sorted(makeable_cocktails),
-            'ingredient_usage': ingredient_usage
-        }
+    def _alcoholic_cocktails_and_ingredients(self):
+        """
+        Joins cocktails and ingredients with generalized types of ingredients
+        :return: Cocktails and ingredients dataframe with 'generalized_type' column
+        """
+        return self.cocktails_and_ingredients.set_index('ingredient_id').join(
+            self.ingredients[['generalized_type']],
+            how='left').reset_index()
 
     def print_results(self, result):
         """
@@ -89,21 +1066,44 @@ class Optimizer:
         for cocktail in result['makeable_cocktails']:
             print(f"- {cocktail}")
 
-    def find_n_ingredients_to_make_largest_amount_of_cocktails(self, n_ingredients, only_alcoholic=False):
+    def find_n_ingredients_to_make_largest_amount_of_cocktails(self, n_ingredients, only_alcoholic=False,
+                                                                solver='cbc', time_limit=None, mip_gap=None,
+                                                                threads=None, cocktail_weights=None,
+                                                                ingredient_costs=None, budget=None, must_include=None,
+                                                                must_exclude=None, min_prep_methods=0):
         """
-        Finds n ingredients with which you can make the largest amount of different cocktails
+        Finds n ingredients with which you can make the largest amount of different cocktails, or the largest total
+        weight of them, under optional constraints. Exactly n ingredients are selected unless ingredients have costs,
+        then n is the largest number of them
         :param n_ingredients:
         :param only_alcoholic: If we are taking into account only alcoholic ingredients or not
+        :param solver: 'cbc', 'highs' or 'heuristic', or a Solver which overrides the limits below
+        :param time_limit: Time limit in seconds, the best selection found is returned when it runs out
+        :param mip_gap: Relative MIP gap at which CBC and HiGHS stop
+        :param threads: Number of threads of CBC and HiGHS
+        :param cocktail_weights: Series of weights indexed by cocktail names, e.g. popularity or tag_weights(), to
+        maximize instead of the number of cocktails. Cocktails without a weight weigh 0
+        :param ingredient_costs: Series of costs indexed by ingredient names or ids, ingredients without a cost are free
+        :param budget: Largest total cost of selected ingredients, requires ingredient_costs
+        :param must_include: Ingredient names or ids which must be selected, ValueError is raised for ones which no
+        cocktail uses, e.g. misspelled ones
+        :param must_exclude: Ingredient names or ids which must not be selected, ones which no cocktail uses are ignored
+        :param min_prep_methods: Smallest number of distinct prep_methods of makeable cocktails, requires the cocktails
+        dataframe
         :return: Dictionary of 'selected_ingredients', 'num_cocktails', 'makeable_cocktails', 'ingredient_usage',
-        'rest_of_ingredients' if only_alcoholic is True
+        'rest_of_ingredients' if only_alcoholic is True, 'total_weight', 'total_cost' and 'num_prep_methods' if they
+        are constrained, 'lp_bound' and 'gap' if solver is 'heuristic'. Weights and constraints are not supported by
+        the heuristic, ValueError is raised if no selection satisfies the constraints
         """
+        solver = _as_solver(solver, time_limit, mip_gap, threads)
+        constraints = {'cocktail_weights': cocktail_weights, 'ingredient_costs': ingredient_costs, 'budget': budget,
+                       'must_include': must_include, 'must_exclude': must_exclude,
+                       'min_prep_methods': min_prep_methods}
         if only_alcoholic:
-            result_df = self.cocktails_and_ingredients.set_index('ingredient_id').join(
-                self.ingredients[['generalized_type']],
-                how='left')
+            result_df = self._alcoholic_cocktails_and_ingredients()
             cocktails_bases = result_df.query('generalized_type == "Alcoholic"')
 
-            result = self._optimize_cocktail_ingredients(cocktails_bases, n_ingredients)
+            result = self._optimize_cocktail_ingredients(cocktails_bases, n_ingredients, solver, **constraints)
 
             makeable_cocktails = result['makeable_cocktails']
 
@@ -113,6 +1113,63 @@ class Optimizer:
 
             return result
         else:
-            result = self._optimize_cocktail_ingredients(self.cocktails_and_ingredients, n_ingredients)
+            result = self._optimize_cocktail_ingredients(self.cocktails_and_ingredients, n_ingredients, solver,
+                                                         **constraints)
 
             return result
+
+    def find_ingredient_curve(self, n_ingredients, only_alcoholic=False, solver='cbc', time_limit=None, mip_gap=None,
+                              threads=None):
+        """
+        Finds the largest amount of cocktails you can make for each number of ingredients. The model is built once and
+        each solve is warm-started from the previous selection, greedily adjusted to the next number of ingredients
+        :param n_ingredients: Numbers of ingredients, e.g. range(1, 41)
+        :param only_alcoholic: If we are taking into account only alcoholic ingredients or not
+        :param solver: 'cbc', 'highs' or 'heuristic', or a Solver which overrides the limits below
+        :param time_limit: Time limit in seconds of each number of ingredients
+        :param mip_gap: Relative MIP gap at which CBC and HiGHS stop
+        :param threads: Number of threads of CBC and HiGHS
+        :return: Dataframe with number of ingredients, number of cocktails, selected ingredients and time of each solve
+        """
+        solver = _as_solver(solver, time_limit, mip_gap, threads)
+
+        df = self.cocktails_and_ingredients
+        if only_alcoholic:
+            df = self._alcoholic_cocktails_and_ingredients().query('generalized_type == "Alcoholic"')
+
+        n_ingredients = list(n_ingredients)
+        recipes = RecipeIndex(df)
+        model = IngredientModel(recipes, max(n_ingredients, default=0)) if solver.backend != 'heuristic' else None
+        selected = np.zeros(len(recipes.ingredient_ids), dtype=bool)
+
+        rows = []
+        for num_ingredients in n_ingredients:
+            start = time.perf_counter()
+            if solver.backend == 'heuristic':
+                time_limit = DEFAULT_HEURISTIC_TIME_LIMIT if solver.time_limit is None else solver.time_limit
+                selected = _heuristic_selection(recipes, num_ingredients, time_limit, solver.random_state, selected)
+            else:
+                selected = model.solve(num_ingredients, solver, _adjust_selection(recipes, selected, num_ingredients))
+            result = _selection_result(recipes, selected)
+            rows.append({'n_ingredients': num_ingredients,
+                         'num_cocktails': result['num_cocktails'],
+                         'selected_ingredients': result['selected_ingredients'],
+                         'time_s': time.perf_counter() - start})
+
+        return pd.DataFrame(rows)
+
+    def solve_scenarios(self, scenarios, n_jobs=None):
+        """
+        Solves independent ingredient problems concurrently, e.g. the full and only_alcoholic variants, or the same
+        problem with different solvers or numbers of ingredients
+        :param scenarios: List of dictionaries of keyword arguments of
+        find_n_ingredients_to_make_largest_amount_of_cocktails
+        :param n_jobs: Number of worker processes, everything runs in current process if None or 1. Solvers run one
+        per process, so time limits bound the latency of each scenario
+        :return: List of result dictionaries in order of scenarios
+        """
+        if n_jobs is None or n_jobs == 1:
+            return [self.find_n_ingredients_to_make_largest_amount_of_cocktails(**scenario) for scenario in scenarios]
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_scenario_worker, initargs=(self,)) as executor:
+            return list(executor.map(_solve_scenario, scenarios))
@@ -151,7 +151,8 @@ class Plotter:
         for i, v in enumerate(strengths.values):
             axs[0].text(i, v, str(v), ha='center', va='bottom')
 
-        strengths = self.cocktails.query('strength != "Unknown"')['strength'].value_counts()
+        # Categories are counted as strings, so unused categories of categorical column don't show up as empty wedges
+        strengths = self.cocktails.query('strength != "Unknown"')['strength'].astype(str).value_counts()
 
         wedges, texts, autotexts = axs[1].pie(strengths, labels=strengths.index, autopct='%1.1f%%', startangle=195,
                                               colors=sns.color_palette('coolwarm', len(strengths)))
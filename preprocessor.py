@@ -1,5 +1,40 @@
 import pandas as pd
+import numpy as np
 import re
+import io
+import json
+import os
+import hashlib
+import pickle
+import urllib.request
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+LEMON_JUICE_PER_FRUIT = 1.52  # oz of juice from 1 lemon
+LIME_JUICE_PER_FRUIT = 1.01  # oz of juice from 1 lime
+TBLSP_OZ = 0.47
+TSP_OZ = 0.135
+
+DATASET_URL = "https://raw.githubusercontent.com/Solvro/rekrutacja/refs/heads/main/data/cocktail_dataset.json"
+
+# Bump when preprocessing changes, so processed tables cached by older version are not reused
+PROCESSED_CACHE_VERSION = 1
+
+TABLE_NAMES = ['cocktails', 'ingredients', 'cocktails_and_ingredients']
+
+# Columns stored as categoricals in snapshots of processed tables
+CATEGORICAL_COLUMNS = {'cocktails': ['glass', 'prep_method', 'strength'],
+                       'ingredients': ['type', 'generalized_type'],
+                       'cocktails_and_ingredients': []}
+
+
+def _flatten_ingredients(cocktails):
+    """
+    Flattens nested lists of ingredients of every cocktail into one list in one pass
+    :param cocktails: Dataframe made from raw json
+    :return: List of ingredient dicts in order of cocktails
+    """
+    return [ingredient for cocktail_ingredients in cocktails['ingredients'] for ingredient in cocktail_ingredients]
 
 
 def _create_ingredients_table(cocktails):
@@ -8,18 +43,23 @@ def _create_ingredients_table(cocktails):
     :param cocktails: Dataframe made from raw json
     :return: Ingredients table
     """
+    ingredient_records = _flatten_ingredients(cocktails)
 
-    ingredients = pd.DataFrame(columns=['ingredient'])
+    ingredients = pd.DataFrame.from_records(ingredient_records)
 
-    for index, row in cocktails.iterrows():
-        for ingredient in row['ingredients']:
-            ingredients = pd.concat([ingredients, pd.DataFrame({'ingredient': [ingredient]})], ignore_index=True)
+    # Keep dtypes the table had when it was filled cell by cell: a column is float only if it is numeric and starts
+    # with a number, otherwise it holds raw values
+    for column in ingredients.columns:
+        first_value = ingredient_records[0].get(column)
+        starts_with_number = isinstance(first_value, (int, float)) and not isinstance(first_value, bool)
 
-    for index, row in ingredients.iterrows():
-        for key, val in row['ingredient'].items():
-            ingredients.loc[index, key] = val
+        if pd.api.types.is_numeric_dtype(ingredients[column]) and not pd.api.types.is_bool_dtype(
+                ingredients[column]) and starts_with_number:
+            ingredients[column] = ingredients[column].astype(float)
+        elif ingredients[column].dtype != object:
+            ingredients[column] = pd.Series([record.get(column) for record in ingredient_records], dtype=object)
 
-    ingredients.drop(columns=['ingredient', 'measure', 'createdAt', 'updatedAt'], inplace=True)
+    ingredients.drop(columns=['measure', 'createdAt', 'updatedAt'], inplace=True)
     ingredients.drop_duplicates(inplace=True)
     ingredients.sort_values(by='name', inplace=True)
     ingredients['id'] = ingredients['id'].astype(int)
@@ -34,28 +74,19 @@ def _create_cocktails_and_ingredients_table(cocktails):
     :param cocktails: Raw dataframe of cocktails made from json
     :return: Cocktails and Ingredients table
     """
-    cocktails_and_ingredients = pd.DataFrame(
-        columns=['cocktail_id', 'cocktail_name', 'ingredient_id', 'ingredient_name', 'measure'])
-
-    for index, row in cocktails.iterrows():
-        cocktail_name = row['name']
-        # Extract ingredients
-        for ingredient in row['ingredients']:
-            ingredient_id = ingredient['id']
-            ingredient_name = ingredient['name']
-            try:
-                measure = ingredient['measure']
-            except:
-                measure = None
-
-            # Append to the cocktails_and_ingredients DataFrame
-            cocktails_and_ingredients = pd.concat([cocktails_and_ingredients,
-                                                   pd.DataFrame(
-                                                       {'cocktail_id': [index], 'cocktail_name': [cocktail_name],
-                                                        'ingredient_id': [ingredient_id],
-                                                        'ingredient_name': [ingredient_name],
-                                                        'measure': [measure]})],
-                                                  ignore_index=True)
+    ingredient_records = _flatten_ingredients(cocktails)
+    ingredients_counts = cocktails['ingredients'].str.len()
+
+    cocktails_and_ingredients = pd.DataFrame({'cocktail_id': cocktails.index.repeat(ingredients_counts),
+                                              'cocktail_name': cocktails['name'].repeat(ingredients_counts).to_numpy(),
+                                              'ingredient_id': [ingredient['id'] for ingredient in ingredient_records],
+                                              'ingredient_name': [ingredient['name']
+                                                                  for ingredient in ingredient_records],
+                                              'measure': [ingredient.get('measure')
+                                                          for ingredient in ingredient_records]},
+                                             columns=['cocktail_id', 'cocktail_name', 'ingredient_id',
+                                                      'ingredient_name', 'measure'],
+                                             dtype=object)
 
     return cocktails_and_ingredients
 
@@ -79,85 +110,68 @@ def _clean_ingredients_table(ingredients):
     ingredients.drop(columns=['imageUrl'], inplace=True)
 
 
-def _preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredients):
+def _calculate_abv(ingredients, cocktails_and_ingredients):
     """
-    Calculates ABV for each cocktail, categorizes cocktails by ABV, extracts info about number of ingredients,
-    length of instruction and preparation method
-    :param cocktails:
-    :param ingredients:
-    :param cocktails_and_ingredients:
-    :return:
+    Calculates ABV of cocktails from volumes and percentages of their ingredients
+    :param ingredients: Preprocessed ingredients table
+    :param cocktails_and_ingredients: Rows of cocktails and ingredients table of cocktails to calculate ABV for
+    :return: Series of ABV indexed by cocktail name, NaN where it can't be calculated
     """
     result_df = cocktails_and_ingredients.set_index('ingredient_id').join(
         ingredients[['percentage', 'generalized_type']], how='left')
 
-    # Calculate ABV for each cocktail
-    def calculate_abv():
-        for cocktail_id, group in result_df.groupby('cocktail_name'):
-            essential_ingrs = []
-            lack_of_data = False
-
-            for index, row in group.iterrows():
-                gen_type = row['generalized_type'] if pd.notna(row['generalized_type']) else "Unknown"
-                volume_oz = row['volume_oz']
-                percentage = row['percentage']
-
-                if gen_type in ['Non-Alcoholic', 'Alcoholic'] and (pd.isna(volume_oz) or pd.isna(
-                        percentage)):  # Absence of data for Fruit ingredients doesn't lead to mistakes, as all
-                    # measures that have influence on ABV are present in dataset (see upper section)
-                    essential_ingrs.clear()
-                    lack_of_data = True
-
-                    # break
-                elif gen_type in ['Non-Alcoholic', 'Alcoholic', 'Fruit'] and pd.notna(volume_oz) and pd.notna(
-                        percentage):
-                    essential_ingrs.append([row['percentage'], row['volume_oz']])
-
-            if not lack_of_data:
-                total_volume, total_alcohol_volume, abv = 0, 0, 0
-
-                for percentage, volume in essential_ingrs:
-                    total_volume += volume
-                    total_alcohol_volume += (percentage / 100) * volume
-
-                if total_volume > 0 and total_alcohol_volume > 0:
-                    abv = (total_alcohol_volume / total_volume) * 100
-                else:
-                    abv = None
-
-                cocktails.loc[cocktails['name'] == cocktail_id, 'abv'] = abv
-            else:
-                cocktails.loc[cocktails['name'] == cocktail_id, 'abv'] = pd.NA
-
-        cocktails['abv'] = cocktails['abv'].astype(float)
-
-    calculate_abv()
-
-    # Categorize cocktails based on ABV
-    def categorize_abv(abv):
-        if pd.isna(abv):
-            return 'Unknown'
-        elif abv < 10:
-            return 'Weak'
-        elif 10 <= abv < 20:
-            return 'Moderate'
-        elif 20 <= abv < 30:
-            return 'Strong'
-        else:
-            return 'Very Strong'
+    generalized_type = result_df['generalized_type']
+    has_data = result_df['volume_oz'].notna() & result_df['percentage'].notna()
 
-    # Apply the function to the ABV column to create the 'strength' column
-    cocktails['strength'] = cocktails['abv'].apply(categorize_abv)
+    # Absence of data for Fruit ingredients doesn't lead to mistakes, as all measures that have influence on ABV are
+    # present in dataset (see upper section), but for Alcoholic and Non-Alcoholic ones it makes ABV unknown
+    lacks_data = generalized_type.isin(['Non-Alcoholic', 'Alcoholic']) & ~has_data
+    is_essential = generalized_type.isin(['Non-Alcoholic', 'Alcoholic', 'Fruit']) & has_data
 
+    totals = pd.DataFrame({
+        'cocktail_name': result_df['cocktail_name'],
+        'volume': result_df['volume_oz'].where(is_essential, 0),
+        'alcohol_volume': ((result_df['percentage'] / 100) * result_df['volume_oz']).where(is_essential, 0),
+        'lacks_data': lacks_data
+    }).groupby('cocktail_name').sum()
+
+    return ((totals['alcohol_volume'] / totals['volume']) * 100).where(
+        (totals['lacks_data'] == 0) & (totals['volume'] > 0) & (totals['alcohol_volume'] > 0))
+
+
+def _categorize_abv(abv):
+    """
+    Categorizes cocktail by its ABV
+    :param abv:
+    :return: 'Weak', 'Moderate', 'Strong', 'Very Strong' or 'Unknown'
+    """
+    if pd.isna(abv):
+        return 'Unknown'
+    elif abv < 10:
+        return 'Weak'
+    elif 10 <= abv < 20:
+        return 'Moderate'
+    elif 20 <= abv < 30:
+        return 'Strong'
+    else:
+        return 'Very Strong'
+
+
+def _extract_cocktails_features(cocktails, cocktails_and_ingredients):
+    """
+    Extracts info about number of ingredients, length of instruction and preparation method, which unlike ABV don't
+    depend on ingredients table
+    :param cocktails:
+    :param cocktails_and_ingredients:
+    :return:
+    """
     # Cocktails instructions length
     cocktails['instruction_length'] = cocktails['instructions'].str.len()
-    cocktails.head(3)
 
     # Cocktails number of ingredients
     ingredients_counts = cocktails_and_ingredients.groupby('cocktail_id')['ingredient_id'].count().sort_values(
         ascending=False)
     cocktails['num_ingredients'] = ingredients_counts
-    cocktails.head(3)
 
     # Cocktails preparation method
     cocktails['prep_method'] = cocktails['instructions'].str.extract(r'(?i)\b(Stir|Blend|Shake)\b')
@@ -169,6 +183,24 @@ def _preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredient
     cocktails['prep_method'] = cocktails['prep_method'].str.capitalize()
 
 
+def _preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredients):
+    """
+    Calculates ABV for each cocktail, categorizes cocktails by ABV, extracts info about number of ingredients,
+    length of instruction and preparation method
+    :param cocktails:
+    :param ingredients:
+    :param cocktails_and_ingredients:
+    :return:
+    """
+    # Calculate ABV for each cocktail
+    cocktails['abv'] = cocktails['name'].map(_calculate_abv(ingredients, cocktails_and_ingredients)).astype(float)
+
+    # Apply the function to the ABV column to create the 'strength' column
+    cocktails['strength'] = cocktails['abv'].apply(_categorize_abv)
+
+    _extract_cocktails_features(cocktails, cocktails_and_ingredients)
+
+
 def _preprocess_ingredients_table(ingredients):
     """
     Fixes a bunch of types of ingredients, adds generalized_type column, fills percentage data for some of alcoholic ingredients
@@ -244,139 +276,455 @@ def _preprocess_ingredients_table(ingredients):
         (ingredients['generalized_type'] == 'Alcoholic') & (ingredients['percentage'] == 0), 'percentage'] = pd.NA
 
 
-def _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients):
+def _parse_oz_measure(measure):
     """
-    Parses measures of ingredients in cocktails and converts to oz
-    :param cocktails_and_ingredients:
-    :return:
+    Parses measures given in oz, like '2-3 oz', '1 2/3 oz', '1/2 oz' or '1 oz'
+    :param measure: Measure string
+    :return: Volume in oz or None if measure is not in oz
     """
-    # Measures parsing
-    def parse_oz_measure(measure):
-        # Regex pattern to capture ranges like '2-3 oz' and fractions like '1/2 oz'
-        if 'oz' not in measure:
-            return None
-
-        range_pattern = re.match(r'(\d+)-(\d+)', measure)
-        fraction_pattern = re.match(r'(\d+)\s(\d+/\d+)', measure)
-        simple_fraction_pattern = re.match(r'(\d+/\d+)', measure)
-        simple_value_pattern = re.match(r'(\d+)', measure)
-
-        if range_pattern:
-            # Handle ranges like '2-3 oz', return the average
-            low, high = range_pattern.groups()
-            return (float(low) + float(high)) / 2
-
-        elif fraction_pattern:
-            # Handle mixed fractions like '1 2/3 oz'
-            whole_part, fraction = fraction_pattern.groups()
-            fraction_value = eval(fraction)  # Safely evaluate the fraction '2/3'
-            return float(whole_part) + fraction_value
-
-        elif simple_fraction_pattern:
-            # Handle fractions like '1/2 oz'
-            fraction_value = eval(simple_fraction_pattern.group(0))
-            return fraction_value
-
-        elif simple_value_pattern:
-            # Handle simple values like '1 oz'
-            return float(simple_value_pattern.group(0))
-
-        # If none of the patterns match, return None
+    # Regex pattern to capture ranges like '2-3 oz' and fractions like '1/2 oz'
+    if 'oz' not in measure:
         return None
 
-    def parse_juice_of_fruit_measure(measure, is_lemon=True):
-        # Define juice volumes (in oz)
-        lemon_juice_per_fruit = 1.52  # oz of juice from 1 lemon
-        lime_juice_per_fruit = 1.01  # oz of juice from 1 lime
+    range_pattern = re.match(r'(\d+)-(\d+)', measure)
+    fraction_pattern = re.match(r'(\d+)\s(\d+/\d+)', measure)
+    simple_fraction_pattern = re.match(r'(\d+/\d+)', measure)
+    simple_value_pattern = re.match(r'(\d+)', measure)
 
-        # Select the correct juice amount based on the fruit type
-        juice_per_fruit = lemon_juice_per_fruit if is_lemon else lime_juice_per_fruit
+    if range_pattern:
+        # Handle ranges like '2-3 oz', return the average
+        low, high = range_pattern.groups()
+        return (float(low) + float(high)) / 2
 
-        # Remove the 'Juice of' part and strip extra spaces
-        measure = measure.replace('Juice of', '').strip()
+    elif fraction_pattern:
+        # Handle mixed fractions like '1 2/3 oz'
+        whole_part, fraction = fraction_pattern.groups()
+        fraction_value = eval(fraction)  # Safely evaluate the fraction '2/3'
+        return float(whole_part) + fraction_value
 
-        # Handle different fractions or whole numbers
-        if measure == '1':
-            return juice_per_fruit
-        elif measure == '1/2':
-            return juice_per_fruit / 2
-        elif measure == '1/4':
-            return juice_per_fruit / 4
-        else:
-            return None
-
-    def parse_juice_measure(row):
-        if 'juice' not in row['measure'].lower():
-            return None
-
-        if "lemon" in row['ingredient_name'].lower():
-            return parse_juice_of_fruit_measure(row['measure'], True)
-        elif "lime" in row['ingredient_name'].lower():
-            return parse_juice_of_fruit_measure(row['measure'], False)
-
-    def parse_spoon_measure(measure):
-        tblsp = 0.47
-        tsp = 0.135
-        # Extract numerical part of the measure using regex to handle fractions
-        pattern = r"(\d+(\s*\d+/\d+)?|\d+/\d+)\s*(tsp|tblsp)"
-        match = re.search(pattern, measure)
-
-        if match:
-            quantity = match.group(1).strip()  # '1', '1/2', '1 1/2', etc.
-            unit = match.group(3).strip()  # 'tsp' or 'tblsp'
-
-            # Convert quantity to float, including handling fractions like '1 1/2' or '1/4'
-            def fraction_to_float(frac):
-                parts = frac.split()
-                if len(parts) == 2:  # handle mixed numbers like '1 1/2'
-                    return float(parts[0]) + eval(parts[1])
-                return eval(parts[0])
-
-            quantity = fraction_to_float(quantity)
-
-            # Convert based on unit
-            if unit == 'tsp':
-                return quantity * tsp  # return in oz
-            elif unit == 'tblsp':
-                return quantity * tblsp  # return in oz
-        else:
-            return None
+    elif simple_fraction_pattern:
+        # Handle fractions like '1/2 oz'
+        fraction_value = eval(simple_fraction_pattern.group(0))
+        return fraction_value
+
+    elif simple_value_pattern:
+        # Handle simple values like '1 oz'
+        return float(simple_value_pattern.group(0))
 
-    def parse_measure(row):
-        res = parse_oz_measure(row['measure'])
+    # If none of the patterns match, return None
+    return None
 
-        if res is not None:
-            return res
 
-        res = parse_spoon_measure(row['measure'])
+def _parse_juice_of_fruit_measure(measure, is_lemon=True):
+    """
+    Parses measures like 'Juice of 1/2' for lemons and limes
+    :param measure: Measure string
+    :param is_lemon: If fruit is lemon, otherwise lime
+    :return: Volume of juice in oz or None if amount of fruit is not recognized
+    """
+    # Select the correct juice amount based on the fruit type
+    juice_per_fruit = LEMON_JUICE_PER_FRUIT if is_lemon else LIME_JUICE_PER_FRUIT
+
+    # Remove the 'Juice of' part and strip extra spaces
+    measure = measure.replace('Juice of', '').strip()
+
+    # Handle different fractions or whole numbers
+    if measure == '1':
+        return juice_per_fruit
+    elif measure == '1/2':
+        return juice_per_fruit / 2
+    elif measure == '1/4':
+        return juice_per_fruit / 4
+    else:
+        return None
 
-        if res is not None:
-            return res
 
-        res = parse_juice_measure(row)
+def _parse_juice_measure(row):
+    """
+    Parses juice measures of lemon and lime ingredients
+    :param row: Row of cocktails and ingredients table
+    :return: Volume of juice in oz or None
+    """
+    if 'juice' not in row['measure'].lower():
+        return None
+
+    if "lemon" in row['ingredient_name'].lower():
+        return _parse_juice_of_fruit_measure(row['measure'], True)
+    elif "lime" in row['ingredient_name'].lower():
+        return _parse_juice_of_fruit_measure(row['measure'], False)
 
-        if res is not None:
-            return res
 
+def _parse_spoon_measure(measure):
+    """
+    Parses measures given in teaspoons or tablespoons, like '1 1/2 tsp' or '1 tblsp'
+    :param measure: Measure string
+    :return: Volume in oz or None if measure is not in spoons
+    """
+    tblsp = TBLSP_OZ
+    tsp = TSP_OZ
+    # Extract numerical part of the measure using regex to handle fractions
+    pattern = r"(\d+(\s*\d+/\d+)?|\d+/\d+)\s*(tsp|tblsp)"
+    match = re.search(pattern, measure)
+
+    if match:
+        quantity = match.group(1).strip()  # '1', '1/2', '1 1/2', etc.
+        unit = match.group(3).strip()  # 'tsp' or 'tblsp'
+
+        # Convert quantity to float, including handling fractions like '1 1/2' or '1/4'
+        def fraction_to_float(frac):
+            parts = frac.split()
+            if len(parts) == 2:  # handle mixed numbers like '1 1/2'
+                return float(parts[0]) + eval(parts[1])
+            return eval(parts[0])
+
+        quantity = fraction_to_float(quantity)
+
+        # Convert based on unit
+        if unit == 'tsp':
+            return quantity * tsp  # return in oz
+        elif unit == 'tblsp':
+            return quantity * tblsp  # return in oz
+    else:
         return None
 
+
+def _parse_measure(row):
+    """
+    Converts measure of a single row to volume in oz, reference implementation of _parse_measures
+    :param row: Row of cocktails and ingredients table
+    :return: Volume in oz or None if measure can't be parsed
+    """
+    res = _parse_oz_measure(row['measure'])
+
+    if res is not None:
+        return res
+
+    res = _parse_spoon_measure(row['measure'])
+
+    if res is not None:
+        return res
+
+    res = _parse_juice_measure(row)
+
+    if res is not None:
+        return res
+
+    return None
+
+
+# Anchored alternatives are tried in the same order as in _parse_oz_measure: range, mixed fraction, fraction, value
+OZ_PATTERN = re.compile(r'^(?:(\d+)-(\d+)|(\d+)\s(\d+)/(\d+)|(\d+)/(\d+)|(\d+))')
+SPOON_PATTERN = re.compile(r"(\d+(\s*\d+/\d+)?|\d+/\d+)\s*(tsp|tblsp)")
+SPOON_QUANTITY_PATTERN = re.compile(r'^(?:(\d+)\s+)?(\d+)(?:/(\d+))?$')
+
+
+def _parse_oz_measures(measures):
+    """
+    Vectorized version of _parse_oz_measure
+    :param measures: Series of measure strings
+    :return: Series of volumes in oz, NaN where measure is not in oz
+    """
+    parts = measures[measures.str.contains('oz', regex=False)].str.extract(OZ_PATTERN).astype(float)
+
+    range_value = (parts[0] + parts[1]) / 2
+    mixed_fraction_value = parts[2] + parts[3] / parts[4]
+    fraction_value = parts[5] / parts[6]
+    simple_value = parts[7]
+
+    volume = range_value.fillna(mixed_fraction_value).fillna(fraction_value).fillna(simple_value)
+
+    return volume.reindex(measures.index)
+
+
+def _parse_spoon_measures(measures):
+    """
+    Vectorized version of _parse_spoon_measure
+    :param measures: Series of measure strings
+    :return: Series of volumes in oz, NaN where measure is not in spoons
+    """
+    match = measures.str.extract(SPOON_PATTERN).dropna(subset=[0])
+
+    # Quantity without whitespace, like '11/2', is evaluated as a single fraction, as in _parse_spoon_measure
+    quantity_parts = match[0].str.extract(SPOON_QUANTITY_PATTERN).astype(float)
+    quantity = quantity_parts[0].fillna(0) + quantity_parts[1] / quantity_parts[2].fillna(1)
+
+    volume = quantity * match[2].map({'tsp': TSP_OZ, 'tblsp': TBLSP_OZ})
+
+    return volume.reindex(measures.index)
+
+
+def _parse_juice_fruits(measures):
+    """
+    Vectorized part of _parse_juice_of_fruit_measure which depends only on measure
+    :param measures: Series of measure strings
+    :return: Series with number of fruits juice is squeezed from as a divisor, 1 for 'Juice of 1', 2 for 'Juice of 1/2'
+    and so on, NaN where measure is not a recognized juice measure
+    """
+    is_juice = measures.str.lower().str.contains('juice', regex=False).fillna(False).astype(bool)
+
+    fruits = measures[is_juice].str.replace('Juice of', '', regex=False).str.strip().map({'1': 1, '1/2': 2, '1/4': 4})
+
+    return fruits.reindex(measures.index)
+
+
+def _juice_per_fruit(ingredient_names):
+    """
+    Vectorized part of _parse_juice_measure which depends only on ingredient name
+    :param ingredient_names: Series of ingredient names
+    :return: Series of oz of juice from one fruit, NaN for ingredients other than lemons and limes
+    """
+    ingredient_names = ingredient_names.str.lower()
+
+    juice_per_fruit = pd.Series(np.nan, index=ingredient_names.index)
+    juice_per_fruit[ingredient_names.str.contains('lime', regex=False).fillna(False).astype(bool)] = \
+        LIME_JUICE_PER_FRUIT
+    juice_per_fruit[ingredient_names.str.contains('lemon', regex=False).fillna(False).astype(bool)] = \
+        LEMON_JUICE_PER_FRUIT
+
+    return juice_per_fruit
+
+
+def _parse_measures(measures, ingredient_names):
+    """
+    Converts measures to volume in oz with precompiled patterns and arithmetic on whole columns, gives the same results
+    as applying _parse_measure to every row
+    :param measures: Series of measure strings
+    :param ingredient_names: Series of ingredient names aligned with measures
+    :return: Series of volumes in oz, NaN where measure can't be parsed
+    """
+    # Measures and names repeat heavily, so patterns are matched once per distinct string and results are taken by codes
+    measure_codes, distinct_measures = pd.factorize(measures, use_na_sentinel=False)
+    name_codes, distinct_names = pd.factorize(ingredient_names, use_na_sentinel=False)
+    distinct_measures = pd.Series(distinct_measures, dtype=object)
+    distinct_names = pd.Series(distinct_names, dtype=object)
+
+    # Oz measures take precedence over spoons, and both of them over juice of fruits
+    volume = _parse_oz_measures(distinct_measures).fillna(_parse_spoon_measures(distinct_measures))
+    volume = volume.to_numpy()[measure_codes]
+
+    juice = _juice_per_fruit(distinct_names).to_numpy()[name_codes] / \
+        _parse_juice_fruits(distinct_measures).to_numpy()[measure_codes]
+
+    return pd.Series(np.where(np.isnan(volume), juice, volume), index=measures.index)
+
+
+class MeasureCache:
+    """
+    Bounded cache of volumes in oz parsed from (measure, ingredient name) pairs. Least recently used pairs are evicted
+    when cache is full, and cache can be saved to json file and loaded back, so repeated preprocessing of growing
+    datasets only parses pairs it has not seen before
+    """
+
+    def __init__(self, max_size=100_000, path=None):
+        """
+        :param max_size: Maximal number of pairs kept in cache
+        :param path: Path of json file cache is loaded from if it exists, and saved to by save()
+        """
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._volumes = OrderedDict()
+
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for measure, ingredient_name, volume_oz in json.load(file):
+                    self._volumes[(measure, ingredient_name)] = np.nan if volume_oz is None else volume_oz
+
+            self._evict()
+
+    def __len__(self):
+        return len(self._volumes)
+
+    def __contains__(self, pair):
+        return pair in self._volumes
+
+    def _evict(self):
+        """
+        Drops least recently used pairs until cache fits in max_size
+        :return:
+        """
+        while len(self._volumes) > self.max_size:
+            self._volumes.popitem(last=False)
+
+    def parse(self, measures, ingredient_names):
+        """
+        Converts measures to volume in oz, parsing only distinct pairs which are not cached yet
+        :param measures: Series of measure strings
+        :param ingredient_names: Series of ingredient names aligned with measures
+        :return: Series of volumes in oz, NaN where measure can't be parsed
+        """
+        # Factorize pairs by combining codes of measures and names
+        measure_codes, distinct_measures = pd.factorize(measures, use_na_sentinel=False)
+        name_codes, distinct_names = pd.factorize(ingredient_names, use_na_sentinel=False)
+        pair_codes, distinct_pairs = pd.factorize(measure_codes.astype(np.int64) * len(distinct_names) + name_codes)
+
+        distinct_measures = [None if pd.isna(measure) else measure for measure in distinct_measures]
+        distinct_names = [None if pd.isna(name) else name for name in distinct_names]
+        pairs = [(distinct_measures[pair // len(distinct_names)], distinct_names[pair % len(distinct_names)])
+                 for pair in distinct_pairs]
+
+        volumes = np.empty(len(pairs))
+        unseen = []
+        for position, pair in enumerate(pairs):
+            if pair in self._volumes:
+                self._volumes.move_to_end(pair)
+                volumes[position] = self._volumes[pair]
+            else:
+                unseen.append(position)
+
+        self.hits += len(pairs) - len(unseen)
+        self.misses += len(unseen)
+
+        if unseen:
+            parsed = _parse_measures(pd.Series([pairs[position][0] for position in unseen], dtype=object),
+                                     pd.Series([pairs[position][1] for position in unseen], dtype=object))
+
+            volumes[unseen] = parsed.to_numpy()
+            for position, volume_oz in zip(unseen, parsed):
+                self._volumes[pairs[position]] = volume_oz
+
+            self._evict()
+
+        return pd.Series(volumes[pair_codes], index=measures.index)
+
+    def to_frame(self):
+        """
+        Returns content of cache for inspection, from least to most recently used pair
+        :return: Dataframe with measure, ingredient_name and volume_oz columns
+        """
+        return pd.DataFrame([(measure, ingredient_name, volume_oz)
+                             for (measure, ingredient_name), volume_oz in self._volumes.items()],
+                            columns=['measure', 'ingredient_name', 'volume_oz'])
+
+    def save(self, path=None):
+        """
+        Saves cache to json file
+        :param path: Path of the file, path given to constructor by default
+        :return:
+        """
+        path = path if path is not None else self.path
+        if path is None:
+            raise ValueError('Path of measure cache file has to be given to save() or to MeasureCache constructor')
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump([[measure, ingredient_name, None if np.isnan(volume_oz) else volume_oz]
+                       for (measure, ingredient_name), volume_oz in self._volumes.items()], file)
+
+
+def _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients, measure_cache=None):
+    """
+    Parses measures of ingredients in cocktails and converts to oz
+    :param cocktails_and_ingredients:
+    :param measure_cache: MeasureCache to take already parsed measures from, measures are parsed from scratch if None
+    :return:
+    """
     # Converting measures to volume in oz
     cocktails_and_ingredients['measure'] = cocktails_and_ingredients['measure'].astype(str)
-    cocktails_and_ingredients['volume_oz'] = cocktails_and_ingredients.apply(parse_measure, axis=1)
 
+    parse_measures = measure_cache.parse if measure_cache is not None else _parse_measures
+    cocktails_and_ingredients['volume_oz'] = parse_measures(cocktails_and_ingredients['measure'],
+                                                            cocktails_and_ingredients['ingredient_name'])
 
-def preprocess():
+
+def _read_source(source):
     """
-    Downloads cocktails.json from SolVro github and performs all needed preprocessing and augmentation of data for
-    analysis, for details see docs of functions inside
-    :return: cocktails, ingredients, cocktails_and_ingredients dataframes
+    Reads raw content of dataset
+    :param source: Url, path to local file or file-like object
+    :return: Content as bytes
     """
-    # Read json
-    init_table = pd.read_json(
-        "https://raw.githubusercontent.com/Solvro/rekrutacja/refs/heads/main/data/cocktail_dataset.json")
+    if hasattr(source, 'read'):
+        content = source.read()
+        return content.encode('utf-8') if isinstance(content, str) else content
+
+    if str(source).startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+
+    with open(source, 'rb') as file:
+        return file.read()
+
+
+def _write_atomically(path, write):
+    """
+    Writes file through temporary file in the same directory, so concurrent readers never see partially written file
+    :param path: Destination path
+    :param write: Bytes to write or function which writes to the path it gets
+    :return:
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
 
+    if isinstance(write, bytes):
+        with open(temporary_path, 'wb') as file:
+            file.write(write)
+    else:
+        write(temporary_path)
+
+    os.replace(temporary_path, path)
+
+
+def _load_raw_json(source, cache_dir=None, refresh=False):
+    """
+    Loads raw json of dataset, keeping it in cache_dir under hash of its content. Urls are mapped to hashes of their
+    content, so once downloaded dataset is loaded without network access
+    :param source: Url, path to local file or file-like object
+    :param cache_dir: Directory of the cache, nothing is cached if None
+    :param refresh: Download url again even if it is cached
+    :return: Content of json as bytes and its sha256 hash
+    """
+    is_url = isinstance(source, str) and source.startswith(('http://', 'https://'))
+    urls_path = os.path.join(cache_dir, 'urls.json') if cache_dir is not None else None
+
+    urls = {}
+    if urls_path is not None and os.path.exists(urls_path):
+        with open(urls_path, encoding='utf-8') as file:
+            urls = json.load(file)
+
+    if is_url and not refresh and source in urls:
+        raw_path = os.path.join(cache_dir, 'raw', f'{urls[source]}.json')
+        if os.path.exists(raw_path):
+            with open(raw_path, 'rb') as file:
+                return file.read(), urls[source]
+
+    content = _read_source(source)
+    digest = hashlib.sha256(content).hexdigest()
+
+    if cache_dir is not None:
+        raw_path = os.path.join(cache_dir, 'raw', f'{digest}.json')
+        if not os.path.exists(raw_path):
+            _write_atomically(raw_path, content)
+
+        if is_url and urls.get(source) != digest:
+            urls[source] = digest
+            _write_atomically(urls_path, json.dumps(urls).encode('utf-8'))
+
+    return content, digest
+
+
+def load_raw_cocktails(source=DATASET_URL, cache_dir=None, refresh=False):
+    """
+    Loads raw cocktails dataframe from url, local path or file-like object
+    :param source: Url, path to local file or file-like object with dataset json
+    :param cache_dir: Directory where downloaded json is cached, nothing is cached if None
+    :param refresh: Download url again even if it is cached
+    :return: Raw cocktails dataframe
+    """
+    content, _ = _load_raw_json(source, cache_dir, refresh)
+
+    return pd.read_json(io.BytesIO(content))
+
+
+def _preprocess_raw_cocktails(cocktails, measure_cache=None):
+    """
+    Performs all preprocessing of raw cocktails dataframe in one process
+    :param cocktails: Raw cocktails dataframe, it is modified in place
+    :param measure_cache: MeasureCache to parse measures with
+    :return: cocktails, ingredients, cocktails_and_ingredients dataframes
+    """
     # Tables creation
-    cocktails = init_table
     ingredients = _create_ingredients_table(cocktails)
     cocktails_and_ingredients = _create_cocktails_and_ingredients_table(cocktails)
 
@@ -386,7 +734,498 @@ def preprocess():
 
     # Tables preprocessing
     _preprocess_ingredients_table(ingredients)
-    _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients)
+    _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients, measure_cache)
     _preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredients)
 
     return cocktails, ingredients, cocktails_and_ingredients
+
+
+def _preprocess_partition(cocktails, parse_measures=True):
+    """
+    Performs part of preprocessing which doesn't need whole dataset, run in worker processes
+    :param cocktails: Partition of raw cocktails dataframe
+    :param parse_measures: If measures are parsed in worker
+    :return: Distinct ingredients of partition, cleaned cocktails with extracted features and cocktails_and_ingredients
+    """
+    distinct_ingredients = {}
+    for cocktail_ingredients in cocktails['ingredients']:
+        for ingredient in cocktail_ingredients:
+            distinct_ingredients.setdefault(_ingredient_key(ingredient), ingredient)
+
+    cocktails_and_ingredients = _create_cocktails_and_ingredients_table(cocktails)
+
+    _clean_cocktails_table(cocktails)
+    if parse_measures:
+        _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients)
+    _extract_cocktails_features(cocktails, cocktails_and_ingredients)
+
+    return distinct_ingredients, cocktails, cocktails_and_ingredients
+
+
+def _preprocess_in_parallel(cocktails, n_jobs, measure_cache=None):
+    """
+    Performs all preprocessing of raw cocktails dataframe in a pool of processes. Cocktails are split into contiguous
+    partitions by id, which are processed by workers and merged back in their order, then ingredients are deduplicated,
+    their percentage is imputed and ABV is calculated on merged tables. Gives the same tables as
+    _preprocess_raw_cocktails
+    :param cocktails: Raw cocktails dataframe
+    :param n_jobs: Number of worker processes
+    :param measure_cache: MeasureCache to parse measures with, measures are parsed after merge if it is given, otherwise
+    in workers
+    :return: cocktails, ingredients, cocktails_and_ingredients dataframes
+    """
+    # A few partitions per worker even out differences in their processing time
+    n_partitions = max(1, min(len(cocktails), n_jobs * 4))
+    bounds = np.linspace(0, len(cocktails), n_partitions + 1).astype(int)
+    partitions = [cocktails.iloc[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(_preprocess_partition, partitions,
+                                    [measure_cache is None] * len(partitions)))
+
+    distinct_ingredients = {}
+    for partition_ingredients, _, _ in results:
+        for key, ingredient in partition_ingredients.items():
+            distinct_ingredients.setdefault(key, ingredient)
+
+    cocktails = pd.concat([partition_cocktails for _, partition_cocktails, _ in results])
+    cocktails_and_ingredients = pd.concat([partition_rows for _, _, partition_rows in results], ignore_index=True)
+
+    ingredients = _build_ingredients_table(distinct_ingredients.values())
+
+    if measure_cache is not None:
+        _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients, measure_cache)
+
+    abv = cocktails['name'].map(_calculate_abv(ingredients, cocktails_and_ingredients)).astype(float)
+    position = cocktails.columns.get_loc('instruction_length')
+    cocktails.insert(position, 'abv', abv)
+    cocktails.insert(position + 1, 'strength', abv.apply(_categorize_abv))
+
+    return cocktails, ingredients, cocktails_and_ingredients
+
+
+def preprocess(source=DATASET_URL, cache_dir=None, refresh=False, measure_cache=None, n_jobs=None):
+    """
+    Loads cocktails.json, by default from SolVro github, and performs all needed preprocessing and augmentation of data
+    for analysis, for details see docs of functions inside. With cache_dir, raw json and processed tables are cached
+    under hash of json content, so warm start skips both download and preprocessing
+    :param source: Url, path to local file or file-like object with dataset json
+    :param cache_dir: Directory of the cache, nothing is cached if None
+    :param refresh: Download url again even if it is cached
+    :param measure_cache: MeasureCache reused between runs, it is saved after parsing if it has a path
+    :param n_jobs: Number of worker processes to preprocess cocktails in parallel, everything runs in current process if
+    None or 1
+    :return: cocktails, ingredients, cocktails_and_ingredients dataframes
+    """
+    content, digest = _load_raw_json(source, cache_dir, refresh)
+
+    processed_dir = os.path.join(cache_dir, 'processed', f'{digest}-v{PROCESSED_CACHE_VERSION}') \
+        if cache_dir is not None else None
+
+    if processed_dir is not None and all(os.path.exists(os.path.join(processed_dir, f'{name}.pkl'))
+                                         for name in TABLE_NAMES):
+        return tuple(pd.read_pickle(os.path.join(processed_dir, f'{name}.pkl')) for name in TABLE_NAMES)
+
+    # Read json
+    init_table = pd.read_json(io.BytesIO(content))
+
+    if n_jobs is not None and n_jobs > 1:
+        cocktails, ingredients, cocktails_and_ingredients = _preprocess_in_parallel(init_table, n_jobs, measure_cache)
+    else:
+        cocktails, ingredients, cocktails_and_ingredients = _preprocess_raw_cocktails(init_table, measure_cache)
+
+    if measure_cache is not None and measure_cache.path is not None:
+        measure_cache.save()
+
+    if processed_dir is not None:
+        for name, table in zip(TABLE_NAMES, [cocktails, ingredients, cocktails_and_ingredients]):
+            _write_atomically(os.path.join(processed_dir, f'{name}.pkl'), table.to_pickle)
+
+    return cocktails, ingredients, cocktails_and_ingredients
+
+
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def _iter_json_records(file, read_size=1 << 20):
+    """
+    Reads records one by one from JSON Lines or from JSON array, without loading whole file into memory
+    :param file: Text file object
+    :param read_size: Number of characters read at once
+    :return: Generator of records
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(read_size)
+
+    while buffer.isspace():
+        more = file.read(read_size)
+        if not more:
+            return
+        buffer += more
+
+    if buffer.lstrip().startswith('['):
+        position = buffer.index('[') + 1
+
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+
+            if position == len(buffer) or buffer[position] != ']':
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # Record is split between reads
+                    more = file.read(read_size)
+                    if not more:
+                        raise
+                    buffer = buffer[position:] + more
+                    position = 0
+                    continue
+
+                yield record
+                position = end
+            else:
+                return
+    else:
+        rest = ''
+        while buffer:
+            lines = (rest + buffer).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+            buffer = file.read(read_size)
+
+        if rest.strip():
+            yield json.loads(rest)
+
+
+def _iter_source_records(source):
+    """
+    Reads raw cocktail records incrementally from source
+    :param source: Path to local file or seekable file-like object with JSON Lines or JSON array, file objects are read
+    from the beginning
+    :return: Generator of cocktail records
+    """
+    if hasattr(source, 'read'):
+        source.seek(0)
+
+        if isinstance(source.read(0), bytes):
+            wrapper = io.TextIOWrapper(source, encoding='utf-8')
+            try:
+                yield from _iter_json_records(wrapper)
+            finally:
+                # Detach, so source is not closed together with wrapper
+                wrapper.detach()
+        else:
+            yield from _iter_json_records(source)
+    else:
+        with open(source, encoding='utf-8') as file:
+            yield from _iter_json_records(file)
+
+
+def iter_raw_cocktails(source, chunk_size=10_000):
+    """
+    Reads raw cocktails in chunks, each laid out like dataframe read from the whole json and indexed by position of
+    cocktail in source
+    :param source: Path to local file or seekable file-like object with JSON Lines or JSON array
+    :param chunk_size: Number of cocktails in a chunk
+    :return: Generator of raw cocktails dataframes
+    """
+    records = []
+    offset = 0
+
+    for record in _iter_source_records(source):
+        records.append(record)
+
+        if len(records) == chunk_size:
+            yield pd.DataFrame(records, index=pd.RangeIndex(offset, offset + len(records)))
+            offset += len(records)
+            records = []
+
+    if records:
+        yield pd.DataFrame(records, index=pd.RangeIndex(offset, offset + len(records)))
+
+
+def _ingredient_key(ingredient):
+    """
+    Key by which ingredients are deduplicated, the same as in _create_ingredients_table
+    :param ingredient: Ingredient dict from raw json
+    :return: Hashable key of all fields of ingredient which are kept in ingredients table
+    """
+    return tuple(sorted((field, value) for field, value in ingredient.items()
+                        if field not in ('measure', 'createdAt', 'updatedAt')))
+
+
+def _build_ingredients_table(distinct_ingredients):
+    """
+    Builds and preprocesses ingredients table from distinct ingredients
+    :param distinct_ingredients: Distinct ingredient dicts in order of their first occurrence in dataset
+    :return: Preprocessed ingredients table
+    """
+    ingredients = _create_ingredients_table(pd.DataFrame({'ingredients': [list(distinct_ingredients)]}))
+
+    _clean_ingredients_table(ingredients)
+    _preprocess_ingredients_table(ingredients)
+
+    return ingredients
+
+
+def _stream_ingredients_table(source):
+    """
+    First pass of streaming preprocessing, builds ingredients table keeping only distinct ingredients in memory
+    :param source: Path to local file or seekable file-like object with JSON Lines or JSON array
+    :return: Preprocessed ingredients table
+    """
+    distinct_ingredients = {}
+
+    for record in _iter_source_records(source):
+        for ingredient in record['ingredients']:
+            distinct_ingredients.setdefault(_ingredient_key(ingredient), ingredient)
+
+    return _build_ingredients_table(distinct_ingredients.values())
+
+
+def _stream_chunks(source, ingredients, chunk_size, measure_cache):
+    """
+    Second pass of streaming preprocessing, see preprocess_stream
+    :return: Generator of cocktails and cocktails_and_ingredients chunks
+    """
+    rows_offset = 0
+
+    for cocktails in iter_raw_cocktails(source, chunk_size):
+        cocktails_and_ingredients = _create_cocktails_and_ingredients_table(cocktails)
+        cocktails_and_ingredients.index = pd.RangeIndex(rows_offset, rows_offset + len(cocktails_and_ingredients))
+        rows_offset += len(cocktails_and_ingredients)
+
+        _clean_cocktails_table(cocktails)
+        _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients, measure_cache)
+        _preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredients)
+
+        yield cocktails, cocktails_and_ingredients
+
+
+def preprocess_stream(source, chunk_size=10_000, measure_cache=None):
+    """
+    Preprocesses dataset which doesn't fit in memory in two passes over source. First pass collects distinct
+    ingredients and builds ingredients table, with percentage imputed from all of them, second one is lazy and processes
+    cocktails in chunks, so only one chunk is held in memory at a time. Concatenated chunks give the same tables as
+    preprocess, provided that cocktail names are unique
+    :param source: Path to local file or seekable file-like object with JSON Lines or JSON array
+    :param chunk_size: Number of cocktails in a chunk
+    :param measure_cache: MeasureCache shared by all chunks
+    :return: Ingredients table and generator of cocktails, cocktails_and_ingredients dataframes for every chunk
+    """
+    ingredients = _stream_ingredients_table(source)
+
+    return ingredients, _stream_chunks(source, ingredients, chunk_size, measure_cache)
+
+
+class IncrementalPreprocessor:
+    """
+    Preprocesses dataset which only grows by appended cocktails, computing only new rows for every batch. Tables are
+    always the same as preprocess would give for all cocktails seen so far, provided that cocktail names are unique.
+    Processed tables alone don't keep raw percentages of ingredients needed to impute missing ones, so state of
+    preprocessor has to be kept between updates, for example with save and load
+    """
+
+    def __init__(self, measure_cache=None):
+        """
+        :param measure_cache: MeasureCache used to parse measures of new cocktails
+        """
+        self.measure_cache = measure_cache
+        self.ingredients = None
+        self._distinct_ingredients = {}
+        self._cocktails_batches = []
+        self._cocktails_and_ingredients_batches = []
+        self._batch_offsets = []
+        self._cocktail_ids_by_ingredient = defaultdict(list)
+        self._n_cocktails = 0
+        self._n_rows = 0
+
+    def update(self, raw_cocktails):
+        """
+        Preprocesses batch of new cocktails and updates derived values of already processed ones, which changed
+        because of new ingredients: imputed percentages of ingredients and ABV of cocktails using them
+        :param raw_cocktails: Dataframe of new cocktails, laid out like the one read from raw json
+        :return: Processed cocktails, cocktails_and_ingredients dataframes of the batch
+        """
+        cocktails = raw_cocktails.copy()
+        cocktails.index = pd.RangeIndex(self._n_cocktails, self._n_cocktails + len(cocktails))
+
+        # Ingredients table is rebuilt from distinct ingredients, its size doesn't depend on number of cocktails
+        for cocktail_ingredients in cocktails['ingredients']:
+            for ingredient in cocktail_ingredients:
+                self._distinct_ingredients.setdefault(_ingredient_key(ingredient), ingredient)
+
+        previous_ingredients = self.ingredients
+        self.ingredients = _build_ingredients_table(self._distinct_ingredients.values())
+
+        cocktails_and_ingredients = _create_cocktails_and_ingredients_table(cocktails)
+        cocktails_and_ingredients.index = pd.RangeIndex(self._n_rows, self._n_rows + len(cocktails_and_ingredients))
+
+        _clean_cocktails_table(cocktails)
+        _preprocess_cocktails_and_ingredients_table(cocktails_and_ingredients, self.measure_cache)
+        _preprocess_cocktails_table(cocktails, self.ingredients, cocktails_and_ingredients)
+
+        if previous_ingredients is not None:
+            self._update_abv(self._changed_ingredients(previous_ingredients))
+
+        for ingredient_id, cocktail_ids in cocktails_and_ingredients.groupby('ingredient_id')['cocktail_id']:
+            self._cocktail_ids_by_ingredient[ingredient_id].extend(cocktail_ids.unique())
+
+        self._batch_offsets.append(self._n_cocktails)
+        self._cocktails_batches.append(cocktails)
+        self._cocktails_and_ingredients_batches.append(cocktails_and_ingredients)
+        self._n_cocktails += len(cocktails)
+        self._n_rows += len(cocktails_and_ingredients)
+
+        return cocktails, cocktails_and_ingredients
+
+    def _changed_ingredients(self, previous_ingredients):
+        """
+        Finds ingredients whose data used to calculate ABV changed
+        :param previous_ingredients: Ingredients table before update
+        :return: Ids of changed ingredients
+        """
+        columns = ['percentage', 'generalized_type']
+        previous = previous_ingredients[columns].reindex(self.ingredients.index)
+        current = self.ingredients[columns]
+
+        changed = ~((previous == current) | (previous.isna() & current.isna())).all(axis=1)
+
+        # Ingredients new to the catalog are used only by new cocktails
+        return current.index[changed & current.index.isin(previous_ingredients.index)]
+
+    def _update_abv(self, changed_ingredient_ids):
+        """
+        Recalculates ABV and strength of already processed cocktails which use changed ingredients
+        :param changed_ingredient_ids:
+        :return:
+        """
+        affected_ids = np.unique(np.array([cocktail_id for ingredient_id in changed_ingredient_ids
+                                           for cocktail_id in self._cocktail_ids_by_ingredient.get(ingredient_id, [])],
+                                          dtype=np.int64))
+        if len(affected_ids) == 0:
+            return
+
+        batches = np.searchsorted(self._batch_offsets, affected_ids, side='right') - 1
+
+        for batch in np.unique(batches):
+            cocktails = self._cocktails_batches[batch]
+            cocktails_and_ingredients = self._cocktails_and_ingredients_batches[batch]
+            batch_ids = affected_ids[batches == batch]
+
+            # Rows of a batch are ordered by cocktail, so rows of affected cocktails are found by binary search
+            row_cocktail_ids = cocktails_and_ingredients['cocktail_id'].to_numpy(dtype=np.int64)
+            starts = np.searchsorted(row_cocktail_ids, batch_ids, side='left')
+            ends = np.searchsorted(row_cocktail_ids, batch_ids, side='right')
+            rows = cocktails_and_ingredients.iloc[np.concatenate([np.arange(start, end)
+                                                                  for start, end in zip(starts, ends)])]
+
+            abv = cocktails.loc[batch_ids, 'name'].map(_calculate_abv(self.ingredients, rows)).astype(float)
+            cocktails.loc[batch_ids, 'abv'] = abv
+            cocktails.loc[batch_ids, 'strength'] = abv.apply(_categorize_abv)
+
+    def tables(self):
+        """
+        Concatenates processed batches
+        :return: cocktails, ingredients, cocktails_and_ingredients dataframes
+        """
+        return (pd.concat(self._cocktails_batches),
+                self.ingredients,
+                pd.concat(self._cocktails_and_ingredients_batches))
+
+    def save(self, path):
+        """
+        Saves state of preprocessor to pickle file
+        :param path:
+        :return:
+        """
+        _write_atomically(path, pickle.dumps(self))
+
+    @staticmethod
+    def load(path):
+        """
+        Loads state of preprocessor saved with save
+        :param path:
+        :return: IncrementalPreprocessor
+        """
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+
+def save_tables(cocktails, ingredients, cocktails_and_ingredients, directory, file_format='feather'):
+    """
+    Saves snapshot of processed tables in columnar format, with categorical dtypes for low cardinality columns.
+    Requires pyarrow
+    :param cocktails:
+    :param ingredients:
+    :param cocktails_and_ingredients:
+    :param directory: Directory to save tables to
+    :param file_format: 'feather', written uncompressed as a single chunk so it can be memory mapped, or 'parquet'
+    :return:
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+
+    if file_format not in ('feather', 'parquet'):
+        raise ValueError(f"Unknown file format '{file_format}', expected 'feather' or 'parquet'")
+
+    for name, table in zip(TABLE_NAMES, [cocktails, ingredients, cocktails_and_ingredients]):
+        table = table.copy()
+
+        for column in CATEGORICAL_COLUMNS[name]:
+            table[column] = table[column].astype('category')
+
+        # Ids are stored as integers rather than python objects
+        for column in ['cocktail_id', 'ingredient_id']:
+            if column in table.columns:
+                table[column] = table[column].astype('int64')
+
+        arrow_table = pa.Table.from_pandas(table, preserve_index=True)
+
+        if file_format == 'feather':
+            # Columns split into chunks would have to be concatenated, so they couldn't be read without a copy
+            _write_atomically(os.path.join(directory, f'{name}.feather'),
+                              lambda path: feather.write_feather(arrow_table, path, compression='uncompressed',
+                                                                 chunksize=max(arrow_table.num_rows, 1)))
+        else:
+            _write_atomically(os.path.join(directory, f'{name}.parquet'),
+                              lambda path: parquet.write_table(arrow_table, path))
+
+
+def load_tables(directory, memory_map=True):
+    """
+    Loads snapshot of processed tables saved with save_tables. Requires pyarrow. Numeric columns without missing
+    values, like ids, are not copied: they are read-only views of data read by pyarrow, which is the file itself for a
+    memory mapped Feather file, so they have to be copied before modifying them in place. Other columns are converted,
+    strings and lists into python objects, and Parquet files are always decoded into memory
+    :param directory: Directory tables were saved to
+    :param memory_map: Read Feather files through memory map instead of reading them into memory first
+    :return: cocktails, ingredients, cocktails_and_ingredients dataframes
+    """
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+
+    tables = []
+    for name in TABLE_NAMES:
+        feather_path = os.path.join(directory, f'{name}.feather')
+
+        if os.path.exists(feather_path):
+            arrow_table = feather.read_table(feather_path, memory_map=memory_map)
+        else:
+            arrow_table = parquet.read_table(os.path.join(directory, f'{name}.parquet'), memory_map=memory_map)
+
+        # Blocks are not consolidated so columns which can be are taken without a copy, and the arrow table frees
+        # columns as soon as they are converted
+        table = arrow_table.to_pandas(split_blocks=True, self_destruct=True)
+        del arrow_table
+
+        # Lists are read back as arrays
+        if 'tags' in table.columns:
+            table['tags'] = table['tags'].map(lambda tags: list(tags) if tags is not None else None)
+
+        tables.append(table)
+
+    return tuple(tables)
@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from clusterer import CocktailMatrix
+
+# Hashes of MinHash are computed modulo a prime, small enough for products to fit in 64 bits
+MINHASH_PRIME = (1 << 31) - 1
+
+
+def _to_csr(matrix):
+    """
+    Returns values of a matrix as a CSR matrix.
+
+    :param matrix: DataFrame or CocktailMatrix.
+
+    :returns: CSR matrix.
+    """
+    if isinstance(matrix, CocktailMatrix):
+        return matrix.matrix
+
+    return sparse.csr_matrix(matrix.to_numpy(dtype=float))
+
+
+class SimilarityIndex:
+    """
+    A class to find cocktails most similar to given ones, by cosine similarity of their volume or style vectors,
+    or by Jaccard similarity of their sets of ingredients.
+    """
+    def __init__(self, matrix, metric='cosine', backend='exact', n_permutations=64, n_bands=32, block_size=1_000,
+                 random_state=42):
+        """
+        Precomputes normalized sparse vectors of cocktails and, for the approximate backend, their MinHash buckets.
+
+        :param matrix: Matrix of cocktails, e.g. from generate_cocktails_and_ingredients_matrix_with_volumes or
+                       generate_table_with_cocktails_and_style, DataFrame or CocktailMatrix.
+        :param metric: 'cosine' or 'jaccard'.
+        :param backend: 'exact' to score every cocktail sharing a feature with the query, or 'minhash' to score only
+                        cocktails colliding with it in MinHash LSH buckets. Buckets group cocktails with similar sets of
+                        features, so MinHash approximates Jaccard similarity better than cosine similarity.
+        :param n_permutations: Number of MinHash permutations.
+        :param n_bands: Number of LSH bands, must divide n_permutations.
+        :param block_size: Number of queries scored at once.
+        :param random_state: Random state for reproducibility of MinHash permutations.
+        """
+        if metric not in ('cosine', 'jaccard'):
+            raise ValueError(f'Unknown metric {metric}, expected cosine or jaccard')
+        if backend not in ('exact', 'minhash'):
+            raise ValueError(f'Unknown backend {backend}, expected exact or minhash')
+        if n_permutations % n_bands:
+            raise ValueError('Number of bands must divide number of permutations')
+
+        self.metric = metric
+        self.backend = backend
+        self.block_size = block_size
+        self.index = pd.Index(matrix.index)
+        self.columns = pd.Index(matrix.columns)
+
+        self._vectors = self._prepare(_to_csr(matrix))
+        self._sizes = np.diff(self._vectors.indptr)
+        self._transposed = self._vectors.T.tocsr()
+
+        if backend == 'minhash':
+            rng = np.random.default_rng(random_state)
+            self._hash_a = rng.integers(1, MINHASH_PRIME, size=n_permutations, dtype=np.uint64)
+            self._hash_b = rng.integers(0, MINHASH_PRIME, size=n_permutations, dtype=np.uint64)
+            self._band_multipliers = rng.integers(1, np.iinfo(np.int64).max, size=n_permutations // n_bands,
+                                                  dtype=np.uint64) | np.uint64(1)
+            self.n_bands = n_bands
+
+            band_keys = self._band_keys(self._vectors)
+            self._band_order = np.argsort(band_keys, axis=0, kind='stable')
+            self._sorted_band_keys = np.take_along_axis(band_keys, self._band_order, axis=0)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _prepare(self, matrix):
+        """
+        Normalizes rows to unit length for cosine similarity, or binarizes them for Jaccard similarity.
+
+        :param matrix: CSR matrix of cocktails.
+
+        :returns: CSR matrix of prepared vectors.
+        """
+        matrix = matrix.astype(float)
+        matrix.eliminate_zeros()
+        if self.metric == 'cosine':
+            return normalize(matrix)
+
+        matrix.data[:] = 1
+        return matrix
+
+    def _signatures(self, vectors):
+        """
+        Computes MinHash signatures of sets of features of cocktails, permutations are universal hashes of the
+        feature positions.
+
+        :param vectors: Prepared CSR matrix of cocktails.
+
+        :returns: Array of signatures with a row per cocktail.
+        """
+        signatures = np.full((vectors.shape[0], len(self._hash_a)), MINHASH_PRIME, dtype=np.uint64)
+        non_empty = np.flatnonzero(np.diff(vectors.indptr))
+
+        # Rows are hashed in blocks to bound memory of hashes of all features
+        for start in range(0, len(non_empty), 100_000):
+            rows = non_empty[start:start + 100_000]
+            block = vectors[rows]
+            hashes = (block.indices.astype(np.uint64)[:, None] * self._hash_a + self._hash_b) % MINHASH_PRIME
+            signatures[rows] = np.minimum.reduceat(hashes, block.indptr[:-1], axis=0)
+
+        return signatures
+
+    def _band_keys(self, vectors):
+        """
+        Hashes each band of MinHash signatures into one key, cocktails with equal keys in any band are candidates.
+
+        :param vectors: Prepared CSR matrix of cocktails.
+
+        :returns: Array of keys with a row per cocktail and a column per band.
+        """
+        signatures = self._signatures(vectors).reshape(vectors.shape[0], self.n_bands, -1)
+        # Multiplication wraps around modulo 2^64, which is fine for hashing
+        return (signatures * self._band_multipliers).sum(axis=2, dtype=np.uint64)
+
+    def _candidates(self, band_keys):
+        """
+        Looks up cocktails sharing a bucket with the query in any band.
+
+        :param band_keys: Keys of bands of the query.
+
+        :returns: Sorted array of positions of candidate cocktails.
+        """
+        buckets = []
+        for band, key in enumerate(band_keys):
+            keys = self._sorted_band_keys[:, band]
+            start, end = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+            buckets.append(self._band_order[start:end, band])
+
+        return np.unique(np.concatenate(buckets))
+
+    def _score(self, queries):
+        """
+        Scores queries against indexed cocktails, keeping only cocktails with non-zero similarity.
+
+        :param queries: Prepared CSR matrix of queries.
+
+        :returns: CSR matrix of similarities with a row per query and a column per indexed cocktail.
+        """
+        if self.backend == 'exact':
+            scores = (queries @ self._transposed).tocsr()
+        else:
+            rows, columns = [], []
+            for row, keys in enumerate(self._band_keys(queries)):
+                candidates = self._candidates(keys)
+                rows.append(np.full(len(candidates), row))
+                columns.append(candidates)
+            rows, columns = np.concatenate(rows), np.concatenate(columns)
+
+            # Dot products of queries with their candidates only
+            products = np.asarray(queries[rows].multiply(self._vectors[columns]).sum(axis=1)).ravel()
+            scores = sparse.csr_matrix((products, (rows, columns)), shape=(queries.shape[0], len(self)))
+
+        if self.metric == 'jaccard':
+            # Intersection of binary vectors is their dot product, union is the sum of their sizes minus intersection
+            query_sizes = np.diff(queries.indptr)
+            rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+            scores.data = scores.data / (query_sizes[rows] + self._sizes[scores.indices] - scores.data)
+
+        scores.eliminate_zeros()
+        return scores
+
+    def _score_one(self, features, weights):
+        """
+        Scores a single query against indexed cocktails by gathering cocktails which contain its features, which avoids
+        overhead of sparse matrix product for one row.
+
+        :param features: Positions of features of the prepared query.
+        :param weights: Values of features of the prepared query.
+
+        :returns: Positions of indexed cocktails with non-zero similarity and their similarities.
+        """
+        indptr, indices, data = self._transposed.indptr, self._transposed.indices, self._transposed.data
+        starts, ends = indptr[features], indptr[features + 1]
+
+        positions = np.concatenate([indices[start:end] for start, end in zip(starts, ends)] + [[]]).astype(int)
+        products = np.concatenate([data[start:end] * weight for start, end, weight in zip(starts, ends, weights)] + [[]])
+        # Products with the same cocktail are summed up after sorting them by cocktail
+        order = np.argsort(positions)
+        positions, products = positions[order], products[order]
+        starts = np.flatnonzero(np.diff(positions, prepend=-1))
+        positions, scores = positions[starts], np.add.reduceat(products, starts) if len(starts) else products
+
+        if self.metric == 'jaccard':
+            scores = scores / (len(features) + self._sizes[positions] - scores)
+
+        return positions, scores
+
+    def _iter_scores(self, queries):
+        """
+        Scores queries in blocks, a single query of exact backend is scored directly.
+
+        :param queries: Prepared CSR matrix of queries.
+
+        :returns: Generator of positions of indexed cocktails with non-zero similarity and their similarities, for each
+                  query.
+        """
+        if queries.shape[0] == 1 and self.backend == 'exact':
+            yield self._score_one(queries.indices, queries.data)
+            return
+
+        for start in range(0, queries.shape[0], self.block_size):
+            scores = self._score(queries[start:start + self.block_size])
+            for row in range(scores.shape[0]):
+                row_start, row_end = scores.indptr[row], scores.indptr[row + 1]
+                yield scores.indices[row_start:row_end], scores.data[row_start:row_end]
+
+    @staticmethod
+    def _select(positions, scores, k, exclude=None):
+        """
+        Selects k most similar cocktails of one query.
+
+        :param positions: Positions of scored cocktails.
+        :param scores: Similarities of scored cocktails.
+        :param k: Number of cocktails to select.
+        :param exclude: Position of a cocktail excluded from results, e.g. the query itself.
+
+        :returns: Positions and similarities of selected cocktails, sorted by similarity and by position when similar
+                  equally.
+        """
+        if exclude is not None:
+            kept = positions != exclude
+            positions, scores = positions[kept], scores[kept]
+
+        if len(scores) > k:
+            # Every cocktail tied with the k-th one is kept, so that ties are broken by position below
+            best = scores >= -np.partition(-scores, k - 1)[k - 1]
+            positions, scores = positions[best], scores[best]
+
+        order = np.lexsort((positions, -scores))[:k]
+        return positions[order], scores[order]
+
+    def _top_k(self, queries, k, exclude=None):
+        """
+        Finds k most similar indexed cocktails for each query.
+
+        :param queries: Prepared CSR matrix of queries.
+        :param k: Number of cocktails to find.
+        :param exclude: Positions of indexed cocktails excluded from results of each query, e.g. the query itself.
+
+        :returns: Arrays of positions and similarities with a row per query, padded with -1 and NaN when fewer than
+                  k cocktails are similar to a query.
+        """
+        positions = np.full((queries.shape[0], k), -1)
+        similarities = np.full((queries.shape[0], k), np.nan)
+
+        for row, (row_positions, row_scores) in enumerate(self._iter_scores(queries)):
+            row_positions, row_scores = self._select(row_positions, row_scores, k,
+                                                     None if exclude is None else exclude[row])
+            positions[row, :len(row_positions)] = row_positions
+            similarities[row, :len(row_scores)] = row_scores
+
+        return positions, similarities
+
+    def _to_frame(self, query_names, positions, similarities):
+        """
+        Converts results of search to a long DataFrame.
+
+        :param query_names: Names of queries.
+        :param positions: Positions of found cocktails.
+        :param similarities: Similarities of found cocktails.
+
+        :returns: DataFrame with columns for query, rank, similar cocktail name and similarity.
+        """
+        found = positions >= 0
+        query_rows, ranks = np.nonzero(found)
+
+        return pd.DataFrame({'cocktail_name': np.asarray(query_names)[query_rows],
+                             'rank': ranks + 1,
+                             'similar_cocktail': self.index[positions[found]],
+                             'similarity': similarities[found]})
+
+    def most_similar(self, cocktail_name, k=10):
+        """
+        Finds cocktails most similar to an indexed one, excluding the cocktail itself.
+
+        :param cocktail_name: Name of the cocktail.
+        :param k: Number of cocktails to find.
+
+        :returns: Series of similarities indexed by names of similar cocktails, from the most similar one.
+        """
+        row = self.index.get_loc(cocktail_name)
+        start, end = self._vectors.indptr[row], self._vectors.indptr[row + 1]
+
+        if self.backend == 'exact':
+            scored = self._score_one(self._vectors.indices[start:end], self._vectors.data[start:end])
+        else:
+            scored = next(self._iter_scores(self._vectors[row:row + 1]))
+        positions, similarities = self._select(*scored, k, exclude=row)
+
+        return pd.Series(similarities, index=self.index[positions], name='similarity')
+
+    def most_similar_batch(self, cocktail_names, k=10):
+        """
+        Finds cocktails most similar to indexed ones in batch, excluding the cocktails themselves.
+
+        :param cocktail_names: Names of cocktails.
+        :param k: Number of cocktails to find for each one.
+
+        :returns: DataFrame with columns for cocktail name, rank, similar cocktail name and similarity.
+        """
+        rows = self.index.get_indexer(cocktail_names)
+        if (rows < 0).any():
+            raise KeyError(f'Cocktails not in index: {list(np.asarray(cocktail_names)[rows < 0])}')
+
+        positions, similarities = self._top_k(self._vectors[rows], k, exclude=rows)
+        return self._to_frame(cocktail_names, positions, similarities)
+
+    def query(self, matrix, k=10):
+        """
+        Finds indexed cocktails most similar to new ones. Features unknown to the index are ignored.
+
+        :param matrix: Matrix of new cocktails with features named like the indexed ones, DataFrame or CocktailMatrix.
+        :param k: Number of cocktails to find for each one.
+
+        :returns: DataFrame with columns for cocktail name, rank, similar cocktail name and similarity.
+        """
+        values = _to_csr(matrix).tocoo()
+        positions = self.columns.get_indexer(matrix.columns)
+        known = positions[values.col] >= 0
+        aligned = sparse.csr_matrix((values.data[known], (values.row[known], positions[values.col[known]])),
+                                    shape=(matrix.shape[0], len(self.columns)))
+
+        positions, similarities = self._top_k(self._prepare(aligned), k)
+        return self._to_frame(matrix.index, positions, similarities)
+
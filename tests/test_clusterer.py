@@ -0,0 +1,143 @@
+from multiprocessing import shared_memory
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+import clusterer as clusterer_module  # noqa: E402
+from clusterer import Clusterer, CocktailMatrix  # noqa: E402
+
+
+def _transformed_matrix(n_rows=120, n_columns=30, random_state=0):
+    rng = np.random.default_rng(random_state)
+    return pd.DataFrame(rng.random((n_rows, n_columns)), index=[f'Cocktail {row}' for row in range(n_rows)])
+
+
+def test_decompositions_are_cached_per_number_of_components():
+    clusterer = Clusterer(None, None, None)
+    matrix = _transformed_matrix()
+
+    truncated = clusterer.decompose(matrix, n_components=5)
+    full = clusterer.decompose(matrix)
+
+    assert len(truncated.explained_variance_ratio) == 5
+    assert len(full.explained_variance_ratio) == matrix.shape[1]
+    assert clusterer.decompose(matrix, n_components=5) is truncated
+    assert clusterer.decompose(matrix) is full
+
+
+def test_scree_plot_shows_full_spectrum_after_truncated_decomposition(monkeypatch):
+    monkeypatch.setattr(plt, 'show', lambda: None)
+    clusterer = Clusterer(None, None, None)
+    matrix = _transformed_matrix()
+
+    clusterer.decompose(matrix, n_components=5)
+    clusterer.plot_scree_plot(matrix)
+
+    assert len(plt.gca().patches) == matrix.shape[1]
+    plt.close('all')
+
+
+def test_tsne_plot_is_fitted_on_matrix_by_default(monkeypatch):
+    monkeypatch.setattr(clusterer_module, '_plot_scatter', lambda *args: None)
+    clusterer = Clusterer(None, None, None)
+    matrix = _transformed_matrix(n_rows=60)
+
+    clusterer.plot_tsne_decomposition(matrix, np.zeros(len(matrix)), {0: 'red'}, 't-SNE')
+
+    assert not clusterer._decompositions
+    assert [key[2] for key in clusterer._embeddings] == [None]
+
+
+@pytest.mark.parametrize('sparse_input', [False, True])
+def test_parallel_sweep_matches_sequential_and_releases_shared_memory(sparse_input, monkeypatch):
+    matrix = _transformed_matrix(n_rows=80, n_columns=10)
+    if sparse_input:
+        values = matrix.to_numpy()
+        matrix = CocktailMatrix(sparse.csr_matrix(np.where(values > 0.5, values, 0.)), matrix.index, matrix.columns)
+    names = []
+
+    def share_array(array, blocks):
+        spec = share(array, blocks)
+        names.append(spec[0])
+        return spec
+
+    share = clusterer_module._share_array
+    monkeypatch.setattr(clusterer_module, '_share_array', share_array)
+    clusterer = Clusterer(None, None, None)
+
+    sequential, sequential_labels = clusterer.sweep_n_clusters(matrix, range(2, 5), n_neighbors=5, n_jobs=1)
+    parallel, parallel_labels = clusterer.sweep_n_clusters(matrix, range(2, 5), n_neighbors=5, n_jobs=2)
+
+    pd.testing.assert_frame_equal(parallel.drop(columns='time_s'), sequential.drop(columns='time_s'))
+    np.testing.assert_array_equal(parallel_labels, sequential_labels)
+    # Matrix and affinity graph were shared and every block was unlinked
+    assert len(names) == (6 if sparse_input else 4)
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+@pytest.mark.parametrize('sparse_input', [False, True])
+def test_projection_and_predicted_clusters_match_fit_after_reload(sparse_input, tmp_path):
+    volumes = _transformed_matrix(n_rows=100, n_columns=15)
+    volumes = volumes.where(volumes > 0.6, 0.)
+    volumes.columns = [f'Ingredient {column}' for column in volumes.columns]
+    matrix = CocktailMatrix(sparse.csr_matrix(volumes.to_numpy()), volumes.index, volumes.columns) \
+        if sparse_input else volumes
+    clusterer = Clusterer(None, None, None)
+    transformed = clusterer.transform_matrix(matrix)
+    labels = clusterer.kmeans_clustering(transformed, n_clusters=4)
+    clusterer.save_transformer(tmp_path / 'transformer.pkl')
+
+    reloaded = Clusterer(None, None, None)
+    reloaded.load_transformer(tmp_path / 'transformer.pkl')
+    projected = reloaded.project_matrix(matrix)
+
+    if sparse_input:
+        np.testing.assert_allclose(projected.matrix.toarray(), transformed.matrix.toarray())
+    else:
+        pd.testing.assert_frame_equal(projected, transformed)
+
+    clusterer.quantile_transformer = None
+    clusterer.load_transformer(tmp_path / 'transformer.pkl')
+    np.testing.assert_array_equal(clusterer.predict_clusters(matrix), labels)
+
+
+def test_downsample_by_density_keeps_every_cluster_within_limit():
+    rng = np.random.default_rng(0)
+    sizes = [50_000, 5_000, 300, 20, 3]
+    centers = rng.uniform(-100, 100, size=(len(sizes), 2))
+    points = np.concatenate([center + rng.normal(size=(size, 2)) for center, size in zip(centers, sizes)])
+    labels = np.repeat(np.arange(len(sizes)), sizes)
+
+    selected = clusterer_module._downsample_by_density(points[:, 0], points[:, 1], max_points=2_000)
+
+    assert len(selected) <= 2_000
+    np.testing.assert_array_equal(selected, np.unique(selected))
+    np.testing.assert_array_equal(np.unique(labels[selected]), np.arange(len(sizes)))
+    # Sparse clusters are kept whole, the dense one is thinned the most
+    assert (labels[selected] == 4).sum() == 3 and (labels[selected] == 3).sum() == 20
+    assert (labels[selected] == 0).sum() < 2_000 * 0.9
+
+
+def test_downsample_by_density_with_fewer_points_than_cells():
+    rng = np.random.default_rng(0)
+    x, y = rng.random((2, 20_000))
+
+    selected = clusterer_module._downsample_by_density(x, y, max_points=500)
+
+    assert len(selected) == 500
+    np.testing.assert_array_equal(selected, np.unique(selected))
+
+
+def test_downsample_by_density_returns_small_input_unchanged():
+    x, y = np.arange(10.), np.zeros(10)
+
+    np.testing.assert_array_equal(clusterer_module._downsample_by_density(x, y, max_points=10), np.arange(10))
@@ -0,0 +1,230 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import optimizer as optimizer_module
+from optimizer import (IngredientModel, Optimizer, RecipeIndex, Solver, _greedy_selection, _heuristic_selection,
+                       _improve_by_swaps, _lp_bound, _selection_result)
+
+
+def _cocktails_and_ingredients(recipes):
+    """
+    :param recipes: Dictionary of lists of ingredient ids by cocktail name
+    :return: Cocktails and ingredients dataframe
+    """
+    rows = [(cocktail_name, ingredient_id, f'Ingredient {ingredient_id}')
+            for cocktail_name, ingredient_ids in recipes.items() for ingredient_id in ingredient_ids]
+    return pd.DataFrame(rows, columns=['cocktail_name', 'ingredient_id', 'ingredient_name'])
+
+
+def _generated_recipes(n_cocktails, n_ingredients, random_state):
+    rng = np.random.default_rng(random_state)
+    recipes = {f'Cocktail {cocktail}': list(rng.choice(n_ingredients, rng.integers(1, 6), replace=False))
+               for cocktail in range(n_cocktails)}
+
+    # Variants of the same recipe under other names, and ingredients always used together
+    for cocktail in range(0, n_cocktails, 4):
+        recipes[f'Cocktail {cocktail} variant'] = recipes[f'Cocktail {cocktail}']
+    for cocktail_name, ingredient_ids in recipes.items():
+        if 0 in ingredient_ids:
+            ingredient_ids.append(n_ingredients)
+
+    return recipes
+
+
+# Duplicates, cocktails larger than small numbers of ingredients, and ingredients 7 and 8 used by the same cocktails
+SMALL_RECIPES = {'A': [1, 2], 'A variant': [2, 1], 'B': [1, 3], 'C': [2, 3, 4], 'D': [4, 5, 6, 7, 8],
+                 'E': [7, 8], 'F': [7, 8, 1], 'G': [5], 'H': [1, 2, 3, 4, 5, 6]}
+
+
+def _num_cocktails(recipes, model, num_ingredients, backend):
+    selected = model.solve(num_ingredients, Solver(backend))
+    assert selected.sum() == num_ingredients
+    return _selection_result(recipes, selected)['num_cocktails']
+
+
+def _brute_force_optimum(recipes, num_ingredients):
+    n_ingredients = len(recipes.ingredient_ids)
+    best = 0
+    for codes in itertools.combinations(range(n_ingredients), num_ingredients):
+        best = max(best, int(recipes.makeable([recipes.ingredient_ids[list(codes)]])[0].sum()))
+    return best
+
+
+@pytest.mark.parametrize('backend', ['cbc', 'highs'])
+def test_reduced_model_matches_full_model_and_brute_force(backend):
+    recipes = RecipeIndex(_cocktails_and_ingredients(SMALL_RECIPES))
+    full = IngredientModel(recipes, reduce=False)
+
+    for num_ingredients in range(1, len(recipes.ingredient_ids) + 1):
+        reduced = IngredientModel(recipes, num_ingredients)
+        optimum = _brute_force_optimum(recipes, num_ingredients)
+
+        assert _num_cocktails(recipes, reduced, num_ingredients, backend) == optimum
+        assert _num_cocktails(recipes, full, num_ingredients, backend) == optimum
+
+
+def test_reduction_merges_duplicates_and_drops_large_cocktails():
+    recipes = RecipeIndex(_cocktails_and_ingredients(SMALL_RECIPES))
+
+    reduced = IngredientModel(recipes, 2)
+
+    # Only A, A variant, B, E and G fit into 2 ingredients, A and its variant are one group worth 2 cocktails
+    assert sorted(reduced.weights) == [1, 1, 1, 2]
+    assert reduced.cocktail_groups[list(recipes.cocktail_names).index('H')] == -1
+    # Ingredients 7 and 8 are used by the same cocktails, so they are one variable counting 2 ingredients
+    assert reduced.ingredient_groups[6] == reduced.ingredient_groups[7] >= 0
+    assert reduced.group_sizes[reduced.ingredient_groups[6]] == 2
+    assert reduced.n_variables < IngredientModel(recipes, reduce=False).n_variables
+
+
+@pytest.mark.parametrize('random_state', [0, 1, 2])
+def test_reduced_model_matches_full_model_on_generated_recipes(random_state):
+    recipes = RecipeIndex(_cocktails_and_ingredients(_generated_recipes(50, 20, random_state)))
+    full = IngredientModel(recipes, reduce=False)
+
+    for num_ingredients in (2, 4, 7):
+        reduced = IngredientModel(recipes, num_ingredients)
+
+        assert reduced.n_variables < full.n_variables
+        assert _num_cocktails(recipes, reduced, num_ingredients, 'cbc') == \
+            _num_cocktails(recipes, full, num_ingredients, 'cbc')
+
+
+def test_scipy_highs_warns_that_threads_are_ignored():
+    try:
+        import highspy  # noqa: F401
+        pytest.skip('highspy sets threads of HiGHS')
+    except ImportError:
+        pass
+    recipes = RecipeIndex(_cocktails_and_ingredients(SMALL_RECIPES))
+
+    with pytest.warns(RuntimeWarning, match='threads'):
+        IngredientModel(recipes, 3).solve(3, Solver('highs', threads=2))
+
+
+def test_unknown_required_ingredient_raises():
+    optimizer = Optimizer(None, _cocktails_and_ingredients(SMALL_RECIPES))
+
+    with pytest.raises(ValueError, match='Gin typo'):
+        optimizer.find_n_ingredients_to_make_largest_amount_of_cocktails(3, must_include=['Gin typo'])
+
+
+def test_required_and_forbidden_ingredients_are_respected():
+    optimizer = Optimizer(None, _cocktails_and_ingredients(SMALL_RECIPES))
+
+    result = optimizer.find_n_ingredients_to_make_largest_amount_of_cocktails(
+        3, must_include=['Ingredient 5', 4], must_exclude=['Ingredient 1', 'Unknown ingredient'])
+
+    assert len(result['selected_ingredients']) == 3
+    assert {'Ingredient 4', 'Ingredient 5'} <= set(result['selected_ingredients'])
+    assert 'Ingredient 1' not in result['selected_ingredients']
+
+
+def test_heuristic_matches_brute_force():
+    recipes = RecipeIndex(_cocktails_and_ingredients(SMALL_RECIPES))
+
+    for num_ingredients in range(1, len(recipes.ingredient_ids) + 1):
+        selected = _heuristic_selection(recipes, num_ingredients)
+
+        assert selected.sum() == num_ingredients
+        assert _selection_result(recipes, selected)['num_cocktails'] == _brute_force_optimum(recipes, num_ingredients)
+
+
+@pytest.mark.parametrize('random_state', [0, 1])
+def test_greedy_and_swap_selections_never_exceed_lp_bound(random_state):
+    recipes = RecipeIndex(_cocktails_and_ingredients(_generated_recipes(50, 20, random_state)))
+    empty = np.zeros(len(recipes.ingredient_ids), dtype=bool)
+
+    for num_ingredients in (1, 3, 5, 8):
+        bound = _lp_bound(recipes, num_ingredients)
+        greedy = _greedy_selection(recipes, empty, num_ingredients)
+        swapped = _improve_by_swaps(recipes, greedy, np.inf)
+
+        assert _selection_result(recipes, greedy)['num_cocktails'] <= bound
+        assert _selection_result(recipes, greedy)['num_cocktails'] <= \
+            _selection_result(recipes, swapped)['num_cocktails'] <= bound
+        assert _selection_result(recipes, _heuristic_selection(recipes, num_ingredients))['num_cocktails'] <= bound
+
+
+def test_heuristic_respects_tiny_time_limit():
+    recipes = RecipeIndex(_cocktails_and_ingredients(_generated_recipes(3_000, 400, 0)))
+
+    start = time.perf_counter()
+    selected = _heuristic_selection(recipes, 30, time_limit=0.01, max_stalls=np.inf)
+    elapsed = time.perf_counter() - start
+
+    assert selected.sum() == 30
+    assert elapsed < 0.5
+
+
+def _inventory_case(random_state=0):
+    """
+    Generates recipes over more than 64 ingredients, so masks span several words, and inventories mixing names, ids
+    and unknown ingredients
+    """
+    rng = np.random.default_rng(random_state)
+    cocktails_and_ingredients = _cocktails_and_ingredients(_generated_recipes(200, 150, random_state))
+    ingredient_ids = cocktails_and_ingredients['ingredient_id'].unique()
+
+    inventories = []
+    for _ in range(130):
+        inventory = list(rng.choice(ingredient_ids, size=rng.integers(0, 120), replace=False))
+        inventory = [f'Ingredient {ingredient}' if rng.random() < 0.5 else ingredient for ingredient in inventory]
+        inventories.append(inventory + ['Unknown ingredient', -1])
+
+    return cocktails_and_ingredients, inventories
+
+
+def _query_with_sets(cocktails_and_ingredients, inventories, max_missing):
+    """
+    Pandas and python sets implementation of RecipeIndex.query, like recipes were matched before the index
+    """
+    recipes = cocktails_and_ingredients.groupby('cocktail_name')['ingredient_id'].agg(set)
+    names = dict(zip(cocktails_and_ingredients['ingredient_name'], cocktails_and_ingredients['ingredient_id']))
+
+    rows = []
+    for position, inventory in enumerate(inventories):
+        ids = {names.get(ingredient, ingredient) for ingredient in inventory}
+        for cocktail_name, recipe in recipes.items():
+            if len(recipe - ids) <= max_missing:
+                rows.append((position, cocktail_name, len(recipe - ids)))
+
+    return pd.DataFrame(rows, columns=['inventory', 'cocktail_name', 'missing']).sort_values(
+        ['inventory', 'missing', 'cocktail_name'], ignore_index=True)
+
+
+@pytest.mark.parametrize('max_missing', [0, 1, 2])
+def test_find_makeable_cocktails_matches_sets(max_missing, monkeypatch):
+    # Small blocks make a batch of inventories span several of them
+    monkeypatch.setattr(optimizer_module, '_INVENTORY_BLOCK_SIZE', 64)
+    cocktails_and_ingredients, inventories = _inventory_case()
+    optimizer = Optimizer(None, cocktails_and_ingredients)
+
+    result = optimizer.find_makeable_cocktails(inventories, max_missing)
+
+    pd.testing.assert_frame_equal(result, _query_with_sets(cocktails_and_ingredients, inventories, max_missing),
+                                  check_dtype=False)
+
+
+def test_recipe_index_counts_and_missing_ingredients_match_sets():
+    cocktails_and_ingredients, inventories = _inventory_case(1)
+    index = RecipeIndex(cocktails_and_ingredients)
+    recipes = cocktails_and_ingredients.groupby('cocktail_name')['ingredient_name'].agg(set).reindex(
+        index.cocktail_names)
+
+    counts = index.missing_counts(inventories, max_missing=2)
+    makeable = index.makeable(inventories)
+
+    for position, inventory in enumerate(inventories):
+        names = {f'Ingredient {ingredient}' if not isinstance(ingredient, str) else ingredient
+                 for ingredient in inventory}
+        missing = [recipe - names for recipe in recipes]
+
+        assert list(counts[position]) == [min(len(ingredients), 3) for ingredients in missing]
+        assert list(makeable[position]) == [not ingredients for ingredients in missing]
+        for cocktail_name, ingredients in zip(index.cocktail_names[:10], missing[:10]):
+            assert sorted(index.missing_ingredients(inventory, cocktail_name)) == sorted(ingredients)
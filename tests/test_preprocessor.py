@@ -0,0 +1,317 @@
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocessor
+
+MEASURES = ['2-3 oz ', '1/2 oz ', '1 oz ', '1 2/3 oz ', '1 1/2 oz ', '2 1/2 oz Blended ', '6 oz hot ', '10-12 oz',
+            'oz', '1/3 oz cream ', '2 tsp ', '1/2 tsp ', '1 tblsp ', '1 1/2 tsp ', '11/2 tsp', '1 1/4 tblsp',
+            '1/8 tsp grated ', '2tsp', 'Top with 1 tsp', '1 cup', 'Juice of 1 ', 'Juice of 1/2 ', 'Juice of 1/2',
+            'Juice of 1/4 ', 'Juice of 3', 'juice of 1', 'Fresh juice', '2-4', 'Garnish with', '', 'None']
+
+INGREDIENT_NAMES = ['Lemon', 'Lime', 'Lemon Juice', 'Lime Juice', 'lemon-lime soda', 'Lime and Lemon Peel', 'Gin',
+                    'Sugar']
+
+
+def _parse_row_by_row(cocktails_and_ingredients):
+    return cocktails_and_ingredients.apply(preprocessor._parse_measure, axis=1).astype(float)
+
+
+def test_parse_measures_matches_row_by_row_parser():
+    pairs = list(itertools.product(MEASURES, INGREDIENT_NAMES))
+    cocktails_and_ingredients = pd.DataFrame(pairs, columns=['measure', 'ingredient_name'])
+
+    vectorized = preprocessor._parse_measures(cocktails_and_ingredients['measure'],
+                                              cocktails_and_ingredients['ingredient_name'])
+
+    pd.testing.assert_series_equal(vectorized, _parse_row_by_row(cocktails_and_ingredients), check_names=False)
+
+
+def test_parse_measures_matches_row_by_row_parser_on_generated_measures():
+    rng = np.random.default_rng(0)
+    tokens = ['1', '2', '11', '1/2', '3/4', '11/2', '1 1/2', '2-3', ' ', '  ', 'oz', 'tsp', 'tblsp', 'Juice of', 'juice',
+              'cl', 'dash', 'None']
+    measures = [''.join(rng.choice(tokens, rng.integers(1, 5))) for _ in range(5_000)]
+    cocktails_and_ingredients = pd.DataFrame({
+        'measure': measures,
+        'ingredient_name': np.array(INGREDIENT_NAMES)[rng.integers(len(INGREDIENT_NAMES), size=len(measures))]})
+
+    vectorized = preprocessor._parse_measures(cocktails_and_ingredients['measure'],
+                                              cocktails_and_ingredients['ingredient_name'])
+
+    pd.testing.assert_series_equal(vectorized, _parse_row_by_row(cocktails_and_ingredients), check_names=False)
+
+
+@pytest.mark.parametrize('measure, ingredient_name, volume', [
+    ('1 1/2 oz ', 'Gin', 1.5),
+    ('2-3 oz ', 'Gin', 2.5),
+    ('11/2 tsp', 'Sugar', 5.5 * preprocessor.TSP_OZ),
+    ('Juice of 1/2', 'Lemon', preprocessor.LEMON_JUICE_PER_FRUIT / 2),
+    ('Juice of 1/4 ', 'Lime', preprocessor.LIME_JUICE_PER_FRUIT / 4),
+    ('Juice of 1', 'lemon-lime soda', preprocessor.LEMON_JUICE_PER_FRUIT),
+])
+def test_parse_measures_known_volumes(measure, ingredient_name, volume):
+    volumes = preprocessor._parse_measures(pd.Series([measure]), pd.Series([ingredient_name]))
+
+    assert volumes[0] == pytest.approx(volume)
+
+
+@pytest.mark.parametrize('measure', ['None', 'Garnish with', '2-4', 'Juice of 3'])
+def test_parse_measures_unparsed_measures_are_nan(measure):
+    volumes = preprocessor._parse_measures(pd.Series([measure]), pd.Series(['Lemon']))
+
+    assert volumes.isna().all()
+
+
+def _abv_by_loop(cocktails, ingredients, cocktails_and_ingredients):
+    """
+    Per-cocktail loop which calculated ABV before it was a grouped sum, kept as reference for _calculate_abv
+    """
+    result_df = cocktails_and_ingredients.set_index('ingredient_id').join(
+        ingredients[['percentage', 'generalized_type']], how='left')
+
+    for cocktail_id, group in result_df.groupby('cocktail_name'):
+        essential_ingrs = []
+        lack_of_data = False
+
+        for index, row in group.iterrows():
+            gen_type = row['generalized_type'] if pd.notna(row['generalized_type']) else "Unknown"
+            volume_oz = row['volume_oz']
+            percentage = row['percentage']
+
+            if gen_type in ['Non-Alcoholic', 'Alcoholic'] and (pd.isna(volume_oz) or pd.isna(percentage)):
+                essential_ingrs.clear()
+                lack_of_data = True
+            elif gen_type in ['Non-Alcoholic', 'Alcoholic', 'Fruit'] and pd.notna(volume_oz) and pd.notna(
+                    percentage):
+                essential_ingrs.append([row['percentage'], row['volume_oz']])
+
+        if not lack_of_data:
+            total_volume, total_alcohol_volume, abv = 0, 0, 0
+
+            for percentage, volume in essential_ingrs:
+                total_volume += volume
+                total_alcohol_volume += (percentage / 100) * volume
+
+            if total_volume > 0 and total_alcohol_volume > 0:
+                abv = (total_alcohol_volume / total_volume) * 100
+            else:
+                abv = None
+
+            cocktails.loc[cocktails['name'] == cocktail_id, 'abv'] = abv
+        else:
+            cocktails.loc[cocktails['name'] == cocktail_id, 'abv'] = pd.NA
+
+    return cocktails['abv'].astype(float)
+
+
+def _abv_tables(rows):
+    """
+    Builds tables for ABV calculation
+    :param rows: List of (cocktail name, ingredient id, volume in oz) tuples, the first cocktail is named first
+    :return: Cocktails, ingredients and cocktails and ingredients tables
+    """
+    ingredients = pd.DataFrame({
+        'percentage': [40., 15., np.nan, 0., np.nan, 0., np.nan, 5.],
+        'generalized_type': ['Alcoholic', 'Alcoholic', 'Alcoholic', 'Non-Alcoholic', 'Non-Alcoholic', 'Fruit',
+                             'Fruit', None]
+    }, index=pd.Index(range(1, 9), name='id'))
+
+    cocktails_and_ingredients = pd.DataFrame(rows, columns=['cocktail_name', 'ingredient_id', 'volume_oz'])
+    names = list(dict.fromkeys(cocktails_and_ingredients['cocktail_name']))
+    cocktails_and_ingredients['cocktail_id'] = cocktails_and_ingredients['cocktail_name'].map(
+        {name: cocktail_id for cocktail_id, name in enumerate(names)})
+    cocktails = pd.DataFrame({'name': names, 'instructions': 'Shake with ice.'})
+
+    return cocktails, ingredients, cocktails_and_ingredients
+
+
+def test_calculate_abv_matches_loop_on_mixed_ingredients():
+    cocktails, ingredients, cocktails_and_ingredients = _abv_tables([
+        ('A complete', 1, 2.), ('A complete', 4, 3.), ('A complete', 6, 1.),
+        ('Fruit without volume', 1, 1.5), ('Fruit without volume', 6, np.nan),
+        ('Fruit without percentage', 2, 2.), ('Fruit without percentage', 7, 1.),
+        ('Unknown type', 1, 1.), ('Unknown type', 8, 4.),
+        ('Alcoholic without volume', 1, np.nan), ('Alcoholic without volume', 4, 2.),
+        ('Alcoholic without percentage', 3, 1.), ('Alcoholic without percentage', 1, 1.),
+        ('Non-Alcoholic without percentage', 5, 2.), ('Non-Alcoholic without percentage', 2, 1.),
+        ('No alcohol', 4, 5.), ('No alcohol', 6, 1.),
+        ('No volume', 8, 1.),
+    ])
+
+    expected = _abv_by_loop(cocktails.copy(), ingredients, cocktails_and_ingredients)
+    preprocessor._preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredients)
+
+    pd.testing.assert_series_equal(cocktails['abv'], expected)
+    assert list(cocktails['strength']) == [preprocessor._categorize_abv(abv) for abv in expected]
+    assert cocktails['abv'].notna().sum() == 4
+
+
+def test_calculate_abv_matches_loop_on_generated_recipes():
+    rng = np.random.default_rng(0)
+    rows = [('Cocktail 000', 1, 1.), ('Cocktail 000', 4, 1.)]
+    for cocktail in range(1, 300):
+        for ingredient_id in rng.choice(np.arange(1, 9), rng.integers(1, 6), replace=False):
+            rows.append((f'Cocktail {cocktail:03}', int(ingredient_id), np.nan if rng.random() < 0.1 else
+                         float(rng.integers(1, 8)) / 2))
+    cocktails, ingredients, cocktails_and_ingredients = _abv_tables(rows)
+
+    expected = _abv_by_loop(cocktails.copy(), ingredients, cocktails_and_ingredients)
+
+    pd.testing.assert_series_equal(
+        cocktails['name'].map(preprocessor._calculate_abv(ingredients, cocktails_and_ingredients)).astype(float),
+        expected, check_names=False)
+
+
+def test_calculate_abv_when_loop_raised():
+    # The loop raised once the first cocktail lacked data, as pd.NA made the column of object dtype
+    cocktails, ingredients, cocktails_and_ingredients = _abv_tables([
+        ('Alcoholic without volume', 1, np.nan), ('Alcoholic without volume', 4, 2.),
+        ('Complete', 1, 1.), ('Complete', 4, 3.),
+    ])
+    with pytest.raises(TypeError):
+        _abv_by_loop(cocktails.copy(), ingredients, cocktails_and_ingredients)
+
+    preprocessor._preprocess_cocktails_table(cocktails, ingredients, cocktails_and_ingredients)
+
+    assert cocktails['abv'].dtype == float
+    assert np.isnan(cocktails['abv'][0]) and cocktails['strength'][0] == 'Unknown'
+    assert cocktails['abv'][1] == pytest.approx(10.) and cocktails['strength'][1] == 'Moderate'
+
+
+def test_load_tables_maps_numeric_columns_without_copy(tmp_path):
+    pytest.importorskip('pyarrow')
+    cocktails_and_ingredients = pd.DataFrame({'cocktail_id': [0, 0, 1], 'cocktail_name': ['A', 'A', 'B'],
+                                              'ingredient_id': [1, 2, 1], 'ingredient_name': ['Gin', 'Lime', 'Gin'],
+                                              'measure': ['1 oz', 'Juice of 1', None], 'volume_oz': [1., 1.01, None]})
+    ingredients = pd.DataFrame({'name': ['Gin', 'Lime'], 'type': ['Gin', 'Fruit'],
+                                'generalized_type': ['Alcoholic', 'Fruit']}, index=[1, 2])
+    cocktails = pd.DataFrame({'name': ['A', 'B'], 'tags': [['IBA'], None], 'glass': ['Highball glass'] * 2,
+                              'prep_method': ['Shake', 'Stir'], 'strength': ['Strong', 'Unknown']})
+    preprocessor.save_tables(cocktails, ingredients, cocktails_and_ingredients, tmp_path)
+
+    loaded_cocktails, _, loaded_cocktails_and_ingredients = preprocessor.load_tables(tmp_path)
+
+    pd.testing.assert_series_equal(loaded_cocktails_and_ingredients['volume_oz'],
+                                   cocktails_and_ingredients['volume_oz'])
+    assert loaded_cocktails['tags'].tolist() == [['IBA'], None]
+    assert not loaded_cocktails_and_ingredients['cocktail_id'].to_numpy().flags.writeable
+
+
+def test_incremental_preprocessor_saves_to_bare_file_name(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    preprocessor.IncrementalPreprocessor().save('state.pkl')
+
+    assert isinstance(preprocessor.IncrementalPreprocessor.load('state.pkl'), preprocessor.IncrementalPreprocessor)
+
+
+def _raw_cocktails(n_cocktails, random_state=0):
+    # Imported here, as benchmark imports every module of the project
+    from benchmark import make_synthetic_cocktails
+
+    return make_synthetic_cocktails(n_cocktails, n_ingredients=150, random_state=random_state)
+
+
+def _assert_tables_equal(tables, expected_tables):
+    for table, expected in zip(tables, expected_tables):
+        pd.testing.assert_frame_equal(table, expected)
+
+
+@pytest.mark.parametrize('json_lines', [False, True])
+def test_preprocess_stream_matches_preprocess(json_lines, tmp_path):
+    raw_cocktails = _raw_cocktails(300)
+    raw_cocktails.to_json(tmp_path / 'cocktails.json', orient='records')
+    raw_cocktails.to_json(tmp_path / 'cocktails.jsonl', orient='records', lines=True)
+    path = tmp_path / ('cocktails.jsonl' if json_lines else 'cocktails.json')
+    # Preprocess reads JSON arrays only
+    cocktails, ingredients, cocktails_and_ingredients = preprocessor.preprocess(tmp_path / 'cocktails.json')
+
+    streamed_ingredients, chunks = preprocessor.preprocess_stream(path, chunk_size=64)
+    streamed_cocktails, streamed_cocktails_and_ingredients = zip(*chunks)
+
+    assert len(streamed_cocktails) == 5
+    _assert_tables_equal([pd.concat(streamed_cocktails), streamed_ingredients,
+                          pd.concat(streamed_cocktails_and_ingredients)],
+                         [cocktails, ingredients, cocktails_and_ingredients])
+
+
+@pytest.mark.parametrize('json_lines', [False, True])
+def test_iter_json_records_with_records_split_between_reads(json_lines, tmp_path):
+    path = tmp_path / 'cocktails.json'
+    _raw_cocktails(20).to_json(path, orient='records', lines=json_lines)
+    with open(path, encoding='utf-8') as file:
+        expected = [json.loads(line) for line in file] if json_lines else json.load(file)
+
+    with open(path, encoding='utf-8') as file:
+        assert list(preprocessor._iter_json_records(file, read_size=100)) == expected
+
+
+@pytest.mark.parametrize('n_cocktails, batch_size', [(1_000, 500), (150, 7), (20, 1)])
+def test_incremental_preprocessor_matches_preprocess(n_cocktails, batch_size):
+    expected = preprocessor._preprocess_raw_cocktails(_raw_cocktails(n_cocktails))
+
+    # Tiny batches bring new ingredients late, which changes imputed percentages used by earlier cocktails
+    incremental = preprocessor.IncrementalPreprocessor()
+    raw_cocktails = _raw_cocktails(n_cocktails)
+    for start in range(0, n_cocktails, batch_size):
+        incremental.update(raw_cocktails.iloc[start:start + batch_size])
+
+    _assert_tables_equal(incremental.tables(), expected)
+
+
+def test_incremental_preprocessor_updates_abv_of_earlier_batches():
+    raw_cocktails = _raw_cocktails(150)
+    incremental = preprocessor.IncrementalPreprocessor()
+    first_cocktails, _ = incremental.update(raw_cocktails.iloc[:7])
+    first_abv = first_cocktails['abv'].copy()
+
+    for start in range(7, len(raw_cocktails), 7):
+        incremental.update(raw_cocktails.iloc[start:start + 7])
+
+    expected, _, _ = preprocessor._preprocess_raw_cocktails(_raw_cocktails(150))
+    pd.testing.assert_series_equal(first_cocktails['abv'], expected['abv'].iloc[:7])
+    assert not first_abv.equals(first_cocktails['abv'])
+
+
+@pytest.mark.parametrize('with_measure_cache', [False, True])
+def test_preprocess_in_parallel_matches_one_process(with_measure_cache):
+    expected = preprocessor._preprocess_raw_cocktails(_raw_cocktails(300))
+    measure_cache = preprocessor.MeasureCache() if with_measure_cache else None
+
+    tables = preprocessor._preprocess_in_parallel(_raw_cocktails(300), n_jobs=2, measure_cache=measure_cache)
+
+    _assert_tables_equal(tables, expected)
+    if with_measure_cache:
+        assert len(measure_cache) > 0
+
+
+def test_measure_cache_round_trip_keeps_most_recently_used_pairs(tmp_path):
+    path = tmp_path / 'measures.json'
+    measures = pd.Series(['1 oz ', '2 tsp ', 'Juice of 1/2', 'Garnish with'])
+    names = pd.Series(['Gin', 'Sugar', 'Lemon', 'Lime'])
+    cache = preprocessor.MeasureCache(max_size=3, path=path)
+
+    volumes = cache.parse(measures, names)
+    cache.save()
+    loaded = preprocessor.MeasureCache(max_size=3, path=path)
+
+    assert len(cache) == 3 and ('1 oz ', 'Gin') not in cache
+    pd.testing.assert_frame_equal(loaded.to_frame(), cache.to_frame())
+    pd.testing.assert_series_equal(loaded.parse(measures[1:], names[1:]), volumes[1:])
+    assert loaded.hits == 3 and loaded.misses == 0
+
+    # Loading into a smaller cache evicts least recently used pairs
+    smaller = preprocessor.MeasureCache(max_size=2, path=path)
+    assert list(zip(smaller.to_frame()['measure'], smaller.to_frame()['ingredient_name'])) == [
+        ('Juice of 1/2', 'Lemon'), ('Garnish with', 'Lime')]
+
+
+def test_measure_cache_save_without_path_raises():
+    cache = preprocessor.MeasureCache()
+
+    with pytest.raises(ValueError, match='Path'):
+        cache.save()
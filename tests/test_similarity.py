@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from similarity import SimilarityIndex
+
+
+def _volumes_matrix(n_cocktails=60, n_ingredients=25, random_state=0):
+    """
+    Generates a sparse matrix of volumes, cocktails are variations of a few base recipes so that they have neighbours
+    """
+    rng = np.random.default_rng(random_state)
+    bases = rng.random((6, n_ingredients)) < 0.25
+    kept = rng.random((n_cocktails, n_ingredients)) < 0.8
+    added = rng.random((n_cocktails, n_ingredients)) < 0.05
+    present = (bases[rng.integers(len(bases), size=n_cocktails)] & kept) | added
+    present[~present.any(axis=1), 0] = True
+    volumes = np.where(present, rng.integers(1, 5, size=present.shape) / 2, 0.)
+
+    return pd.DataFrame(volumes, index=[f'Cocktail {i:03}' for i in range(n_cocktails)],
+                        columns=[f'Ingredient {i:02}' for i in range(n_ingredients)])
+
+
+def _brute_force_similarities(matrix, metric):
+    values = matrix.to_numpy()
+    if metric == 'cosine':
+        vectors = values / np.linalg.norm(values, axis=1, keepdims=True)
+        return vectors @ vectors.T
+
+    sets = (values > 0).astype(float)
+    intersections = sets @ sets.T
+    sizes = sets.sum(axis=1)
+    return intersections / (sizes[:, None] + sizes[None, :] - intersections)
+
+
+def _brute_force_most_similar(matrix, metric, row, k):
+    similarities = _brute_force_similarities(matrix, metric)[row]
+    positions = np.flatnonzero((similarities > 0) & (np.arange(len(similarities)) != row))
+    order = np.lexsort((positions, -similarities[positions]))[:k]
+
+    return pd.Series(similarities[positions[order]], index=matrix.index[positions[order]], name='similarity')
+
+
+@pytest.mark.parametrize('metric', ['cosine', 'jaccard'])
+def test_exact_most_similar_matches_brute_force(metric):
+    matrix = _volumes_matrix()
+    index = SimilarityIndex(matrix, metric=metric)
+
+    for row, cocktail_name in enumerate(matrix.index):
+        result = index.most_similar(cocktail_name, k=5)
+
+        pd.testing.assert_series_equal(result, _brute_force_most_similar(matrix, metric, row, 5))
+        assert cocktail_name not in result.index
+
+
+@pytest.mark.parametrize('metric, backend', [('cosine', 'exact'), ('jaccard', 'exact'), ('jaccard', 'minhash')])
+def test_most_similar_batch_equals_most_similar(metric, backend):
+    matrix = _volumes_matrix()
+    index = SimilarityIndex(matrix, metric=metric, backend=backend, block_size=7)
+
+    batch = index.most_similar_batch(matrix.index, k=5)
+
+    for cocktail_name, similar in batch.groupby('cocktail_name', sort=False):
+        expected = index.most_similar(cocktail_name, k=5)
+        assert list(similar['rank']) == list(range(1, len(expected) + 1))
+        assert list(similar['similar_cocktail']) == list(expected.index)
+        np.testing.assert_allclose(similar['similarity'], expected.to_numpy())
+    assert set(batch['cocktail_name']) == set(matrix.index[
+        [not index.most_similar(cocktail_name, k=5).empty for cocktail_name in matrix.index]])
+
+
+def test_minhash_recall_against_exact():
+    matrix = _volumes_matrix(n_cocktails=300, n_ingredients=40)
+    exact = SimilarityIndex(matrix, metric='jaccard').most_similar_batch(matrix.index, k=5)
+    approximate = SimilarityIndex(matrix, metric='jaccard', backend='minhash').most_similar_batch(matrix.index, k=5)
+
+    # Close neighbours collide in some band with high probability
+    close = exact[exact['similarity'] >= 0.5]
+    found = close.merge(approximate, on=['cocktail_name', 'similar_cocktail'], suffixes=('', '_approximate'))
+
+    assert len(close) > 100
+    assert len(found) / len(close) >= 0.9
+    np.testing.assert_allclose(found['similarity_approximate'], found['similarity'])
+
+
+@pytest.mark.parametrize('metric', ['cosine', 'jaccard'])
+def test_query_ignores_unknown_features(metric):
+    matrix = _volumes_matrix()
+    index = SimilarityIndex(matrix, metric=metric)
+    queries = matrix.iloc[:5].copy()
+    queries.index = [f'New {name}' for name in queries.index]
+    with_unknown = queries.assign(**{'Unknown ingredient': 3.}).iloc[:, ::-1]
+
+    result = index.query(with_unknown, k=5)
+
+    pd.testing.assert_frame_equal(result, index.query(queries, k=5))
+    expected = _brute_force_similarities(matrix, metric)[:5]
+    for row, cocktail_name in enumerate(queries.index):
+        similar = result[result['cocktail_name'] == cocktail_name]
+        assert similar['similar_cocktail'].iloc[0] == matrix.index[row]
+        np.testing.assert_allclose(similar['similarity'],
+                                   expected[row, matrix.index.get_indexer(similar['similar_cocktail'])])